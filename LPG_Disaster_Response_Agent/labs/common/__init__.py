@@ -0,0 +1,5 @@
+"""Shared, framework-free building blocks used across the labs.
+
+Nothing in this package imports SPADE, so CLI tools, batch jobs and tests can
+use it without paying the agent framework's import cost.
+"""
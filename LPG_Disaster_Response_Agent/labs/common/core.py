@@ -0,0 +1,105 @@
+"""Hazard thresholds, classification and event codes.
+
+This module is deliberately free of SPADE (and of any import-time side effects
+such as logging handlers or ``sys.path`` changes) so that it can be imported in
+a few milliseconds by tests, CLI tools and batch jobs.  The agent modules
+re-export these names for backwards compatibility.
+
+Hazard levels
+-------------
+    NORMAL   – gas concentration is within safe limits
+    WARNING  – elevated readings; possible early leak
+    DANGER   – confirmed gas leak
+    CRITICAL – explosive-risk concentration
+
+The ``PPM_*`` constants are the default boundaries.  A :class:`Thresholds`
+holds one station's boundaries; :mod:`labs.common.thresholds` keeps them per
+station and station class and reloads them from a config file.
+"""
+
+from __future__ import annotations
+
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from enum import IntEnum
+
+# ── Perception thresholds (ppm) ─────────────────────────────────────────────
+PPM_WARNING = 200
+PPM_DANGER = 500
+PPM_CRITICAL = 900
+
+HAZARD_LEVELS = ("NORMAL", "WARNING", "DANGER", "CRITICAL")
+
+
+class EventCode(IntEnum):
+    """Integer codes for percept events, ordered by severity."""
+
+    NORMAL_CONDITION = 0
+    POSSIBLE_GAS_LEAK = 1
+    GAS_LEAK_CONFIRMED = 2
+    CRITICAL_GAS_LEVEL = 3
+    SHUTDOWN = 255
+
+
+_HAZARD_TO_EVENT = {
+    "NORMAL": "NORMAL_CONDITION",
+    "WARNING": "POSSIBLE_GAS_LEAK",
+    "DANGER": "GAS_LEAK_CONFIRMED",
+    "CRITICAL": "CRITICAL_GAS_LEVEL",
+}
+
+
+@dataclass(frozen=True)
+class Thresholds:
+    """Lower ppm boundaries of WARNING, DANGER and CRITICAL."""
+
+    warning: float = PPM_WARNING
+    danger: float = PPM_DANGER
+    critical: float = PPM_CRITICAL
+    boundaries: tuple[float, float, float] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        if not 0 <= self.warning < self.danger < self.critical:
+            raise ValueError(f"need 0 <= warning < danger < critical, got {self.warning}, "
+                             f"{self.danger}, {self.critical}")
+        object.__setattr__(self, "boundaries", (self.warning, self.danger, self.critical))
+
+    def classify(self, lpg_ppm: float) -> str:
+        return HAZARD_LEVELS[bisect_right(self.boundaries, lpg_ppm)]
+
+    def level_ppm(self, level: str) -> float:
+        """Lower boundary of ``level`` (0 for NORMAL)."""
+        index = HAZARD_LEVELS.index(level)
+        return self.boundaries[index - 1] if index else 0.0
+
+
+DEFAULT_THRESHOLDS = Thresholds()
+
+
+def classify_hazard(lpg_ppm: float, thresholds: Thresholds = DEFAULT_THRESHOLDS) -> str:
+    """Return a hazard level string based on gas concentration (ppm).
+
+    With the default thresholds:
+
+        <200 ppm  → NORMAL
+        200–499   → WARNING
+        500–899   → DANGER
+        ≥900      → CRITICAL
+    """
+    return HAZARD_LEVELS[bisect_right(thresholds.boundaries, lpg_ppm)]
+
+
+def determine_event(hazard_level: str) -> str:
+    """Map a hazard level to the corresponding percept event type."""
+    return _HAZARD_TO_EVENT.get(hazard_level, "NORMAL_CONDITION")
+
+
+def event_code(event: str) -> EventCode:
+    """Return the :class:`EventCode` for an event name.
+
+    Unknown names map to ``NORMAL_CONDITION``, mirroring ``determine_event``.
+    """
+    try:
+        return EventCode[event]
+    except KeyError:
+        return EventCode.NORMAL_CONDITION
@@ -0,0 +1,55 @@
+"""SPADE behaviour that answers ``query-ref`` messages from a reading history.
+
+The Lab 3 and Lab 4 sensors and the Lab 4 gateway all keep a
+:class:`~labs.common.history.ReadingHistory` and answer the same queries
+(``last=<n>`` or ``seconds=<s>``), so they share this behaviour.  Add it
+with its template::
+
+    self.add_behaviour(HistoryQueryBehaviour(lambda msg: self.history), HistoryQueryBehaviour.TEMPLATE)
+
+Unlike the rest of ``labs.common`` this module needs SPADE.
+"""
+
+from __future__ import annotations
+
+from typing import Callable, Optional
+
+from spade.behaviour import CyclicBehaviour
+from spade.message import Message
+from spade.template import Template
+
+from labs.common.history import HistoryQueryError, ReadingHistory, answer_query
+from labs.common.metrics import MESSAGES_SENT
+
+
+class HistoryQueryBehaviour(CyclicBehaviour):
+    """Answers ``query-ref`` messages from a sensor's reading history.
+
+    ``lookup(msg)`` returns the :class:`ReadingHistory` the query is about, or
+    ``None`` when the agent has no such sensor (answered with ``failure``).
+    Queries that cannot be parsed get ``not-understood``.  Replies keep the
+    query's thread so the asker can match them.
+    """
+
+    TEMPLATE = Template(metadata={"performative": "query-ref"})
+
+    def __init__(self, lookup: Callable[[Message], Optional[ReadingHistory]]) -> None:
+        super().__init__()
+        self.lookup = lookup
+
+    async def run(self) -> None:
+        msg = await self.receive(timeout=1.0)
+        if msg is None:
+            return
+        reply = msg.make_reply()
+        history = self.lookup(msg)
+        if history is None:
+            performative, reply.body = "failure", "unknown sensor"
+        else:
+            try:
+                performative, reply.body = "inform", answer_query(history, msg.body)
+            except HistoryQueryError as exc:
+                performative, reply.body = "not-understood", str(exc)
+        reply.set_metadata("performative", performative)
+        await self.send(reply)
+        MESSAGES_SENT.labels(self.agent.name, performative).inc()
@@ -0,0 +1,405 @@
+"""In-process metrics registry with a Prometheus-compatible text endpoint.
+
+Counters, gauges, histograms and quantile sketches are kept as plain Python numbers: every agent
+runs on the same asyncio loop, so recording is a dict lookup plus an addition
+and needs no locking.  Label children are cached, so hot paths should hold on
+to ``metric.labels(...)`` where convenient.
+
+Usage::
+
+    from labs.common.metrics import MESSAGES_SENT, MetricsServer
+
+    MESSAGES_SENT.labels("coordinator", "request").inc()
+    server = MetricsServer(port=9464)
+    await server.start()          # GET http://127.0.0.1:9464/metrics
+
+The module has no third-party dependencies.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import bisect
+import math
+import time
+import types
+import weakref
+from typing import Callable, Iterable, Optional, Sequence
+
+from labs.common.sketches import DDSketch
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    if value == int(value) and abs(value) < 1e15:
+        return f"{int(value)}"
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: dict[tuple, object] = {}
+
+    def labels(self, *values: str):
+        """Return the child for ``values`` (created on first use)."""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+            child = self._children[values] = self._new_child()
+        return child
+
+    def remove(self, *values: str) -> None:
+        """Drop the child for ``values``, e.g. when the agent it describes stops."""
+        self._children.pop(values, None)
+
+    def _default(self):
+        if self.labelnames:
+            raise ValueError(f"{self.name} has labels {self.labelnames}; use .labels()")
+        return self.labels()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in sorted(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+    def _render_child(self, values: tuple, child) -> list[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.get())}"]
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        if amount < 0:
+            raise ValueError("counters can only increase")
+        self.value += amount
+
+    def get(self) -> float:
+        return self.value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default().inc(amount)
+
+
+class _GaugeChild:
+    __slots__ = ("value", "_fn")
+
+    def __init__(self) -> None:
+        self.value = 0.0
+        self._fn: Optional[Callable[[], float]] = None
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set_function(self, fn: Callable[[], float]) -> None:
+        """Sample ``fn()`` at exposition time instead of storing a value.
+
+        A bound method is held weakly, so the registry does not keep its
+        object alive; once the object is gone the gauge reads NaN.
+        """
+        self._fn = weakref.WeakMethod(fn) if isinstance(fn, types.MethodType) else (lambda: fn)
+
+    def get(self) -> float:
+        if self._fn is not None:
+            fn = self._fn()
+            if fn is None:
+                return math.nan
+            try:
+                return float(fn())
+            except Exception:
+                return math.nan
+        return self.value
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self) -> _GaugeChild:
+        return _GaugeChild()
+
+    def set(self, value: float) -> None:
+        self._default().set(value)
+
+
+class _Timer:
+    __slots__ = ("_child", "_start")
+
+    def __init__(self, child: "_HistogramChild") -> None:
+        self._child = child
+
+    def __enter__(self) -> "_Timer":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._child.observe(time.perf_counter() - self._start)
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: tuple) -> None:
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def time(self) -> _Timer:
+        """Context manager observing the elapsed wall-clock time."""
+        return _Timer(self)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.bounds = tuple(sorted(float(b) for b in buckets if b != math.inf))
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.bounds)
+
+    def observe(self, value: float) -> None:
+        self._default().observe(value)
+
+    def _render_child(self, values: tuple, child: _HistogramChild) -> list[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.bounds + (math.inf,), child.counts):
+            cumulative += count
+            le = f'le="{_format_value(bound)}"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}")
+        label_str = _format_labels(self.labelnames, values)
+        lines.append(f"{self.name}_sum{label_str} {_format_value(child.sum)}")
+        lines.append(f"{self.name}_count{label_str} {child.count}")
+        return lines
+
+
+class Sketch(_Metric):
+    """Streaming percentiles per label set, exposed as a Prometheus summary.
+
+    Each child is a :class:`~labs.common.sketches.DDSketch`, so memory is
+    fixed per label set and ``merged()`` combines children (e.g. every
+    station) into one fleet-wide sketch with the same error bound.
+    """
+
+    kind = "summary"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        quantiles: Iterable[float] = (0.5, 0.99, 0.999),
+        relative_accuracy: float = 0.01,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.quantiles = tuple(quantiles)
+        self.relative_accuracy = relative_accuracy
+
+    def _new_child(self) -> DDSketch:
+        return DDSketch(self.relative_accuracy)
+
+    def observe(self, value: float) -> None:
+        self._default().add(value)
+
+    def merged(self, **match: str) -> DDSketch:
+        """Merge every child whose labels equal ``match`` (all children by default)."""
+        index = {name: i for i, name in enumerate(self.labelnames)}
+        children = [
+            child
+            for values, child in self._children.items()
+            if all(values[index[k]] == v for k, v in match.items())
+        ]
+        return DDSketch.merged(children, self.relative_accuracy)
+
+    def _render_child(self, values: tuple, child: DDSketch) -> list[str]:
+        lines = []
+        for q in self.quantiles:
+            estimate = child.quantile(q)
+            quantile = f'quantile="{_format_value(q)}"'
+            lines.append(
+                f"{self.name}{_format_labels(self.labelnames, values, quantile)} "
+                f"{_format_value(math.nan if estimate is None else estimate)}"
+            )
+        label_str = _format_labels(self.labelnames, values)
+        lines.append(f"{self.name}_sum{label_str} {_format_value(child.sum)}")
+        lines.append(f"{self.name}_count{label_str} {child.count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Named collection of metrics; ``counter()`` etc. are get-or-create."""
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+
+    def _get_or_create(self, cls, name: str, documentation: str, labelnames: Sequence[str], **kwargs):
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+        elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+            raise ValueError(f"metric {name} already registered with a different type or labels")
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def sketch(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        quantiles: Iterable[float] = (0.5, 0.99, 0.999),
+        relative_accuracy: float = 0.01,
+    ) -> Sketch:
+        return self._get_or_create(
+            Sketch, name, documentation, labelnames, quantiles=quantiles, relative_accuracy=relative_accuracy
+        )
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """Return all metrics in the Prometheus text exposition format (0.0.4)."""
+        lines: list[str] = []
+        for name in sorted(self._metrics):
+            lines.extend(self._metrics[name].render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+# ── Metrics shared by all agents ────────────────────────────────────────────
+MESSAGES_SENT = REGISTRY.counter(
+    "lpg_messages_sent_total", "ACL messages sent, by agent and performative", ("agent", "performative")
+)
+MESSAGES_RECEIVED = REGISTRY.counter(
+    "lpg_messages_received_total", "ACL messages received, by agent and performative", ("agent", "performative")
+)
+BEHAVIOUR_RUN_SECONDS = REGISTRY.histogram(
+    "lpg_behaviour_run_seconds", "Time spent in one behaviour or FSM state run()", ("agent", "behaviour")
+)
+MAILBOX_DEPTH = REGISTRY.gauge("lpg_mailbox_depth", "Messages waiting to be handled", ("agent",))
+INCIDENT_HANDLING_SECONDS = REGISTRY.histogram(
+    "lpg_incident_handling_seconds",
+    "Time from an incident message arriving to it being handled",
+    ("agent",),
+)
+STATION_PPM = REGISTRY.sketch("lpg_station_ppm", "LPG concentration readings, by station", ("station",))
+RESPONDER_LATENCY_SECONDS = REGISTRY.sketch(
+    "lpg_responder_latency_seconds",
+    "Time from dispatching an incident to a responder's completion, by responder",
+    ("responder",),
+)
+
+
+class MetricsServer:
+    """Minimal asyncio HTTP server exposing ``registry`` at ``/metrics``."""
+
+    def __init__(self, registry: MetricsRegistry = REGISTRY, host: str = "127.0.0.1", port: int = 9464) -> None:
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        # report the real port when 0 was requested
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+            # discard the request headers
+            while (await asyncio.wait_for(reader.readline(), timeout=5)) not in (b"\r\n", b"\n", b""):
+                pass
+            parts = request_line.decode("latin-1").split()
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] in ("/metrics", "/"):
+                status, body = "200 OK", self.registry.render().encode("utf-8")
+            else:
+                status, body = "404 Not Found", b"not found\n"
+            writer.write(
+                f"HTTP/1.1 {status}\r\n"
+                "Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                "Connection: close\r\n\r\n".encode("latin-1") + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
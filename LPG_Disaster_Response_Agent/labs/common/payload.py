@@ -0,0 +1,215 @@
+"""Compact, versioned message payloads for the ``lpg_station_ontology``.
+
+Bodies used to be ad-hoc strings: the event name from the sensor, then
+``handle_<event>`` and ``completed_handle_<event>`` on the way to and from the
+responders, and a bare ``SHUTDOWN`` that every handler compared against.
+Version 1 of the schema replaces them with one semicolon-separated record::
+
+    1;<kind>;<event code>;<station>;<ts ms>;<correlation id>;<ppm>;<kPa>;<pump>
+
+    1;0;2;station_a;1700000000123;;612.4;955.1;1     sensor percept
+    1;1;2;station_a;1700000000125;9f3c2a1b7e4d;;;    coordinator request
+    1;2;2;station_a;1700000000131;9f3c2a1b7e4d;;;    responder completion
+    1;3;255;;1700000000200;;;;                       shutdown
+
+Empty fields are ``None``.  Station and correlation ids must not contain
+``;``; ``encode()`` rejects them rather than shift the fields after them.
+``kind`` and ``event`` are small integers
+(:class:`Kind`, :class:`~labs.common.core.EventCode`), so decoding is one
+``str.split`` plus a few ``int``/``float`` conversions, and handlers compare
+integers instead of strings.  Bodies stay plain text because XMPP carries
+text.
+
+``decode()`` also accepts the legacy bodies, so agents that still send them
+(or messages already in flight during an upgrade) keep working.  Readers must
+reject versions they do not know; fields may be *appended* in later versions
+without bumping ``SCHEMA_VERSION``.
+
+``python -m labs.common.payload --bench`` compares the parse cost with the
+legacy string handling and with JSON.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from enum import IntEnum
+from typing import NamedTuple, Optional
+
+from labs.common.core import EventCode, event_code
+
+SCHEMA_VERSION = 1
+ONTOLOGY = "lpg_station_ontology"
+_VERSION_PREFIX = f"{SCHEMA_VERSION};"
+
+
+class Kind(IntEnum):
+    PERCEPT = 0  # sensor -> coordinator
+    REQUEST = 1  # coordinator -> responder
+    COMPLETED = 2  # responder -> coordinator
+    SHUTDOWN = 3  # control
+    POSITION = 4  # responder -> coordinator, ``location`` metadata
+
+
+# EventCode members by value; a dict lookup is cheaper than EventCode(value)
+_EVENTS = {e.value: e for e in EventCode}
+_KINDS = {k.value: k for k in Kind}
+
+
+class Payload(NamedTuple):
+    """A decoded body."""
+
+    kind: Kind
+    event: EventCode = EventCode.NORMAL_CONDITION
+    station: Optional[str] = None
+    ts_ms: Optional[int] = None
+    correlation: Optional[str] = None
+    lpg_ppm: Optional[float] = None
+    pressure_kpa: Optional[float] = None
+    pump_on: Optional[bool] = None
+
+    def encode(self) -> str:
+        return encode(*self)
+
+
+_new_payload = tuple.__new__
+
+
+class PayloadError(ValueError):
+    """Raised for bodies that are neither schema v1 nor a legacy string, and
+    for ids that cannot be encoded."""
+
+
+def now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def _opt(value) -> str:
+    return "" if value is None else str(value)
+
+
+def _id(value, name: str) -> str:
+    if value is None:
+        return ""
+    text = str(value)
+    if ";" in text:
+        raise PayloadError(f"{name} may not contain ';': {text!r}")
+    return text
+
+
+def encode(
+    kind: Kind,
+    event: int = EventCode.NORMAL_CONDITION,
+    station: Optional[str] = None,
+    ts_ms: Optional[int] = None,
+    correlation: Optional[str] = None,
+    lpg_ppm: Optional[float] = None,
+    pressure_kpa: Optional[float] = None,
+    pump_on: Optional[bool] = None,
+) -> str:
+    """Encode without building a :class:`Payload` first.
+
+    Raises :class:`PayloadError` if ``station`` or ``correlation`` contains ``;``.
+    """
+    pump = "" if pump_on is None else ("1" if pump_on else "0")
+    return (
+        f"{SCHEMA_VERSION};{int(kind)};{int(event)};{_id(station, 'station')};{_opt(ts_ms)};"
+        f"{_id(correlation, 'correlation')};{_opt(lpg_ppm)};{_opt(pressure_kpa)};{pump}"
+    )
+
+
+def shutdown() -> str:
+    return encode(Kind.SHUTDOWN, EventCode.SHUTDOWN, ts_ms=now_ms())
+
+
+def decode(body: Optional[str]) -> Payload:
+    """Decode a v1 body or a legacy string body."""
+    if body is None:
+        raise PayloadError("empty body")
+    if not body.startswith(_VERSION_PREFIX):
+        return _decode_legacy(body)
+    parts = body.split(";")
+    if len(parts) < 9:
+        raise PayloadError(f"truncated payload: {body!r}")
+    try:
+        _, kind, event, station, ts, corr, ppm, kpa, pump = parts[:9]
+        return _new_payload(Payload, (
+            _KINDS[int(kind)],
+            _EVENTS[int(event)],
+            station or None,
+            int(ts) if ts else None,
+            corr or None,
+            float(ppm) if ppm else None,
+            float(kpa) if kpa else None,
+            None if not pump else pump == "1",
+        ))
+    except (KeyError, ValueError) as exc:
+        raise PayloadError(f"malformed payload {body!r}: {exc}") from None
+
+
+def _decode_legacy(body: str) -> Payload:
+    if body == "SHUTDOWN":
+        return Payload(Kind.SHUTDOWN, EventCode.SHUTDOWN)
+    if body.startswith("completed_handle_"):
+        return Payload(Kind.COMPLETED, event_code(body[len("completed_handle_"):]))
+    if body.startswith("completed_"):
+        return Payload(Kind.COMPLETED, event_code(body[len("completed_"):]))
+    if body.startswith("handle_"):
+        return Payload(Kind.REQUEST, event_code(body[len("handle_"):]))
+    if body in EventCode.__members__:
+        return Payload(Kind.PERCEPT, EventCode[body])
+    raise PayloadError(f"unrecognised body {body!r}")
+
+
+def _bench(n: int) -> None:
+    percept = encode(Kind.PERCEPT, EventCode.GAS_LEAK_CONFIRMED, "station_17", now_ms(), None, 612.4, 955.1, True)
+    as_json = json.dumps({
+        "v": 1, "kind": 0, "event": 2, "station": "station_17", "ts": now_ms(),
+        "ppm": 612.4, "kpa": 955.1, "pump": True,
+    })
+
+    def legacy() -> None:
+        # what the handlers did per message: magic compare, name lookup, f-string
+        body = "GAS_LEAK_CONFIRMED"
+        if body == "SHUTDOWN":
+            return
+        event_code(body)
+        reply = f"handle_{body}"
+        reply.startswith("handle_")
+
+    def v1() -> None:
+        p = decode(percept)
+        if p.kind is Kind.SHUTDOWN:
+            return
+        encode(Kind.REQUEST, p.event, p.station, p.ts_ms, "9f3c2a1b7e4d")
+
+    def v1_decode_only() -> None:
+        decode(percept)
+
+    def json_decode_only() -> None:
+        d = json.loads(as_json)
+        EventCode(d["event"])
+
+    cases = [
+        ("legacy string handling", legacy),
+        ("v1 decode + re-encode", v1),
+        ("v1 decode", v1_decode_only),
+        ("json decode (reference)", json_decode_only),
+    ]
+    print(f"v1 percept body: {percept!r} ({len(percept)} bytes)")
+    for label, fn in cases:
+        t0 = time.perf_counter()
+        for _ in range(n):
+            fn()
+        per_op = (time.perf_counter() - t0) / n * 1e9
+        print(f"{label:<26}{per_op:>8.0f} ns/msg")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="lpg_station_ontology payload schema")
+    parser.add_argument("--bench", action="store_true", help="benchmark parse cost")
+    parser.add_argument("-n", type=int, default=200_000)
+    args = parser.parse_args()
+    if args.bench:
+        _bench(args.n)
@@ -0,0 +1,273 @@
+"""Opt-in profiling hooks for agent behaviours and FSM states.
+
+``BehaviourProfiler`` wraps the ``run()`` coroutine of every behaviour (and of
+every state of an ``FSMBehaviour``) registered on an agent.  Wrapping happens
+only while profiling is enabled: ``disable()`` removes the wrappers again, so a
+disabled profiler costs nothing on the hot path.  While it is enabled,
+behaviours added with ``agent.add_behaviour()`` are wrapped as they are
+added; FSM states must be registered before their behaviour is added.
+
+Three collectors can be switched on independently:
+
+``wall``    wall-clock spans per behaviour (count, total, mean, max).
+``cpu``     a sampling profiler: a daemon thread samples the agent loop's stack
+            every ``interval`` seconds while a wrapped ``run()`` is executing
+            and aggregates the samples as folded stacks (flamegraph input).
+            A ``run()`` only counts as executing between its suspensions:
+            the wrapper steps the coroutine itself and clears the label
+            before handing control back to the loop, so a behaviour waiting
+            on ``receive()`` or ``sleep()`` gets no samples, and interleaved
+            behaviours never get each other's.
+``memory``  ``tracemalloc`` – net traced-memory change per behaviour plus the
+            top allocation sites at dump time.
+
+Typical use from a running system::
+
+    profiler = BehaviourProfiler.for_agent(coordinator)
+    profiler.enable("wall", "cpu")
+    ...
+    profiler.dump("profiles/")       # writes <agent>_wall.txt, <agent>_cpu.folded
+    profiler.disable()
+
+The module imports nothing from SPADE; behaviours are duck-typed.
+"""
+
+from __future__ import annotations
+
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Optional
+
+COLLECTORS = ("wall", "cpu", "memory")
+
+
+class _Span:
+    __slots__ = ("count", "total", "max", "mem_delta")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.mem_delta = 0
+
+
+class _StackSampler(threading.Thread):
+    """Samples one thread's Python stack at a fixed interval."""
+
+    def __init__(self, profiler: "BehaviourProfiler", thread_id: int, interval: float) -> None:
+        super().__init__(name="behaviour-profiler", daemon=True)
+        self.profiler = profiler
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stop_event = threading.Event()
+
+    def run(self) -> None:
+        samples = self.profiler.samples
+        while not self.stop_event.wait(self.interval):
+            label = self.profiler._active_label
+            if label is None:
+                continue
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({Path(code.co_filename).name}:{frame.f_lineno})")
+                frame = frame.f_back
+            stack.append(label)
+            samples[";".join(reversed(stack))] += 1
+
+
+class _Labelled:
+    """Awaits ``coro`` one step at a time, with ``label`` active only during each step."""
+
+    __slots__ = ("profiler", "label", "coro")
+
+    def __init__(self, profiler: "BehaviourProfiler", label: str, coro) -> None:
+        self.profiler = profiler
+        self.label = label
+        self.coro = coro
+
+    def __await__(self):
+        profiler, coro = self.profiler, self.coro
+        send, error = None, None
+        while True:
+            previous = profiler._active_label  # a wrapped run() awaiting another
+            profiler._active_label = self.label
+            try:
+                yielded = coro.send(send) if error is None else coro.throw(error)
+            except StopIteration as stop:
+                return stop.value
+            finally:
+                profiler._active_label = previous
+            try:
+                send, error = (yield yielded), None
+            except GeneratorExit:
+                coro.close()
+                raise
+            except BaseException as exc:  # cancellation and the like go to the coroutine
+                send, error = None, exc
+
+
+class BehaviourProfiler:
+    def __init__(self, agent, interval: float = 0.005) -> None:
+        self.agent = agent
+        self.interval = interval
+        self.collectors: set[str] = set()
+        self.spans: dict[str, _Span] = defaultdict(_Span)
+        self.samples: Counter[str] = Counter()
+        self._wrapped: list = []
+        # label of the wrapped run() step executing on the loop thread right now
+        self._active_label: Optional[str] = None
+        self._sampler: Optional[_StackSampler] = None
+        self._started_tracemalloc = False
+
+    @classmethod
+    def for_agent(cls, agent, **kwargs) -> "BehaviourProfiler":
+        """Return the agent's profiler, creating it on first use."""
+        profiler = getattr(agent, "profiler", None)
+        if profiler is None:
+            profiler = cls(agent, **kwargs)
+            agent.profiler = profiler
+        return profiler
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.collectors)
+
+    # ── toggling ───────────────────────────────────────────────────────
+
+    def enable(self, *collectors: str) -> None:
+        """Start the given collectors (default: all) and wrap the behaviours."""
+        requested = set(collectors or COLLECTORS)
+        unknown = requested - set(COLLECTORS)
+        if unknown:
+            raise ValueError(f"unknown collectors {sorted(unknown)}; choose from {COLLECTORS}")
+        if "memory" in requested and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        if "cpu" in requested and self._sampler is None:
+            # must be called from the thread running the agent's event loop
+            self._sampler = _StackSampler(self, threading.get_ident(), self.interval)
+            self._sampler.start()
+        self.collectors |= requested
+        self._unwrap()
+        self._wrap()
+        self._hook_add_behaviour()
+
+    def disable(self) -> None:
+        """Stop all collectors and restore the original ``run`` methods."""
+        self.agent.__dict__.pop("add_behaviour", None)
+        self._unwrap()
+        self.collectors.clear()
+        if self._sampler is not None:
+            self._sampler.stop_event.set()
+            self._sampler = None
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def reset(self) -> None:
+        self.spans.clear()
+        self.samples.clear()
+
+    # ── wrapping ───────────────────────────────────────────────────────
+
+    @staticmethod
+    def _targets(behaviours):
+        for behaviour in behaviours:
+            states = getattr(behaviour, "get_states", None)
+            if states is not None:
+                for name, state in states().items():
+                    yield name, state
+            else:
+                yield type(behaviour).__name__, behaviour
+
+    def _wrap(self, behaviours=None) -> None:
+        for label, target in self._targets(list(self.agent.behaviours) if behaviours is None else behaviours):
+            if "run" in vars(target):
+                continue  # already wrapped
+            original = target.run
+            target.run = self._make_wrapper(label, original)
+            self._wrapped.append(target)
+
+    def _hook_add_behaviour(self) -> None:
+        original = getattr(self.agent, "add_behaviour", None)
+        if original is None or "add_behaviour" in vars(self.agent):
+            return
+        profiler = self
+
+        def add_behaviour(behaviour, *args, **kwargs):
+            result = original(behaviour, *args, **kwargs)
+            if profiler.enabled:
+                profiler._wrap([behaviour])
+            return result
+
+        self.agent.add_behaviour = add_behaviour
+
+    def _unwrap(self) -> None:
+        for target in self._wrapped:
+            target.__dict__.pop("run", None)
+        self._wrapped.clear()
+
+    def _make_wrapper(self, label: str, original):
+        profiler = self
+
+        async def run():
+            memory = "memory" in profiler.collectors
+            mem_before = tracemalloc.get_traced_memory()[0] if memory else 0
+            t0 = time.perf_counter()
+            try:
+                return await _Labelled(profiler, label, original())
+            finally:
+                elapsed = time.perf_counter() - t0
+                span = profiler.spans[label]
+                span.count += 1
+                span.total += elapsed
+                if elapsed > span.max:
+                    span.max = elapsed
+                if memory:
+                    span.mem_delta += tracemalloc.get_traced_memory()[0] - mem_before
+
+        return run
+
+    # ── reporting ──────────────────────────────────────────────────────
+
+    def report(self) -> str:
+        lines = [f"{'behaviour':<28}{'runs':>8}{'total_s':>12}{'mean_ms':>10}{'max_ms':>10}{'mem_kb':>10}"]
+        for label, span in sorted(self.spans.items(), key=lambda kv: -kv[1].total):
+            mean_ms = span.total / span.count * 1000 if span.count else 0.0
+            lines.append(
+                f"{label:<28}{span.count:>8}{span.total:>12.4f}{mean_ms:>10.3f}"
+                f"{span.max * 1000:>10.3f}{span.mem_delta / 1024:>10.1f}"
+            )
+        return "\n".join(lines) + "\n"
+
+    def dump(self, directory="profiles", top: int = 25) -> list[Path]:
+        """Write the aggregated results to ``directory``; return the file paths."""
+        out = Path(directory)
+        out.mkdir(parents=True, exist_ok=True)
+        prefix = getattr(self.agent, "name", None) or str(self.agent.jid)
+        written = []
+
+        path = out / f"{prefix}_wall.txt"
+        path.write_text(self.report(), encoding="utf-8")
+        written.append(path)
+
+        if self.samples:
+            path = out / f"{prefix}_cpu.folded"
+            path.write_text(
+                "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common()),
+                encoding="utf-8",
+            )
+            written.append(path)
+
+        if tracemalloc.is_tracing():
+            stats = tracemalloc.take_snapshot().statistics("lineno")[:top]
+            path = out / f"{prefix}_memory.txt"
+            path.write_text("".join(f"{stat}\n" for stat in stats), encoding="utf-8")
+            written.append(path)
+        return written
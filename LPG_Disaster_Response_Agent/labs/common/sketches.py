@@ -0,0 +1,213 @@
+"""Mergeable streaming quantile sketches (DDSketch).
+
+Percentiles of gas concentration or incident latency cannot be computed from
+fixed histogram buckets without knowing the range in advance, and keeping every
+sample is not affordable.  ``DDSketch`` maps each value ``x > 0`` to the bucket
+``ceil(log_gamma(x))`` with ``gamma = (1 + a) / (1 - a)`` and only counts
+per bucket.  Negative values use a mirrored store, and values very close to
+zero share one bucket.
+
+Error bound
+    For any quantile ``q`` the value returned by ``quantile(q)`` is within a
+    relative error ``a`` (``relative_accuracy``, 1 % by default) of the
+    sample at rank ``q``: ``|estimate - x_q| <= a * |x_q|``.  The bound does
+    not depend on the number of samples or on their distribution.
+
+Memory
+    At most ``max_bins`` buckets are kept per sketch (2048 by default, a few
+    tens of KB).  With ``a = 0.01`` that covers a dynamic range of about
+    ``gamma ** 2048 ~ 1e17`` before any collapsing happens.  When the limit is
+    hit, the buckets of the lowest values are merged: the smallest positive
+    ones and the largest-magnitude negative ones.  Only low quantiles lose
+    accuracy; p50/p99/p999 stay within the bound.  Later values below the
+    collapsed edge go straight into the edge bucket, so collapsing costs O(1)
+    amortised per insert.
+
+Merging
+    Two sketches with the same ``relative_accuracy`` merge exactly by adding
+    bucket counts.  Per-station or per-process sketches can therefore be
+    combined into a fleet-wide view without losing accuracy.  ``to_dict()`` and
+    ``from_dict()`` move a sketch between processes.
+"""
+
+from __future__ import annotations
+
+import math
+from typing import Iterable, Optional
+
+MIN_INDEXABLE = 1e-9  # |x| below this is counted in the zero bucket
+
+
+class DDSketch:
+    __slots__ = ("relative_accuracy", "max_bins", "gamma", "_log_gamma", "_pos", "_neg", "_pos_edge",
+                 "_neg_edge", "zero_count", "count", "sum", "min", "max")
+
+    def __init__(self, relative_accuracy: float = 0.01, max_bins: int = 2048) -> None:
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be in (0, 1)")
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self._pos: dict[int, int] = {}
+        self._neg: dict[int, int] = {}
+        # outermost key kept once a store has collapsed: the lowest positive
+        # key, the highest (largest-magnitude) negative one
+        self._pos_edge: Optional[int] = None
+        self._neg_edge: Optional[int] = None
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    # ── updates ────────────────────────────────────────────────────────
+
+    def add(self, value: float, weight: int = 1) -> None:
+        if value > MIN_INDEXABLE:
+            key = math.ceil(math.log(value) / self._log_gamma)
+            if self._pos_edge is not None and key < self._pos_edge:
+                key = self._pos_edge
+            self._pos[key] = self._pos.get(key, 0) + weight
+            if len(self._pos) > self.max_bins:
+                self._pos_edge = self._collapse(self._pos, self._pos_edge, 1)
+        elif value < -MIN_INDEXABLE:
+            key = math.ceil(math.log(-value) / self._log_gamma)
+            if self._neg_edge is not None and key > self._neg_edge:
+                key = self._neg_edge
+            self._neg[key] = self._neg.get(key, 0) + weight
+            if len(self._neg) > self.max_bins:
+                self._neg_edge = self._collapse(self._neg, self._neg_edge, -1)
+        else:
+            self.zero_count += weight
+        self.count += weight
+        self.sum += value * weight
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    # the metrics registry's summary children use ``observe``
+    observe = add
+
+    def _collapse(self, store: dict[int, int], edge: Optional[int], step: int) -> int:
+        """Fold the outermost buckets inwards (``step`` 1: upwards, -1: downwards)
+        until ``store`` fits; return the new edge key."""
+        if edge is None:
+            edge = min(store) if step > 0 else max(store)
+        while len(store) > self.max_bins:
+            inner = edge + step
+            while inner not in store:
+                inner += step
+            store[inner] += store.pop(edge)
+            edge = inner
+        return edge
+
+    def merge(self, other: "DDSketch") -> None:
+        """Add ``other``'s samples to this sketch."""
+        if not math.isclose(other.gamma, self.gamma):
+            raise ValueError("cannot merge sketches with different relative accuracy")
+        edge = self._pos_edge
+        for key, n in other._pos.items():
+            if edge is not None and key < edge:
+                key = edge
+            self._pos[key] = self._pos.get(key, 0) + n
+        if len(self._pos) > self.max_bins:
+            self._pos_edge = self._collapse(self._pos, edge, 1)
+        edge = self._neg_edge
+        for key, n in other._neg.items():
+            if edge is not None and key > edge:
+                key = edge
+            self._neg[key] = self._neg.get(key, 0) + n
+        if len(self._neg) > self.max_bins:
+            self._neg_edge = self._collapse(self._neg, edge, -1)
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @classmethod
+    def merged(
+        cls, sketches: Iterable["DDSketch"], relative_accuracy: float = 0.01, max_bins: Optional[int] = None
+    ) -> "DDSketch":
+        """Merge ``sketches`` into a new one, keeping at most ``max_bins`` buckets.
+
+        ``max_bins`` defaults to the largest limit among the inputs.
+        """
+        sketches = list(sketches)
+        if max_bins is None:
+            max_bins = max((s.max_bins for s in sketches), default=2048)
+        total = cls(relative_accuracy, max_bins)
+        for sketch in sketches:
+            total.merge(sketch)
+        return total
+
+    # ── queries ────────────────────────────────────────────────────────
+
+    def _value(self, key: int) -> float:
+        # midpoint (in relative terms) of (gamma^(key-1), gamma^key]
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate the ``q``-quantile (0 <= q <= 1); ``None`` when empty."""
+        if not 0 <= q <= 1:
+            raise ValueError("q must be in [0, 1]")
+        if not self.count:
+            return None
+        # the extremes are tracked exactly
+        if q == 0:
+            return self.min
+        if q == 1:
+            return self.max
+        return min(max(self._estimate(q * (self.count - 1)), self.min), self.max)
+
+    def _estimate(self, rank: float) -> float:
+        seen = 0
+        for key in sorted(self._neg, reverse=True):
+            seen += self._neg[key]
+            if seen > rank:
+                return -self._value(key)
+        seen += self.zero_count
+        if seen > rank:
+            return 0.0
+        for key in sorted(self._pos):
+            seen += self._pos[key]
+            if seen > rank:
+                return self._value(key)
+        return self.max
+
+    def quantiles(self, qs: Iterable[float] = (0.5, 0.99, 0.999)) -> dict[float, Optional[float]]:
+        return {q: self.quantile(q) for q in qs}
+
+    @property
+    def bins(self) -> int:
+        return len(self._pos) + len(self._neg) + (1 if self.zero_count else 0)
+
+    # ── serialisation ──────────────────────────────────────────────────
+
+    def to_dict(self) -> dict:
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "max_bins": self.max_bins,
+            "pos": self._pos.copy(),
+            "neg": self._neg.copy(),
+            "zero": self.zero_count,
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min,
+            "max": self.max,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "DDSketch":
+        sketch = cls(data["relative_accuracy"], data.get("max_bins", 2048))
+        # JSON turns int keys into strings
+        sketch._pos = {int(k): n for k, n in data["pos"].items()}
+        sketch._neg = {int(k): n for k, n in data["neg"].items()}
+        sketch.zero_count = data["zero"]
+        sketch.count = data["count"]
+        sketch.sum = data["sum"]
+        sketch.min = data["min"]
+        sketch.max = data["max"]
+        return sketch
@@ -0,0 +1,221 @@
+"""Per-station hazard thresholds, reloaded from a config file while agents run.
+
+An indoor bottling hall and an open forecourt should not raise a WARNING at
+the same ppm.  ``ThresholdRegistry`` maps a station id to its
+:class:`~labs.common.core.Thresholds`: its own entry, else its station
+class's, else the default.  The config is JSON::
+
+    {
+      "default": {"warning": 200, "danger": 500, "critical": 900},
+      "classes": {
+        "indoor_bottling": {"warning": 100, "danger": 250, "critical": 500},
+        "open_forecourt": {"warning": 300}
+      },
+      "stations": {
+        "sensor_agent": "indoor_bottling",
+        "S00042": {"class": "open_forecourt", "danger": 600}
+      }
+    }
+
+Every section is optional.  A class entry overrides the default's values, and
+a station entry overrides its class's (or the default's).  A station given
+as a string just names its class.
+
+Every station's thresholds are resolved when the config is loaded, so
+``classify(ppm, station)`` is one dict lookup plus a bisect over the three
+boundaries.  The resolved table is immutable and is replaced in a single
+assignment.  A perception step therefore sees either the old config or the
+new one, never a mix, and never waits for a reload.
+
+``await registry.start(path)`` loads the file and then checks it every
+``interval`` seconds.  When the file's mtime or size changes, it is read and
+validated in a worker thread, off the event loop, and then swapped in.  An
+invalid file is reported and the previous thresholds stay in force, so write
+the config to a temporary file and rename it over the old one.  Reloads are
+counted in ``lpg_threshold_reloads_total``.
+
+The module has no SPADE dependency.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+from dataclasses import dataclass, fields, replace
+from pathlib import Path
+from typing import Optional
+
+from labs.common.core import DEFAULT_THRESHOLDS, Thresholds
+from labs.common.metrics import REGISTRY
+
+THRESHOLD_RELOADS = REGISTRY.counter("lpg_threshold_reloads_total", "Threshold config reloads", ("result",))
+
+_LEVELS = tuple(f.name for f in fields(Thresholds) if f.init)
+
+
+class ThresholdConfigError(ValueError):
+    """The threshold config cannot be read or is inconsistent."""
+
+
+@dataclass(frozen=True)
+class ThresholdTable:
+    default: Thresholds
+    classes: dict[str, Thresholds]
+    stations: dict[str, Thresholds]  # resolved: every configured station
+    station_class: dict[str, str]
+    generation: int = 0
+
+
+def _section(config: dict, name: str) -> dict:
+    section = config.get(name, {})
+    if not isinstance(section, dict):
+        raise ThresholdConfigError(f"{name} must be an object")
+    return section
+
+
+def _override(base: Thresholds, entry: dict, where: str) -> Thresholds:
+    if not isinstance(entry, dict):
+        raise ThresholdConfigError(f"{where}: expected an object")
+    unknown = set(entry) - set(_LEVELS)
+    if unknown:
+        raise ThresholdConfigError(f"{where}: unknown keys {sorted(unknown)}")
+    try:
+        return replace(base, **{key: float(value) for key, value in entry.items()})
+    except (TypeError, ValueError) as exc:
+        raise ThresholdConfigError(f"{where}: {exc}") from None
+
+
+def parse_config(config: dict, generation: int = 0) -> ThresholdTable:
+    """Validate a config dict and resolve every station's thresholds."""
+    if not isinstance(config, dict):
+        raise ThresholdConfigError("config must be a JSON object")
+    unknown = set(config) - {"default", "classes", "stations"}
+    if unknown:
+        raise ThresholdConfigError(f"unknown sections {sorted(unknown)}")
+    default = _override(DEFAULT_THRESHOLDS, config.get("default", {}), "default")
+    classes = {name: _override(default, entry, f"class {name!r}") for name, entry in _section(config, "classes").items()}
+    stations, station_class = {}, {}
+    for station, entry in _section(config, "stations").items():
+        if isinstance(entry, str):
+            entry = {"class": entry}
+        if not isinstance(entry, dict):
+            raise ThresholdConfigError(f"station {station!r}: expected a class name or an object")
+        entry = dict(entry)
+        cls = entry.pop("class", None)
+        if cls is not None:
+            if cls not in classes:
+                raise ThresholdConfigError(f"station {station!r}: unknown class {cls!r}")
+            station_class[station] = cls
+        stations[station] = _override(classes.get(cls, default), entry, f"station {station!r}")
+    return ThresholdTable(default, classes, stations, station_class, generation)
+
+
+class ThresholdRegistry:
+    def __init__(self, default: Thresholds = DEFAULT_THRESHOLDS) -> None:
+        self._table = ThresholdTable(default, {}, {}, {})
+        self.path: Optional[Path] = None
+        self.interval = 1.0
+        self._signature: Optional[tuple[int, int]] = None
+        self._task: Optional[asyncio.Task] = None
+        self.last_error: Optional[str] = None
+
+    # ── lookups ────────────────────────────────────────────────────────
+
+    @property
+    def table(self) -> ThresholdTable:
+        return self._table
+
+    @property
+    def generation(self) -> int:
+        return self._table.generation
+
+    def for_station(self, station: Optional[str] = None) -> Thresholds:
+        table = self._table
+        return table.stations.get(station, table.default)
+
+    def classify(self, lpg_ppm: float, station: Optional[str] = None) -> str:
+        table = self._table
+        return table.stations.get(station, table.default).classify(lpg_ppm)
+
+    def station_class(self, station: str) -> Optional[str]:
+        return self._table.station_class.get(station)
+
+    # ── loading ────────────────────────────────────────────────────────
+
+    def configure(self, config: dict) -> ThresholdTable:
+        """Replace the thresholds with ``config`` (same format as the file)."""
+        self._table = parse_config(config, self._table.generation + 1)
+        return self._table
+
+    def load(self, path) -> ThresholdTable:
+        """Read ``path`` and swap it in; raises ``ThresholdConfigError`` and keeps the old table on failure."""
+        self.path = Path(path)
+        if not self._apply(self._read(None)):
+            raise ThresholdConfigError(self.last_error)
+        return self._table
+
+    def reload_if_changed(self) -> bool:
+        """Swap in the file if it changed since the last read; True if the thresholds changed."""
+        return self._apply(self._read(self._signature))
+
+    def _read(self, known: Optional[tuple[int, int]]) -> tuple[Optional[tuple[int, int]], object]:
+        """``(signature, table or error message)``; ``(known, None)`` if unchanged.
+
+        Touches no registry state, so it can run in a worker thread.
+        """
+        try:
+            stat = os.stat(self.path)
+        except OSError as exc:
+            return None, f"{self.path}: {exc.strerror}"
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if signature == known:
+            return known, None
+        try:
+            with open(self.path, "rb") as fh:
+                config = json.load(fh)
+            return signature, parse_config(config, self._table.generation + 1)
+        except (OSError, ValueError) as exc:  # ThresholdConfigError and JSONDecodeError are ValueErrors
+            return signature, f"{self.path}: {exc}"
+
+    def _apply(self, result) -> bool:
+        signature, outcome = result
+        if outcome is None:
+            return False
+        if signature is not None:
+            self._signature = signature  # a broken file is not re-read until it changes again
+        if isinstance(outcome, ThresholdTable):
+            self._table = outcome  # one assignment: readers see the old table or the new one
+            self.last_error = None
+            THRESHOLD_RELOADS.labels("ok").inc()
+            return True
+        if outcome != self.last_error:
+            print(f"[Thresholds] keeping previous thresholds: {outcome}")
+            THRESHOLD_RELOADS.labels("error").inc()
+        self.last_error = outcome
+        return False
+
+    async def start(self, path, interval: float = 1.0) -> None:
+        """Load ``path`` now, then reload it whenever it changes."""
+        self.load(path)
+        self.interval = interval
+        if self._task is None:
+            self._task = asyncio.create_task(self._watcher())
+
+    async def close(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _watcher(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            self._apply(await asyncio.to_thread(self._read, self._signature))
+
+
+THRESHOLDS = ThresholdRegistry()
@@ -0,0 +1,443 @@
+"""Binary event tracing for agent hot paths.
+
+A ``print`` per coordinator dispatch, responder request or FSM state entry
+is a synchronous write to stdout on the agent loop, and its output cannot be
+parsed afterwards.  ``Tracer.emit()`` instead packs one fixed-size record
+into a preallocated ring buffer::
+
+    <q  ts      wall clock, ns since the epoch (traces of several processes merge)
+     H  agent   interned agent name
+     H  code    event code from Tracer.define()
+     i  a       \\
+     i  b        }  arguments, 32-bit
+     i  c       /
+     q  d       argument, 64-bit (incident ids)
+
+32 bytes, nothing allocated: a trace point costs a clock read and a
+``struct.pack_into`` (``python -m labs.common.tracing --bench``).
+
+Events are defined once, at import time, with the meaning of each argument::
+
+    DISPATCH = TRACER.define("coordinator.dispatch", responder="str", event="event",
+                             station="str", incident="hex")
+    TRACER.emit(DISPATCH, agent_id, TRACER.intern(jid), code, TRACER.intern(station), hex_id(incident))
+
+Argument kinds are ``int``, ``str`` (an id from ``intern()``), ``event`` (an
+:class:`~labs.common.core.EventCode`) and ``hex`` (an id such as a
+coordinator incident id, see :func:`hex_id`).
+
+The ring holds the last ``capacity`` records whether or not anything reads
+it.  ``await TRACER.start(path)`` adds a background flusher that copies new
+records out every ``interval`` seconds and writes them to ``path`` off the
+event loop, together with any names interned or events defined since the last
+flush; with ``echo=True`` it also writes them to stdout as text, one write per
+batch.  Records overwritten before a flush are counted in ``dropped``.  The
+tracer is meant for one event loop; it takes no locks.
+
+``python -m labs.common.tracing trace.bin [more.bin ...]`` renders the files
+as one timeline (``--agent``/``--event`` filter it, ``--summary`` counts the
+events instead).
+
+The module has no SPADE dependency.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import heapq
+import json
+import os
+import struct
+import sys
+import tempfile
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+from labs.common.core import EventCode
+
+RECORD = struct.Struct("<qHHiiiq")
+MAGIC = b"LPGTRACE1\n"
+BLOCK = struct.Struct("<cI")  # b"M" + JSON length, or b"R" + record count
+KINDS = ("int", "str", "event", "hex")
+SLOTS = 4
+
+_time_ns = time.time_ns
+_pack_into = RECORD.pack_into
+
+
+def hex_id(value: Optional[str]) -> int:
+    """A hex id such as ``"3fa2c81b09de"`` as an int for a ``hex`` argument (0 if it is not one)."""
+    try:
+        return int(value[:15], 16) if value else 0  # 60 bits fit the signed slot
+    except ValueError:
+        return 0
+
+
+@dataclass
+class EventDef:
+    code: int
+    name: str
+    args: tuple[tuple[str, str], ...]  # (name, kind) per slot in use
+
+
+@dataclass
+class Names:
+    """Interned strings and event definitions, shared by the tracer and the decoder."""
+
+    strings: list[str] = field(default_factory=lambda: [""])
+    events: dict[int, EventDef] = field(default_factory=dict)
+
+    def render(self, record: tuple) -> str:
+        ts, agent, code, *values = record
+        event = self.events.get(code)
+        if event is None:
+            return f"{self.string(agent)} event#{code} {values}"
+        parts = [f"{name}={self._value(kind, value)}" for (name, kind), value in zip(event.args, values)]
+        return " ".join([f"{self.string(agent)} {event.name}", *parts])
+
+    def string(self, index: int) -> str:
+        return self.strings[index] if 0 <= index < len(self.strings) else f"#{index}"
+
+    def _value(self, kind: str, value: int) -> str:
+        if kind == "str":
+            return self.string(value) or "-"
+        if kind == "event":
+            try:
+                return EventCode(value).name
+            except ValueError:
+                return str(value)
+        if kind == "hex":
+            return f"{value:012x}" if value else "-"
+        return str(value)
+
+
+def format_time(ts_ns: int) -> str:
+    seconds, ns = divmod(ts_ns, 1_000_000_000)
+    return time.strftime("%H:%M:%S", time.localtime(seconds)) + f".{ns // 1000:06d}"
+
+
+class Tracer:
+    def __init__(self, capacity: int = 1 << 16) -> None:
+        if capacity < 1 or capacity & (capacity - 1):
+            raise ValueError("capacity must be a power of two")
+        self.capacity = capacity
+        self._mask = capacity - 1
+        self._ring = bytearray(capacity * RECORD.size)
+        self._head = 0  # records emitted so far
+        self._tail = 0  # records collected by the flusher so far
+        self.names = Names()
+        self._ids = {"": 0}
+        self._by_name: dict[str, int] = {}
+        self._strings_sent = 0
+        self._events_sent = 0
+        self._dropped_sent = 0
+        self.dropped = 0
+
+        self.path: Optional[Path] = None
+        self.echo = False
+        self.interval = 0.25
+        self._fh = None
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._closing = False
+
+    # ── recording ──────────────────────────────────────────────────────
+
+    def define(self, name: str, **args: str) -> int:
+        """Event code for ``name``; keyword order gives the argument slots."""
+        if name in self._by_name:
+            return self._by_name[name]
+        if len(args) > SLOTS:
+            raise ValueError(f"at most {SLOTS} arguments per event")
+        unknown = set(args.values()) - set(KINDS)
+        if unknown:
+            raise ValueError(f"unknown argument kinds {sorted(unknown)}")
+        if list(args.values())[:SLOTS - 1].count("hex"):
+            raise ValueError("only the last (64-bit) argument can be a hex id")
+        code = len(self._by_name) + 1
+        self._by_name[name] = code
+        self.names.events[code] = EventDef(code, name, tuple(args.items()))
+        return code
+
+    def intern(self, value: Optional[str]) -> int:
+        """Id of ``value`` in the string table (0 for ``None`` and ``""``)."""
+        if not value:
+            return 0
+        index = self._ids.get(value)
+        if index is None:
+            index = self._ids[value] = len(self.names.strings)
+            self.names.strings.append(value)
+        return index
+
+    def emit(self, code: int, agent: int, a: int = 0, b: int = 0, c: int = 0, d: int = 0) -> None:
+        head = self._head
+        self._head = head + 1
+        _pack_into(self._ring, (head & self._mask) * 32, _time_ns(), agent, code, a, b, c, d)
+
+    @property
+    def emitted(self) -> int:
+        return self._head
+
+    def records(self) -> list[tuple]:
+        """The records still in the ring, oldest first (for tests and debugging)."""
+        start = max(0, self._head - self.capacity)
+        return list(RECORD.iter_unpack(self._span(start, self._head)))
+
+    def _span(self, start: int, stop: int) -> bytes:
+        if start == stop:
+            return b""
+        i0 = (start & self._mask) * RECORD.size
+        i1 = (stop & self._mask) * RECORD.size
+        if i0 < i1:
+            return bytes(self._ring[i0:i1])
+        return bytes(self._ring[i0:]) + bytes(self._ring[:i1])  # wrapped, or the whole ring
+
+    # ── flushing ───────────────────────────────────────────────────────
+
+    def collect(self) -> tuple[bytes, bytes]:
+        """Take the records emitted since the last call.
+
+        Returns ``(blocks, records)``: the file blocks to append (metadata
+        first, if any names are new) and the raw records alone.
+        """
+        head = self._head
+        start = max(self._tail, head - self.capacity)
+        self.dropped += start - self._tail
+        self._tail = head
+        records = self._span(start, head)
+
+        blocks = []
+        strings, events = self.names.strings, self.names.events
+        if (
+            self._strings_sent < len(strings)
+            or self._events_sent < len(events)
+            or self._dropped_sent != self.dropped
+        ):
+            meta = {
+                "strings_from": self._strings_sent,
+                "strings": strings[self._strings_sent:],
+                "events": [
+                    {"code": e.code, "name": e.name, "args": [list(arg) for arg in e.args]}
+                    for e in list(events.values())[self._events_sent:]
+                ],
+                "dropped": self.dropped,
+            }
+            data = json.dumps(meta, separators=(",", ":")).encode("utf-8")
+            blocks.append(BLOCK.pack(b"M", len(data)) + data)
+            self._strings_sent, self._events_sent = len(strings), len(events)
+            self._dropped_sent = self.dropped
+        if records:
+            blocks.append(BLOCK.pack(b"R", len(records) // RECORD.size) + records)
+        return b"".join(blocks), records
+
+    async def start(self, path=None, echo: bool = False, interval: float = 0.25) -> None:
+        """Flush to ``path`` (and/or stdout with ``echo``) every ``interval`` seconds."""
+        if self._task is not None:
+            return
+        self.echo = echo
+        self.interval = interval
+        self.path = Path(path) if path else None
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._fh = open(self.path, "wb")
+            self._fh.write(MAGIC)
+            # a new file needs every name again
+            self._strings_sent = self._events_sent = 0
+            self._dropped_sent = -1
+        self._tail = self._head  # what was emitted before start() is not written
+        self._wake = asyncio.Event()
+        self._closing = False
+        self._task = asyncio.create_task(self._flusher())
+
+    async def close(self) -> None:
+        if self._task is None:
+            return
+        self._closing = True
+        self._wake.set()
+        await self._task
+        self._task = None
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+    async def _flusher(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            blocks, records = self.collect()
+            if blocks:
+                await asyncio.to_thread(self._write, blocks, records)
+            if self._closing:
+                return
+
+    def _write(self, blocks: bytes, records: bytes) -> None:
+        if self._fh is not None:
+            self._fh.write(blocks)
+            self._fh.flush()
+        if self.echo and records:
+            render = self.names.render
+            sys.stdout.write(
+                "".join(f"{format_time(r[0])} {render(r)}\n" for r in RECORD.iter_unpack(records))
+            )
+            sys.stdout.flush()
+
+
+TRACER = Tracer()
+
+
+# ── decoding ────────────────────────────────────────────────────────────
+
+
+@dataclass
+class Trace:
+    path: Path
+    names: Names = field(default_factory=Names)
+    records: list[tuple] = field(default_factory=list)
+    dropped: int = 0
+    torn: bool = False  # the file ends in a partial block
+
+    def render(self, record: tuple) -> str:
+        return self.names.render(record)
+
+
+def read_trace(path) -> Trace:
+    """Decode a trace file written by ``Tracer.start(path)``."""
+    trace = Trace(Path(path))
+    data = Path(path).read_bytes()
+    if not data.startswith(MAGIC):
+        raise ValueError(f"{path}: not a trace file")
+    pos = len(MAGIC)
+    while pos < len(data):
+        if pos + BLOCK.size > len(data):
+            trace.torn = True
+            break
+        kind, size = BLOCK.unpack_from(data, pos)
+        pos += BLOCK.size
+        length = size if kind == b"M" else size * RECORD.size
+        if pos + length > len(data):
+            trace.torn = True
+            break
+        chunk = data[pos:pos + length]
+        pos += length
+        if kind == b"M":
+            meta = json.loads(chunk)
+            strings = trace.names.strings
+            del strings[meta["strings_from"]:]
+            strings.extend(meta["strings"])
+            for event in meta["events"]:
+                args = tuple((name, kind) for name, kind in event["args"])
+                trace.names.events[event["code"]] = EventDef(event["code"], event["name"], args)
+            trace.dropped = meta["dropped"]
+        elif kind == b"R":
+            trace.records.extend(RECORD.iter_unpack(chunk))
+        else:
+            raise ValueError(f"{path}: unknown block {kind!r} at byte {pos - BLOCK.size}")
+    return trace
+
+
+def timeline(
+    traces: Iterable[Trace],
+    agents: Optional[set[str]] = None,
+    events: Optional[list[str]] = None,
+) -> Iterator[tuple[int, str]]:
+    """``(ts_ns, line)`` for every matching record of ``traces``, merged by time."""
+
+    def lines(trace: Trace):
+        names = trace.names
+        for record in sorted(trace.records):
+            if agents and names.string(record[1]) not in agents:
+                continue
+            if events:
+                event = names.events.get(record[2])
+                if event is None or not any(event.name.startswith(p) for p in events):
+                    continue
+            yield record[0], names.render(record)
+
+    return heapq.merge(*(lines(t) for t in traces))
+
+
+def _bench(n: int) -> None:
+    tracer = Tracer()
+    agent = tracer.intern("coordinator@localhost")
+    code = tracer.define("bench.dispatch", responder="str", event="event", station="str", incident="hex")
+    responder, station = tracer.intern("responder1@localhost"), tracer.intern("station-7")
+    incident = hex_id("3fa2c81b09de")
+    emit = tracer.emit
+    t0 = time.perf_counter()
+    for _ in range(n):
+        emit(code, agent, responder, 2, station, incident)
+    traced = (time.perf_counter() - t0) / n
+
+    with open(os.devnull, "w") as devnull:
+        t0 = time.perf_counter()
+        for _ in range(n):
+            print(f"[Coordinator] sent REQUEST to responder1@localhost: GAS_LEAK_CONFIRMED incident={incident:x}",
+                  file=devnull)
+        printed = (time.perf_counter() - t0) / n
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench.bin"
+
+        async def flush() -> float:
+            await tracer.start(path)
+            for _ in range(tracer.capacity // 2):
+                emit(code, agent, responder, 2, station, incident)
+            t0 = time.perf_counter()
+            await tracer.close()
+            return time.perf_counter() - t0
+
+        flushed = asyncio.run(flush())
+        size = path.stat().st_size
+        t0 = time.perf_counter()
+        trace = read_trace(path)
+        decoded = time.perf_counter() - t0
+    print(f"emit            {traced * 1e9:8.0f} ns/record")
+    print(f"print(devnull)  {printed * 1e9:8.0f} ns/line")
+    print(f"flush           {flushed * 1e3:8.2f} ms for {len(trace.records)} records ({size} bytes)")
+    print(f"decode          {decoded * 1e3:8.2f} ms")
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Render binary agent traces as a timeline")
+    parser.add_argument("paths", nargs="*", help="trace files written by Tracer.start()")
+    parser.add_argument("--agent", action="append", help="only these agents")
+    parser.add_argument("--event", action="append", help="only events whose name starts with this")
+    parser.add_argument("--summary", action="store_true", help="count events per agent instead")
+    parser.add_argument("--bench", action="store_true", help="time trace points against print()")
+    parser.add_argument("-n", type=int, default=1_000_000, help="trace points for --bench")
+    args = parser.parse_args(argv)
+    if args.bench:
+        _bench(args.n)
+        return
+    if not args.paths:
+        parser.print_help()
+        return
+
+    traces = [read_trace(p) for p in args.paths]
+    for trace in traces:
+        if trace.dropped or trace.torn:
+            print(f"# {trace.path}: {trace.dropped} records dropped{', torn tail' if trace.torn else ''}")
+    if args.summary:
+        counts: Counter = Counter()
+        for trace in traces:
+            for record in trace.records:
+                event = trace.names.events.get(record[2])
+                counts[trace.names.string(record[1]), event.name if event else f"#{record[2]}"] += 1
+        for (agent, event), count in sorted(counts.items()):
+            print(f"{count:>10}  {agent:<28} {event}")
+        return
+    first = None
+    for ts, line in timeline(traces, set(args.agent or ()), args.event):
+        first = ts if first is None else first
+        print(f"{format_time(ts)} +{(ts - first) / 1e9:10.6f}  {line}")
+
+
+if __name__ == "__main__":
+    main()
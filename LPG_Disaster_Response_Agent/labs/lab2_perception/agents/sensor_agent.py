@@ -18,13 +18,18 @@ Event types
     GAS_LEAK_CONFIRMED   – sustained dangerous concentration
     CRITICAL_GAS_LEVEL   – immediate evacuation required
 
+Hazards are classified with the agent's station thresholds
+(``labs.common.thresholds``); ``--thresholds PATH`` loads them from a JSON
+file and reloads it when it changes.
+
 Usage
 -----
-    python lab2_perception/agents/sensor_agent.py
+    python lab2_perception/agents/sensor_agent.py [--thresholds PATH]
 """
 
 from __future__ import annotations
 
+import argparse
 import asyncio
 import logging
 import os
@@ -42,68 +47,46 @@ from spade.behaviour import PeriodicBehaviour
 _SCRIPT_DIR = Path(__file__).resolve().parent          # …/agents/
 _LAB2_DIR = _SCRIPT_DIR.parent                         # …/lab2_perception/
 
-# Allow imports from the lab2_perception package
+# Allow imports from the lab2_perception package and the shared labs.common
 sys.path.insert(0, str(_LAB2_DIR.parent))              # …/labs/
+sys.path.insert(0, str(_LAB2_DIR.parent.parent))       # project root
 
 from lab2_perception.environment.simulated_lpg_station import SimulatedLPGStation  # noqa: E402
+from labs.common.core import (  # noqa: E402,F401  (thresholds live in labs.common.core)
+    PPM_CRITICAL,
+    PPM_DANGER,
+    PPM_WARNING,
+    classify_hazard,
+    determine_event,
+)
+from labs.common.thresholds import THRESHOLDS  # noqa: E402
 
 # ---------------------------------------------------------------------------
 # Logging configuration – writes to  logs/events_lab2.log
+# Handlers (and the logs/ directory) are created on first use so that merely
+# importing this module has no filesystem side effects.
 # ---------------------------------------------------------------------------
 _LOG_DIR = _LAB2_DIR / "logs"
-_LOG_DIR.mkdir(parents=True, exist_ok=True)
 _LOG_FILE = _LOG_DIR / "events_lab2.log"
 
 logger = logging.getLogger("SensorAgent")
 logger.setLevel(logging.INFO)
 
-_file_handler = logging.FileHandler(_LOG_FILE, mode="a", encoding="utf-8")
-_file_handler.setFormatter(logging.Formatter("%(message)s"))
-logger.addHandler(_file_handler)
-
-# Also echo to stdout so the user can follow along
-_stream_handler = logging.StreamHandler(sys.stdout)
-_stream_handler.setFormatter(logging.Formatter("%(message)s"))
-logger.addHandler(_stream_handler)
-
-
-# ── Perception thresholds ──────────────────────────────────────────────────
-PPM_WARNING  = 200
-PPM_DANGER   = 500
-PPM_CRITICAL = 900
 
+def _configure_logging() -> None:
+    """Attach the file and console handlers if not already configured."""
+    if logger.handlers:
+        return
+    _LOG_DIR.mkdir(parents=True, exist_ok=True)
 
-# ===========================================================================
-# Hazard classification helpers
-# ===========================================================================
+    _file_handler = logging.FileHandler(_LOG_FILE, mode="a", encoding="utf-8")
+    _file_handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_file_handler)
 
-def classify_hazard(lpg_ppm: float) -> str:
-    """Return a hazard level string based on gas concentration (ppm).
-
-    Thresholds are aligned with common industrial safety references:
-        <200 ppm  → NORMAL
-        200–499   → WARNING
-        500–899   → DANGER
-        ≥900      → CRITICAL
-    """
-    if lpg_ppm >= PPM_CRITICAL:
-        return "CRITICAL"
-    if lpg_ppm >= PPM_DANGER:
-        return "DANGER"
-    if lpg_ppm >= PPM_WARNING:
-        return "WARNING"
-    return "NORMAL"
-
-
-def determine_event(hazard_level: str) -> str:
-    """Map a hazard level to the corresponding percept event type."""
-    mapping = {
-        "NORMAL":   "NORMAL_CONDITION",
-        "WARNING":  "POSSIBLE_GAS_LEAK",
-        "DANGER":   "GAS_LEAK_CONFIRMED",
-        "CRITICAL": "CRITICAL_GAS_LEVEL",
-    }
-    return mapping.get(hazard_level, "NORMAL_CONDITION")
+    # Also echo to stdout so the user can follow along
+    _stream_handler = logging.StreamHandler(sys.stdout)
+    _stream_handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_stream_handler)
 
 
 # ===========================================================================
@@ -134,7 +117,7 @@ class PerceptionBehaviour(PeriodicBehaviour):
         pressure = readings["tank_pressure_kpa"]
         pump = readings["pump_state"]
 
-        hazard = classify_hazard(lpg_ppm)
+        hazard = THRESHOLDS.classify(lpg_ppm, self.agent.name)
         event = determine_event(hazard)
 
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -167,6 +150,7 @@ class SensorAgent(Agent):
 
     async def setup(self) -> None:
         """Attach the periodic perception behaviour."""
+        _configure_logging()
         print(f"[SensorAgent] Setup complete for JID: {self.jid}")
         station = SimulatedLPGStation()
         behaviour = PerceptionBehaviour(
@@ -180,12 +164,14 @@ class SensorAgent(Agent):
 # Entry point
 # ===========================================================================
 
-async def main() -> None:
+async def main(thresholds_path: str | None = None) -> None:
     """Start the SensorAgent against the local XMPP server."""
     jid = "sensor_agent@localhost"
     password = "password"
 
     agent = SensorAgent(jid=jid, password=password)
+    if thresholds_path:
+        await THRESHOLDS.start(thresholds_path)
 
     try:
         await asyncio.wait_for(agent.start(auto_register=True), timeout=15)
@@ -207,7 +193,12 @@ async def main() -> None:
         print("\n[SensorAgent] Interrupt received. Stopping…")
         if agent.is_alive():
             await agent.stop()
+    finally:
+        await THRESHOLDS.close()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="Lab 2 LPG station sensor agent")
+    parser.add_argument("--thresholds", metavar="PATH", help="hazard thresholds per station (JSON, hot-reloaded)")
+    args = parser.parse_args()
+    asyncio.run(main(args.thresholds))
@@ -0,0 +1,270 @@
+"""Declarative incident scenarios compiled to pre-generated NumPy traces.
+
+``SimulatedLPGStation`` supports one hard-coded normal/leak cycle and draws
+every value from ``random`` on demand.  A *scenario* instead describes a
+sequence of phases – slow leaks, sudden ruptures, pressure-only faults, pump
+failures – and is compiled once into arrays.  All random numbers for a phase
+are drawn as one block from a seeded ``numpy.random.Generator``, so producing
+a tick is just indexing and the same seed always yields the same trace.
+
+A scenario can be written as plain data (e.g. loaded from JSON)::
+
+    {
+        "name": "leak_then_pump_fault",
+        "seed": 7,
+        "phases": [
+            {"kind": "normal", "ticks": 10},
+            {"kind": "slow_leak", "ticks": 30, "rate": [5, 15]},
+            {"kind": "pump_failure", "ticks": 5},
+        ],
+    }
+
+Phase kinds and their parameters (ranges are ``[low, high]`` per tick):
+
+``normal``          ppm ``[0, 200]``; pressure walk ``step`` ±5 kPa; pump ON with
+                    probability ``pump_on`` (0.8).
+``leak``            the original station leak: ppm = 200 + elapsed * ``slope``
+                    ``[80, 120]``; pressure drops ``drop`` ``[5, 25]``.
+``slow_leak``       ppm rises by ``rate`` ``[5, 15]``; pressure drops ``drop`` ``[1, 5]``.
+``rupture``         ppm jumps to ``peak`` ``[1000, 1500]`` with ``noise`` ±50;
+                    pressure drops ``drop`` ``[30, 60]``.
+``pressure_fault``  normal ppm; pressure drops ``drop`` ``[5, 25]``.
+``pump_failure``    normal ppm; pump OFF; pressure creeps ``creep`` ``[0, 2]``.
+
+Pressure walks are clipped to ``[400, 1200]`` kPa after accumulation and ppm
+is capped at 1500, as in the original station.
+
+``ScenarioStation`` exposes the same ``get_current_readings()`` API as
+``SimulatedLPGStation`` and can be handed to any perception behaviour.
+"""
+
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable, Optional
+
+import numpy as np
+
+PPM_CAP = 1500.0
+PRESSURE_MIN = 400.0
+PRESSURE_MAX = 1200.0
+
+_PHASE_DEFAULTS: dict[str, dict] = {
+    "normal": {"ppm": (0.0, 200.0), "step": (-5.0, 5.0), "pump_on": 0.8},
+    "leak": {"slope": (80.0, 120.0), "drop": (5.0, 25.0)},
+    "slow_leak": {"rate": (5.0, 15.0), "drop": (1.0, 5.0)},
+    "rupture": {"peak": (1000.0, 1500.0), "noise": (-50.0, 50.0), "drop": (30.0, 60.0)},
+    "pressure_fault": {"ppm": (0.0, 200.0), "drop": (5.0, 25.0)},
+    "pump_failure": {"ppm": (0.0, 200.0), "creep": (0.0, 2.0)},
+}
+PHASE_KINDS = tuple(_PHASE_DEFAULTS)
+
+
+@dataclass
+class Phase:
+    kind: str
+    ticks: int
+    params: dict = field(default_factory=dict)
+
+    def __post_init__(self) -> None:
+        if self.kind not in _PHASE_DEFAULTS:
+            raise ValueError(f"unknown phase kind {self.kind!r}; choose from {PHASE_KINDS}")
+        if self.ticks < 1:
+            raise ValueError("a phase needs at least one tick")
+        unknown = set(self.params) - set(_PHASE_DEFAULTS[self.kind])
+        if unknown:
+            raise ValueError(f"unknown parameters for {self.kind}: {sorted(unknown)}")
+
+    def param(self, name: str):
+        return self.params.get(name, _PHASE_DEFAULTS[self.kind][name])
+
+
+@dataclass
+class Scenario:
+    name: str
+    phases: list[Phase]
+    seed: int = 0
+    initial_pressure: Optional[float] = None  # drawn from [950, 1100] if None
+
+    @classmethod
+    def from_dict(cls, spec: dict) -> "Scenario":
+        phases = []
+        for raw in spec["phases"]:
+            raw = dict(raw)
+            kind = raw.pop("kind")
+            ticks = int(raw.pop("ticks"))
+            phases.append(Phase(kind, ticks, raw))
+        return cls(
+            name=spec.get("name", "scenario"),
+            phases=phases,
+            seed=int(spec.get("seed", 0)),
+            initial_pressure=spec.get("initial_pressure"),
+        )
+
+    @classmethod
+    def load(cls, path) -> "Scenario":
+        return cls.from_dict(json.loads(Path(path).read_text(encoding="utf-8")))
+
+    @property
+    def ticks(self) -> int:
+        return sum(p.ticks for p in self.phases)
+
+    def with_seed(self, seed: int) -> "Scenario":
+        return Scenario(self.name, self.phases, seed, self.initial_pressure)
+
+    def compile(self) -> "ScenarioTrace":
+        return compile_scenario(self)
+
+
+@dataclass
+class ScenarioTrace:
+    """Pre-generated readings for every tick of a scenario."""
+
+    name: str
+    seed: int
+    lpg_ppm: np.ndarray
+    tank_pressure_kpa: np.ndarray
+    pump_on: np.ndarray
+    phase_index: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.lpg_ppm)
+
+    def readings(self, tick: int) -> dict:
+        return {
+            "lpg_ppm": float(self.lpg_ppm[tick]),
+            "tank_pressure_kpa": float(self.tank_pressure_kpa[tick]),
+            "pump_state": "ON" if self.pump_on[tick] else "OFF",
+        }
+
+
+def compile_scenario(scenario: Scenario) -> ScenarioTrace:
+    """Draw all random blocks for ``scenario`` and return its trace."""
+    rng = np.random.default_rng(scenario.seed)
+    n = scenario.ticks
+    ppm = np.empty(n)
+    pressure = np.empty(n)
+    pump = np.empty(n, dtype=bool)
+    phase_index = np.empty(n, dtype=np.int16)
+
+    last_ppm = 50.0
+    last_pressure = (
+        float(scenario.initial_pressure)
+        if scenario.initial_pressure is not None
+        else float(rng.uniform(950, 1100))
+    )
+    start = 0
+    for idx, phase in enumerate(scenario.phases):
+        end = start + phase.ticks
+        p_ppm, p_pressure, p_pump = _generate(phase, rng, last_ppm, last_pressure)
+        ppm[start:end] = p_ppm
+        pressure[start:end] = p_pressure
+        pump[start:end] = p_pump
+        phase_index[start:end] = idx
+        last_ppm, last_pressure = float(p_ppm[-1]), float(p_pressure[-1])
+        start = end
+
+    return ScenarioTrace(
+        name=scenario.name,
+        seed=scenario.seed,
+        lpg_ppm=np.round(np.minimum(ppm, PPM_CAP), 1),
+        tank_pressure_kpa=np.round(pressure, 1),
+        pump_on=pump,
+        phase_index=phase_index,
+    )
+
+
+def _walk(start: float, steps: np.ndarray) -> np.ndarray:
+    return np.clip(start + np.cumsum(steps), PRESSURE_MIN, PRESSURE_MAX)
+
+
+def _generate(phase: Phase, rng: np.random.Generator, ppm0: float, pressure0: float):
+    n = phase.ticks
+    kind = phase.kind
+    p = phase.param
+    if kind == "normal":
+        ppm = rng.uniform(*p("ppm"), size=n)
+        pressure = _walk(pressure0, rng.uniform(*p("step"), size=n))
+        pump = rng.random(n) < p("pump_on")
+    elif kind == "leak":
+        elapsed = np.arange(1, n + 1)
+        ppm = 200.0 + elapsed * rng.uniform(*p("slope"), size=n)
+        pressure = _walk(pressure0, -rng.uniform(*p("drop"), size=n))
+        pump = np.ones(n, dtype=bool)
+    elif kind == "slow_leak":
+        ppm = ppm0 + np.cumsum(rng.uniform(*p("rate"), size=n))
+        pressure = _walk(pressure0, -rng.uniform(*p("drop"), size=n))
+        pump = np.ones(n, dtype=bool)
+    elif kind == "rupture":
+        ppm = rng.uniform(*p("peak")) + rng.uniform(*p("noise"), size=n)
+        pressure = _walk(pressure0, -rng.uniform(*p("drop"), size=n))
+        pump = np.ones(n, dtype=bool)
+    elif kind == "pressure_fault":
+        ppm = rng.uniform(*p("ppm"), size=n)
+        pressure = _walk(pressure0, -rng.uniform(*p("drop"), size=n))
+        pump = np.ones(n, dtype=bool)
+    else:  # pump_failure
+        ppm = rng.uniform(*p("ppm"), size=n)
+        pressure = _walk(pressure0, rng.uniform(*p("creep"), size=n))
+        pump = np.zeros(n, dtype=bool)
+    return np.maximum(ppm, 0.0), pressure, pump
+
+
+class ScenarioStation:
+    """Drop-in replacement for ``SimulatedLPGStation`` replaying a trace.
+
+    With ``loop=True`` the trace restarts after its last tick; otherwise the
+    final reading is repeated.
+    """
+
+    def __init__(self, scenario, loop: bool = False) -> None:
+        self.trace = scenario if isinstance(scenario, ScenarioTrace) else compile_scenario(scenario)
+        self.loop = loop
+        self._tick = 0
+
+    def get_current_readings(self) -> dict:
+        n = len(self.trace)
+        tick = self._tick % n if self.loop else min(self._tick, n - 1)
+        self._tick += 1
+        return self.trace.readings(tick)
+
+
+# ── Built-in scenario library ────────────────────────────────────────────────
+SCENARIOS: dict[str, Scenario] = {
+    "station_cycle": Scenario("station_cycle", [Phase("normal", 10), Phase("leak", 8)]),
+    "slow_leak": Scenario("slow_leak", [Phase("normal", 10), Phase("slow_leak", 90)]),
+    "sudden_rupture": Scenario("sudden_rupture", [Phase("normal", 15), Phase("rupture", 10)]),
+    "pressure_fault": Scenario("pressure_fault", [Phase("normal", 10), Phase("pressure_fault", 20)]),
+    "pump_failure": Scenario("pump_failure", [Phase("normal", 10), Phase("pump_failure", 20)]),
+    "multi_phase": Scenario(
+        "multi_phase",
+        [
+            Phase("normal", 10),
+            Phase("pressure_fault", 5),
+            Phase("slow_leak", 20),
+            Phase("rupture", 5),
+            Phase("pump_failure", 5),
+            Phase("normal", 10),
+        ],
+    ),
+}
+
+
+def build_corpus(
+    names: Optional[Iterable[str]] = None,
+    per_scenario: int = 100,
+    base_seed: int = 0,
+) -> list[ScenarioTrace]:
+    """Compile ``per_scenario`` seeded variants of each named built-in scenario.
+
+    Variant ``i`` of every scenario uses seed ``base_seed + i``, so any single
+    trace can be regenerated from its ``(name, seed)`` pair.
+    """
+    corpus = []
+    for name in names or SCENARIOS:
+        scenario = SCENARIOS[name]
+        for i in range(per_scenario):
+            corpus.append(compile_scenario(scenario.with_seed(base_seed + i)))
+    return corpus
@@ -2,87 +2,176 @@
 
 Implements reactive behavior using a Finite State Machine to transition between:
 Idle -> Alert -> Assessment -> Response -> Completion
+
+With a ``sensor_jid`` the Assessment state asks the sensor for its last
+``HISTORY_SAMPLES`` readings (FIPA ``query-ref``) and escalates an early
+warning whose ppm is rising fast.  Messages that arrive while it waits for
+the reply are kept and handled by the Idle state afterwards.
+
+The decisions and state timings live in :mod:`labs.lab3_fsm.policy` so that
+:mod:`labs.lab3_fsm.evaluator` can run them without SPADE.  Each state entry
+is recorded as an ``fsm.state`` trace event (:mod:`labs.common.tracing`)
+instead of being announced on stdout.
 """
 from spade.agent import Agent
 from spade.behaviour import FSMBehaviour, State
 from spade.message import Message
 import asyncio
+import sys
+import time
+import uuid
+from pathlib import Path
+
+if __package__ in (None, ""):
+    # executed as a script: make the project root importable
+    sys.path.insert(0, str(Path(__file__).resolve().parents[3]))
+
+from labs.common.history import HistoryQueryError, decode_history, format_query, summarize  # noqa: E402
+from labs.common.metrics import (  # noqa: E402
+    BEHAVIOUR_RUN_SECONDS,
+    INCIDENT_HANDLING_SECONDS,
+    MAILBOX_DEPTH,
+    MESSAGES_RECEIVED,
+)
+from labs.common.tracing import TRACER  # noqa: E402
+from labs.lab3_fsm.policy import (  # noqa: E402
+    ALERT_SECONDS,
+    ASSESSMENT_SECONDS,
+    COMPLETION_SECONDS,
+    HISTORY_SAMPLES,
+    HISTORY_TIMEOUT,
+    RESPONSE_SECONDS,
+    STATE_ALERT,
+    STATE_ASSESSMENT,
+    STATE_COMPLETION,
+    STATE_IDLE,
+    STATE_RESPONSE,
+    assess,
+    is_abnormal,
+)
+
+TRACE_STATE = TRACER.define("fsm.state", state="str", event="str")
 
-STATE_IDLE = "IdleState"
-STATE_ALERT = "AlertState"
-STATE_ASSESSMENT = "AssessmentState"
-STATE_RESPONSE = "ResponseState"
-STATE_COMPLETION = "CompletionState"
 
 class IdleState(State):
     async def run(self):
-        msg = await self.receive(timeout=3.0)
+        if self.agent.deferred:
+            msg = self.agent.deferred.pop(0)
+        else:
+            msg = await self.receive(timeout=3.0)
+        if msg and (msg.thread or "").startswith("history-"):
+            msg = None  # reply to a history query that already timed out
         if msg:
+            MESSAGES_RECEIVED.labels(self.agent.name, msg.get_metadata("performative") or "none").inc()
             event = msg.body
             if event == "SHUTDOWN":
                 print("[FSM] Shutting down.")
                 await self.agent.stop()
                 return
             
-            if event != "NORMAL_CONDITION":
-                print(f"\n[FSM] IdleState: Abnormal condition detected! Event received: {event}")
+            if is_abnormal(event):
                 self.agent.current_event = event
+                self.agent.incident_started = time.monotonic()
                 self.set_next_state(STATE_ALERT)
             else:
-                print("[FSM] IdleState: All normal. Monitoring...")
                 self.set_next_state(STATE_IDLE)
         else:
             self.set_next_state(STATE_IDLE)
 
 class AlertState(State):
     async def run(self):
-        print("[FSM] AlertState: Sounding initial alarms and validating hazard.")
-        await asyncio.sleep(0.5) 
+        await asyncio.sleep(ALERT_SECONDS)
         self.set_next_state(STATE_ASSESSMENT)
 
 class AssessmentState(State):
+    async def query_history(self):
+        """Ask the sensor for recent readings; ``None`` if it cannot answer in time."""
+        thread = f"history-{uuid.uuid4().hex[:8]}"  # IdleState drops late replies by this prefix
+        query = Message(to=self.agent.sensor_jid, thread=thread)
+        query.set_metadata("performative", "query-ref")
+        query.body = format_query(last=HISTORY_SAMPLES)
+        await self.send(query)
+
+        deadline = time.monotonic() + HISTORY_TIMEOUT
+        while (remaining := deadline - time.monotonic()) > 0:
+            msg = await self.receive(timeout=remaining)
+            if msg is None:
+                break
+            if msg.thread != thread:
+                self.agent.deferred.append(msg)
+                continue
+            if msg.get_metadata("performative") != "inform":
+                print(f"[FSM] AssessmentState: sensor could not answer: {msg.body}")
+                return None
+            try:
+                return summarize(*decode_history(msg.body))
+            except HistoryQueryError as exc:
+                print(f"[FSM] AssessmentState: {exc}")
+                return None
+        print("[FSM] AssessmentState: no history from the sensor, assessing the event alone.")
+        return None
+
     async def run(self):
         event = self.agent.current_event
-        print(f"[FSM] AssessmentState: Assessing severity of {event}...")
-        await asyncio.sleep(0.5)
-        
-        if event in ["GAS_LEAK_CONFIRMED", "CRITICAL_GAS_LEVEL"]:
-            print("[FSM] AssessmentState: High risk confirmed! Moving to Response.")
-            self.set_next_state(STATE_RESPONSE)
-        elif event == "POSSIBLE_GAS_LEAK":
-            print("[FSM] AssessmentState: Early warning, no active leak yet. Returning to monitoring.")
-            self.set_next_state(STATE_COMPLETION)
-        else:
-            self.set_next_state(STATE_COMPLETION)
+        context = await self.query_history() if self.agent.sensor_jid else None
+        if context is None:
+            await asyncio.sleep(ASSESSMENT_SECONDS)
+        elif context["count"]:
+            print(
+                f"[FSM] AssessmentState: last {context['count']} readings "
+                f"{context['ppm_min']}-{context['ppm_max']} ppm, trend {context['ppm_slope']:+.1f} ppm/s"
+            )
+
+        next_state, reason = assess(event, context)
+        if reason:
+            print(f"[FSM] AssessmentState: {reason}")
+        self.set_next_state(next_state)
 
 class ResponseState(State):
     async def run(self):
         event = self.agent.current_event
-        print(f"[FSM] ResponseState: Executing emergency protocols for {event}!")
         if event == "CRITICAL_GAS_LEVEL":
             print(" ----> EVACUATE STATION! SHUTTING DOWN MAIN VALVES!")
         else:
             print(" ----> ALERTING STAFF! VENTILATION ON.")
         
-        await asyncio.sleep(0.5)
-        print("[FSM] ResponseState: Emergency protocols engaged.")
+        await asyncio.sleep(RESPONSE_SECONDS)
         self.set_next_state(STATE_COMPLETION)
 
 class CompletionState(State):
     async def run(self):
-        print("[FSM] CompletionState: Incident handled. Resetting systems...")
         self.agent.current_event = None
-        await asyncio.sleep(0.5)
-        print("-" * 50)
+        if self.agent.incident_started is not None:
+            INCIDENT_HANDLING_SECONDS.labels(self.agent.name).observe(time.monotonic() - self.agent.incident_started)
+            self.agent.incident_started = None
+        await asyncio.sleep(COMPLETION_SECONDS)
         self.set_next_state(STATE_IDLE)
 
 
+class TimedFSMBehaviour(FSMBehaviour):
+    """FSMBehaviour that traces each state entry and records its run time."""
+
+    async def _run(self):
+        state = self.current_state
+        TRACER.emit(TRACE_STATE, self.agent.trace_id, TRACER.intern(state), TRACER.intern(self.agent.current_event))
+        t0 = time.perf_counter()
+        await super()._run()
+        BEHAVIOUR_RUN_SECONDS.labels(self.agent.name, state).observe(time.perf_counter() - t0)
+
+
 class DisasterFSMAgent(Agent):
+    def __init__(self, jid, password, *args, sensor_jid=None, **kwargs):
+        super().__init__(jid, password, *args, **kwargs)
+        self.sensor_jid = sensor_jid  # queried for context during assessment
+        self.deferred = []  # messages received while waiting for that context
+        self.trace_id = TRACER.intern(self.name)
+
     async def setup(self):
         print(f"[DisasterFSMAgent] Setup complete for {self.jid}")
         self.current_event = None
+        self.incident_started = None
         
-        fsm = FSMBehaviour()
+        fsm = TimedFSMBehaviour()
         fsm.add_state(name=STATE_IDLE, state=IdleState(), initial=True)
         fsm.add_state(name=STATE_ALERT, state=AlertState())
         fsm.add_state(name=STATE_ASSESSMENT, state=AssessmentState())
@@ -101,6 +190,14 @@ class DisasterFSMAgent(Agent):
         fsm.add_transition(source=STATE_COMPLETION, dest=STATE_IDLE)
         
         self.add_behaviour(fsm)
+        MAILBOX_DEPTH.labels(self.name).set_function(self.mailbox_depth)
+
+    def mailbox_depth(self):
+        return sum(b.mailbox_size() for b in self.behaviours if b.queue)
+
+    async def stop(self):
+        MAILBOX_DEPTH.remove(self.name)
+        await super().stop()
 
 async def main():
     agent = DisasterFSMAgent("fsm_agent@localhost", "password")
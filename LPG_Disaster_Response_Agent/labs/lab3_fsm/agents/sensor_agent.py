@@ -3,6 +3,14 @@
 This agent connects to the local XMPP server, periodically reads the
 simulated LPG station environment, classifies hazard severity, generates
 percept events, and sends them via XMPP messages to the FSM Agent.
+
+Readings are also kept in a ``ReadingHistory`` so the FSM's assessment step
+can ask for recent context with a ``query-ref`` (``last=<n>`` or
+``seconds=<s>``) instead of the sensor sending full telemetry.
+
+Hazard levels use the thresholds the shared registry
+(:mod:`labs.common.thresholds`) holds for the agent's name, so they follow
+the threshold config file while the agent runs.
 """
 
 from __future__ import annotations
@@ -17,12 +25,21 @@ from spade.agent import Agent
 from spade.behaviour import PeriodicBehaviour
 from spade.message import Message
 
-# Resolve paths
-_SCRIPT_DIR = Path(__file__).resolve().parent
-_LAB3_DIR = _SCRIPT_DIR.parent
-sys.path.insert(0, str(_LAB3_DIR.parent))
-
-from lab2_perception.environment.simulated_lpg_station import SimulatedLPGStation  # noqa: E402
+if __package__ in (None, ""):
+    # executed as a script: make the project root importable
+    sys.path.insert(0, str(Path(__file__).resolve().parents[3]))
+
+from labs.lab2_perception.environment.simulated_lpg_station import SimulatedLPGStation  # noqa: E402
+from labs.common.core import (  # noqa: E402,F401  (re-exported for compatibility)
+    PPM_CRITICAL,
+    PPM_DANGER,
+    PPM_WARNING,
+    classify_hazard,
+    determine_event,
+)
+from labs.common.history import ReadingHistory  # noqa: E402
+from labs.common.history_query import HistoryQueryBehaviour  # noqa: E402
+from labs.common.thresholds import THRESHOLDS  # noqa: E402
 
 logger = logging.getLogger("SensorAgent")
 logger.setLevel(logging.INFO)
@@ -30,28 +47,6 @@ _stream_handler = logging.StreamHandler(sys.stdout)
 _stream_handler.setFormatter(logging.Formatter("%(message)s"))
 logger.addHandler(_stream_handler)
 
-PPM_WARNING  = 200
-PPM_DANGER   = 500
-PPM_CRITICAL = 900
-
-def classify_hazard(lpg_ppm: float) -> str:
-    if lpg_ppm >= PPM_CRITICAL:
-        return "CRITICAL"
-    if lpg_ppm >= PPM_DANGER:
-        return "DANGER"
-    if lpg_ppm >= PPM_WARNING:
-        return "WARNING"
-    return "NORMAL"
-
-def determine_event(hazard_level: str) -> str:
-    mapping = {
-        "NORMAL":   "NORMAL_CONDITION",
-        "WARNING":  "POSSIBLE_GAS_LEAK",
-        "DANGER":   "GAS_LEAK_CONFIRMED",
-        "CRITICAL": "CRITICAL_GAS_LEVEL",
-    }
-    return mapping.get(hazard_level, "NORMAL_CONDITION")
-
 class PerceptionBehaviour(PeriodicBehaviour):
     def __init__(self, period: float, station: SimulatedLPGStation, target_jid: str) -> None:
         super().__init__(period=period)
@@ -62,11 +57,12 @@ class PerceptionBehaviour(PeriodicBehaviour):
 
     async def run(self) -> None:
         readings = self.station.get_current_readings()
+        self.agent.history.append(readings)
         lpg_ppm = readings["lpg_ppm"]
         pressure = readings["tank_pressure_kpa"]
         pump = readings["pump_state"]
 
-        hazard = classify_hazard(lpg_ppm)
+        hazard = THRESHOLDS.classify(lpg_ppm, self.agent.name)
         event = determine_event(hazard)
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
@@ -101,6 +97,7 @@ class SensorAgent(Agent):
     def __init__(self, jid: str, password: str, target_jid: str, *args, **kwargs):
         super().__init__(jid, password, *args, **kwargs)
         self.target_jid = target_jid
+        self.history = ReadingHistory()
 
     async def setup(self) -> None:
         logger.info(f"[SensorAgent] Setup complete for JID: {self.jid}")
@@ -111,6 +108,7 @@ class SensorAgent(Agent):
             target_jid=self.target_jid
         )
         self.add_behaviour(behaviour)
+        self.add_behaviour(HistoryQueryBehaviour(lambda msg: self.history), HistoryQueryBehaviour.TEMPLATE)
 
 async def main() -> None:
     jid = "sensor_agent@localhost"
@@ -0,0 +1,267 @@
+"""Headless Monte Carlo evaluation of the Lab 3 FSM response policy.
+
+Trying a change to the Idle → Alert → Assessment → Response logic on the
+live Lab 3 setup takes minutes per scenario.  This module runs the same
+decision functions (:mod:`labs.lab3_fsm.policy`) on simulator output with a
+virtual clock instead: no XMPP and no sleeping.  A state "takes" its
+``*_SECONDS`` by moving the clock forward.
+
+One *incident* is a randomly chosen built-in scenario
+(:mod:`labs.lab2_perception.environment.scenarios`) with a random seed and
+sensor phase.  Trace ticks are 2 s apart with linear interpolation in
+between.  The sensor sends one event per ``period``, as the Lab 3 sensor
+does.  The FSM takes them from its mailbox oldest first, so events
+queue up while it is busy, just as they do live.  The Assessment step sees
+the last ``HISTORY_SAMPLES`` readings, as if it had queried the sensor,
+unless ``history=False``.
+
+Each incident is scored against the trace itself:
+
+time to response
+    Time from the trace first reaching DANGER to the first ResponseState
+    entry after the trace first reached WARNING.  It is negative when the
+    policy responded early.
+missed escalation
+    The trace reached DANGER but no response followed.
+false alarm
+    A response more than ``confirm_window`` seconds away from every tick of
+    a leak phase (``leak``, ``slow_leak``, ``rupture``).
+
+``evaluate()`` spreads incidents over a process pool.  Run
+``python -m labs.lab3_fsm.evaluator --incidents 5000`` to print the
+distributions.  Use ``--policy module:function`` to evaluate another
+``assess`` function on the same incidents.
+
+The module has no SPADE dependency.
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Optional, Sequence
+
+import numpy as np
+
+from labs.common.core import PPM_DANGER, PPM_WARNING, classify_hazard, determine_event
+from labs.common.history import summarize
+from labs.lab2_perception.environment.scenarios import SCENARIOS, compile_scenario
+from labs.lab3_fsm import policy as fsm
+
+DEFAULT_POLICY = "labs.lab3_fsm.policy:assess"
+TRACE_DT = 2.0  # seconds between scenario-trace ticks
+LEAK_PHASES = ("leak", "slow_leak", "rupture")
+
+
+@dataclass
+class Outcome:
+    scenario: str
+    seed: int
+    responses: list[float]
+    time_to_response: Optional[float]  # None unless the trace reached DANGER and was answered
+    missed: bool
+    false_alarms: int
+
+
+def load_policy(spec: str) -> Callable:
+    module, _, name = spec.partition(":")
+    return getattr(importlib.import_module(module), name or "assess")
+
+
+def _crossing(times: Sequence[float], values: Sequence[float], level: float) -> Optional[float]:
+    """First time the piecewise-linear trace reaches ``level``."""
+    for i, value in enumerate(values):
+        if value >= level:
+            if i == 0:
+                return times[0]
+            prev = values[i - 1]
+            return times[i - 1] + (times[i] - times[i - 1]) * (level - prev) / (value - prev)
+    return None
+
+
+def run_incident(
+    trace,
+    assess: Callable = fsm.assess,
+    period: float = 2.0,
+    offset: float = 0.0,
+    history: bool = True,
+    confirm_window: float = 10.0,
+    leaking: Optional[Sequence[bool]] = None,
+) -> Outcome:
+    """Run the FSM over one trace.
+
+    Trace ticks are ``TRACE_DT`` apart with linear interpolation in between.
+    The sensor reads at ``offset + k * period``.  ``leaking`` marks the ticks
+    that are part of a real leak and defaults to the ticks at DANGER or above.
+    A response more than ``confirm_window`` seconds from any of them is a
+    false alarm.
+    """
+    truth = np.asarray(trace.lpg_ppm, dtype=float)
+    tick_times = np.arange(len(truth)) * TRACE_DT
+    times = np.arange(offset, tick_times[-1] + 1e-9, period)
+    ppm = np.round(np.interp(times, tick_times, truth), 1)
+    ts_ms = (times * 1000).astype(np.int64)
+    responses: list[float] = []
+    now = 0.0
+    for k, (t, value) in enumerate(zip(times.tolist(), ppm.tolist())):
+        now = max(now, t)  # IdleState takes the oldest message
+        event = determine_event(classify_hazard(value))
+        if not fsm.is_abnormal(event):
+            continue
+        now += fsm.ALERT_SECONDS
+        context = None
+        if history:
+            # the sensor answers with whatever it has read by now
+            last = int(np.searchsorted(times, now, side="right")) - 1
+            first = max(0, last + 1 - fsm.HISTORY_SAMPLES)
+            context = summarize(ts_ms[first:last + 1].tolist(), {"lpg_ppm": ppm[first:last + 1].tolist()})
+        else:
+            now += fsm.ASSESSMENT_SECONDS
+        state, _ = assess(event, context)
+        if state == fsm.STATE_RESPONSE:
+            responses.append(now)
+            now += fsm.RESPONSE_SECONDS
+        now += fsm.COMPLETION_SECONDS
+
+    tick_list, truth_list = tick_times.tolist(), truth.tolist()
+    danger = _crossing(tick_list, truth_list, PPM_DANGER)
+    warning = _crossing(tick_list, truth_list, PPM_WARNING)
+    time_to_response = None
+    missed = False
+    if danger is not None:
+        answered = [r for r in responses if r >= warning]
+        if answered:
+            time_to_response = answered[0] - danger
+        else:
+            missed = True
+    if leaking is None:
+        leaking = truth >= PPM_DANGER
+    leak_times = tick_times[np.asarray(leaking, dtype=bool)]
+    false_alarms = sum(
+        1 for r in responses if not leak_times.size or np.abs(leak_times - r).min() > confirm_window
+    )
+    return Outcome(trace.name, trace.seed, responses, time_to_response, missed, false_alarms)
+
+
+def incident_params(index: int, base_seed: int, scenarios: Sequence[str], period: float) -> tuple[str, int, float]:
+    rng = random.Random(base_seed * 1_000_003 + index)
+    return rng.choice(list(scenarios)), rng.randrange(2**31), rng.uniform(0.0, period)
+
+
+def _run_chunk(args) -> list[Outcome]:
+    indices, base_seed, scenarios, policy_spec, period, history, confirm_window = args
+    assess = load_policy(policy_spec)
+    outcomes = []
+    for index in indices:
+        name, seed, offset = incident_params(index, base_seed, scenarios, period)
+        scenario = SCENARIOS[name].with_seed(seed)
+        trace = compile_scenario(scenario)
+        leaking = [scenario.phases[i].kind in LEAK_PHASES for i in trace.phase_index]
+        outcomes.append(run_incident(trace, assess, period, offset, history, confirm_window, leaking))
+    return outcomes
+
+
+@dataclass
+class Report:
+    policy: str
+    outcomes: list[Outcome] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    @property
+    def incidents(self) -> int:
+        return len(self.outcomes)
+
+    def times(self) -> list[float]:
+        return sorted(o.time_to_response for o in self.outcomes if o.time_to_response is not None)
+
+    def percentile(self, q: float) -> float:
+        values = self.times()
+        return values[min(len(values) - 1, int(q * len(values)))] if values else math.nan
+
+    @property
+    def missed(self) -> int:
+        return sum(o.missed for o in self.outcomes)
+
+    @property
+    def false_alarms(self) -> int:
+        return sum(o.false_alarms for o in self.outcomes)
+
+    def by_scenario(self) -> dict[str, "Report"]:
+        groups: dict[str, Report] = {}
+        for outcome in self.outcomes:
+            groups.setdefault(outcome.scenario, Report(self.policy)).outcomes.append(outcome)
+        return dict(sorted(groups.items()))
+
+    def line(self, label: str) -> str:
+        times = self.times()
+        mean = sum(times) / len(times) if times else math.nan
+        return (
+            f"{label:<28} {self.incidents:>9} {mean:>7.2f} {self.percentile(0.5):>7.2f} "
+            f"{self.percentile(0.95):>7.2f} {self.percentile(1.0):>7.2f} {self.missed:>7} {self.false_alarms:>7}"
+        )
+
+
+HEADER = f"{'':<28} {'incidents':>9} {'mean':>7} {'p50':>7} {'p95':>7} {'max':>7} {'missed':>7} {'false':>7}"
+
+
+def evaluate(
+    incidents: int = 1000,
+    policy: str = DEFAULT_POLICY,
+    workers: Optional[int] = None,
+    scenarios: Optional[Sequence[str]] = None,
+    base_seed: int = 0,
+    period: float = 2.0,
+    history: bool = True,
+    confirm_window: float = 10.0,
+    chunk: int = 250,
+) -> Report:
+    """Run ``incidents`` randomized incidents; the same ``base_seed`` gives the same incidents."""
+    scenarios = list(scenarios or SCENARIOS)
+    jobs = [
+        (range(start, min(start + chunk, incidents)), base_seed, scenarios, policy, period, history, confirm_window)
+        for start in range(0, incidents, chunk)
+    ]
+    t0 = time.perf_counter()
+    report = Report(policy)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(jobs) == 1:
+        for job in jobs:
+            report.outcomes.extend(_run_chunk(job))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for outcomes in pool.map(_run_chunk, jobs):
+                report.outcomes.extend(outcomes)
+    report.elapsed = time.perf_counter() - t0
+    return report
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Monte Carlo evaluation of the Lab 3 FSM response policy")
+    parser.add_argument("--incidents", type=int, default=2000)
+    parser.add_argument("--policy", action="append", help=f"module:function to evaluate (default {DEFAULT_POLICY})")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: one per core)")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="default: all")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-history", action="store_true", help="assess events without the sensor's history")
+    args = parser.parse_args(argv)
+
+    print("time to response after the trace reaches DANGER (s); missed escalations; false alarms")
+    for spec in args.policy or [DEFAULT_POLICY]:
+        report = evaluate(
+            args.incidents, spec, args.workers, args.scenario, args.seed, history=not args.no_history
+        )
+        print(f"\n{spec}: {report.incidents} incidents in {report.elapsed:.2f}s")
+        print(HEADER)
+        print(report.line("all"))
+        for name, group in report.by_scenario().items():
+            print(group.line(f"  {name}"))
+
+
+if __name__ == "__main__":
+    main()
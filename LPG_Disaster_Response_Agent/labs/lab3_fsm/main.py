@@ -1,4 +1,11 @@
-"""Entrypoint for Lab 3: Start Sensor Agent and FSM Agent."""
+"""Entrypoint for Lab 3: Start Sensor Agent and FSM Agent.
+
+FSM state entries are shown as trace lines; ``--trace PATH`` also writes them
+to a binary trace file for ``python -m labs.common.tracing``.
+``--thresholds PATH`` loads the sensor's hazard thresholds from a JSON file
+(:mod:`labs.common.thresholds`) and reloads them when it changes.
+"""
+import argparse
 import asyncio
 import sys
 from pathlib import Path
@@ -11,14 +18,28 @@ sys.path.insert(0, str(_PROJECT_ROOT))
 # Now we can import the agents
 from labs.lab3_fsm.agents.sensor_agent import SensorAgent
 from labs.lab3_fsm.agents.fsm_agent import DisasterFSMAgent
+from labs.common.metrics import MetricsServer
+from labs.common.thresholds import THRESHOLDS
+from labs.common.tracing import TRACER
 
-async def main():
+async def main(trace_path=None, thresholds_path=None):
     print("=" * 60)
     print("Lab 3: FSM Agent Simulation Started")
     print("=" * 60)
 
+    # 0. Expose metrics on http://127.0.0.1:9464/metrics (best effort)
+    metrics_server = MetricsServer(port=9464)
+    try:
+        await metrics_server.start()
+    except OSError as exc:
+        print(f"[Warning] metrics endpoint disabled: {exc}")
+        metrics_server = None
+    await TRACER.start(trace_path, echo=True)
+    if thresholds_path:
+        await THRESHOLDS.start(thresholds_path)
+
     # 1. Start FSM Agent
-    fsm_agent = DisasterFSMAgent("fsm_agent@localhost", "password")
+    fsm_agent = DisasterFSMAgent("fsm_agent@localhost", "password", sensor_jid="sensor_agent@localhost")
     await fsm_agent.start(auto_register=False)
     print("FSM Agent started.")
     
@@ -41,7 +62,15 @@ async def main():
             await sensor_agent.stop()
         if fsm_agent.is_alive():
             await fsm_agent.stop()
+        if metrics_server is not None:
+            await metrics_server.stop()
+        await TRACER.close()
+        await THRESHOLDS.close()
         print("Done.")
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="Lab 3 FSM agent simulation")
+    parser.add_argument("--trace", metavar="PATH", help="write FSM trace events to a binary file")
+    parser.add_argument("--thresholds", metavar="PATH", help="hazard thresholds per station (JSON, hot-reloaded)")
+    args = parser.parse_args()
+    asyncio.run(main(args.trace, args.thresholds))
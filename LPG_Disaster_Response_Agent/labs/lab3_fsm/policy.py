@@ -0,0 +1,45 @@
+"""Decision logic and timings of the Lab 3 FSM, without SPADE.
+
+``DisasterFSMAgent``'s states call these functions, and the headless
+evaluator (:mod:`labs.lab3_fsm.evaluator`) runs the same ones against
+simulator traces, so a change made here is what gets evaluated.
+
+``assess(event, context)`` is the Assessment step: it returns the next state
+and the reason printed by the agent.  ``context`` is the sensor history
+summary from :func:`labs.common.history.summarize`, or ``None`` when the
+sensor was not asked or did not answer.
+"""
+
+from __future__ import annotations
+
+from typing import Optional
+
+STATE_IDLE = "IdleState"
+STATE_ALERT = "AlertState"
+STATE_ASSESSMENT = "AssessmentState"
+STATE_RESPONSE = "ResponseState"
+STATE_COMPLETION = "CompletionState"
+
+# seconds each state takes besides waiting for messages
+ALERT_SECONDS = 0.5
+ASSESSMENT_SECONDS = 0.5  # only when there is no sensor history to look at
+RESPONSE_SECONDS = 0.5
+COMPLETION_SECONDS = 0.5
+
+HISTORY_SAMPLES = 10
+HISTORY_TIMEOUT = 2.0  # seconds to wait for the sensor's reply
+RISING_PPM_PER_S = 10.0  # trend that escalates a POSSIBLE_GAS_LEAK
+
+
+def is_abnormal(event: str) -> bool:
+    return event != "NORMAL_CONDITION"
+
+
+def assess(event: str, context: Optional[dict]) -> tuple[str, str]:
+    if event in ("GAS_LEAK_CONFIRMED", "CRITICAL_GAS_LEVEL"):
+        return STATE_RESPONSE, "High risk confirmed! Moving to Response."
+    if event == "POSSIBLE_GAS_LEAK" and context and context["ppm_slope"] >= RISING_PPM_PER_S:
+        return STATE_RESPONSE, "Early warning but gas level rising fast! Moving to Response."
+    if event == "POSSIBLE_GAS_LEAK":
+        return STATE_COMPLETION, "Early warning, no active leak yet. Returning to monitoring."
+    return STATE_COMPLETION, ""
@@ -0,0 +1,27 @@
+"""Lab 4 agents.
+
+The agent classes are loaded lazily so that ``import labs.lab4.agents`` does not
+pull in SPADE until an agent is actually requested.  Classification helpers
+live in :mod:`labs.common.core`.
+"""
+
+from importlib import import_module
+
+_LAZY = {
+    "SensorAgent": "sensor_agent",
+    "PerceptionBehaviour": "sensor_agent",
+    "SensorGatewayAgent": "gateway_agent",
+    "LogicalSensor": "gateway_agent",
+    "CoordinatorAgent": "coordinator_agent",
+    "ResponseAgent": "response_agent",
+}
+
+__all__ = list(_LAZY)
+
+
+def __getattr__(name: str):
+    if name in _LAZY:
+        value = getattr(import_module(f"{__name__}.{_LAZY[name]}"), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -4,26 +4,83 @@ Receives INFORM messages from the SensorAgent and issues REQUESTs to one or more
 ResponseAgents.  ResponseAgents send INFORMs back when they complete the task.
 
 This simple workflow demonstrates FIPA-ACL performatives and multi-agent
-coordination.
+coordination.  Incoming messages pass through a bounded, priority-aware intake
+(:mod:`labs.lab4.intake`) so that an incident storm cannot grow the backlog
+without limit; ``agent.intake.stats()`` reports depth, shed counts and rate.
+Every dispatch is tracked as an incident with an ``incident_id`` that the
+responders echo back; with a :class:`~labs.lab4.journal.IncidentJournal`
+attached, incidents are journaled and rebuilt after a restart.  Bodies are
+decoded with :mod:`labs.common.payload`, which also accepts the legacy string
+bodies.
+
+Sensor percepts go through a per-station incident table
+(:mod:`labs.lab4.incidents`): only a new incident or an escalation sends
+REQUESTs, repeats at the same severity are suppressed, and a run of
+``NORMAL_CONDITION`` readings closes the station's incident.  An incident
+whose station has sent nothing for ``incident_timeout`` seconds expires, so
+a dead sensor does not hold its station's incident open forever.
+``agent.incident_stats()`` reports how many responder requests that avoided.
+
+Stations and responders may carry coordinates.  With ``dispatch_k`` set, a
+new incident or an escalation goes to the ``dispatch_k`` nearest *available*
+responders in ``responder_index`` (:mod:`labs.lab4.spatial`).  A responder is
+busy from dispatch until it has completed all of its incidents.  Responders
+report where they are with ``location`` metadata on completions or in a
+``POSITION`` inform.  Without a known station location the coordinator falls
+back to broadcasting to every responder in ``response_jids``.
+
+Percepts, dispatches and completions are recorded as binary trace events
+(:mod:`labs.common.tracing`) rather than printed.
 """
 
 from __future__ import annotations
 
 import asyncio
 import sys
+import time
+import uuid
 from pathlib import Path
 
 from spade.agent import Agent
-from spade.behaviour import CyclicBehaviour
+from spade.behaviour import CyclicBehaviour, OneShotBehaviour
 from spade.message import Message
 
-# path hack so we can import other labs
-_SCRIPT_DIR = Path(__file__).resolve().parent
-_LAB4_DIR = _SCRIPT_DIR.parent
-sys.path.insert(0, str(_LAB4_DIR.parent))
+if __package__ in (None, ""):
+    # executed as a script: make the project root importable
+    sys.path.insert(0, str(Path(__file__).resolve().parents[3]))
+
+from labs.common.core import EventCode, event_code  # noqa: E402
+from labs.common.payload import ONTOLOGY, Kind, Payload, PayloadError, decode, encode, now_ms, shutdown  # noqa: E402
+from labs.common.tracing import TRACER, hex_id  # noqa: E402
+from labs.common.metrics import (  # noqa: E402
+    BEHAVIOUR_RUN_SECONDS,
+    INCIDENT_HANDLING_SECONDS,
+    MAILBOX_DEPTH,
+    MESSAGES_RECEIVED,
+    MESSAGES_SENT,
+    REGISTRY,
+    RESPONDER_LATENCY_SECONDS,
+)
+from labs.lab4.incidents import StationIncidentTable  # noqa: E402
+from labs.lab4.intake import BoundedIntake  # noqa: E402
+from labs.lab4.journal import IncidentJournal  # noqa: E402
+from labs.lab4.spatial import GridIndex, parse_location  # noqa: E402
+
+TRACE_PERCEPT = TRACER.define("coordinator.percept", station="str", event="event", count="int", action="str")
+TRACE_DISPATCH = TRACER.define("coordinator.dispatch", responder="str", event="event", station="str", incident="hex")
+TRACE_COMPLETED = TRACER.define("coordinator.completed", responder="str", event="event", count="int", incident="hex")
+
+INTAKE_WAIT_SECONDS = REGISTRY.histogram(
+    "lpg_intake_wait_seconds", "Time a message waits in the coordinator intake before it is handled", ("agent",)
+)
 
 
 class CoordinatorAgent(Agent):
+    INTAKE_CAPACITY: int = 1000
+    DRAIN_BATCH: int = 100  # mailbox messages moved into the intake per run()
+    CLEAR_AFTER: int = 3  # consecutive NORMAL_CONDITION percepts that close a station incident
+    INCIDENT_TIMEOUT: float = 120.0  # seconds without a percept before a station incident expires
+
     def __init__(
         self,
         jid: str,
@@ -31,50 +88,320 @@ class CoordinatorAgent(Agent):
         sensor_jid: str,
         response_jids: list[str],
         *args,
+        intake_capacity: int | None = None,
+        journal: IncidentJournal | None = None,
+        clear_after: int | None = None,
+        incident_timeout: float | None = None,
+        station_locations: dict[str, tuple[float, float]] | None = None,
+        responder_locations: dict[str, tuple[float, float]] | None = None,
+        dispatch_k: int | None = None,
+        cell_size: float = 5.0,
         **kwargs,
     ) -> None:
         super().__init__(jid, password, *args, **kwargs)
         self.sensor_jid = sensor_jid
         self.response_jids = response_jids
+        self.intake = BoundedIntake(capacity=intake_capacity or self.INTAKE_CAPACITY)
+        MAILBOX_DEPTH.labels(self.name).set_function(self.mailbox_depth)
+        # in-flight dispatches: incident id -> event, sensor_id, pending responders
+        self.incidents: dict[str, dict] = {}
+        self.journal = journal
+        # open incident per station; decides which percepts are dispatched
+        self.stations = StationIncidentTable(
+            clear_after or self.CLEAR_AFTER, name=self.name, stale_after=incident_timeout or self.INCIDENT_TIMEOUT
+        )
+        self._next_expiry = 0.0
+        # where stations and responders are; only available responders are queried
+        self.station_locations = dict(station_locations or {})
+        self.responder_index = GridIndex(cell_size)
+        for jid, (x, y) in (responder_locations or {}).items():
+            self.responder_index.add(jid, x, y)
+        self.dispatch_k = dispatch_k
+        self._assigned: dict[str, int] = {}  # responder -> incidents it has not completed
+        self.trace_id = TRACER.intern(self.name)
+
+    def mailbox_depth(self) -> int:
+        """Messages still in SPADE's mailbox plus those queued in the intake."""
+        return len(self.intake) + sum(b.mailbox_size() for b in self.behaviours if b.queue)
+
+    async def stop(self) -> None:
+        MAILBOX_DEPTH.remove(self.name)
+        await super().stop()
+        # SPADE skips on_end for a handler cancelled inside receive(), so the
+        # journal's buffered records are flushed here
+        if self.journal is not None:
+            await self.journal.close()
+
+    def select_responders(self, station: str | None, location: tuple[float, float] | None = None) -> list[str]:
+        """The ``dispatch_k`` nearest available responders, or all of ``response_jids``.
+
+        When every located responder is busy the nearest busy ones are queued
+        up instead of broadcasting to the whole fleet.
+        """
+        index = self.responder_index
+        if self.dispatch_k and len(index):
+            where = location or self.station_locations.get(station)
+            if where is not None:
+                nearest = index.nearest(where[0], where[1], self.dispatch_k) or index.nearest_linear(
+                    where[0], where[1], self.dispatch_k, busy=True
+                )
+                return [jid for _, jid in nearest]
+        return self.response_jids
+
+    def update_responder(self, jid: str, location: tuple[float, float]) -> None:
+        """Record where ``jid`` is; ignored unless it is one of ``response_jids``.
+
+        A drained or unknown responder must not re-enter the index.
+        """
+        if jid not in self.response_jids:
+            return
+        if jid in self.responder_index:
+            self.responder_index.move(jid, *location)
+        else:
+            self.responder_index.add(jid, *location, available=not self._assigned.get(jid))
+
+    def expire_incidents(self) -> None:
+        """Close station incidents whose sensor stopped reporting; checked at most once a second."""
+        now = time.monotonic()
+        if now < self._next_expiry:
+            return
+        self._next_expiry = now + 1.0
+        for incident in self.stations.expire():
+            print(f"[Coordinator] no percept from {incident.station} for {self.stations.stale_after:g}s, "
+                  f"expiring its {incident.severity.name} incident")
+
+    def incident_stats(self) -> dict:
+        fleet = len(self.response_jids)
+        return self.stations.stats(min(self.dispatch_k or fleet, fleet))
+
+    def open_incident(self, event: str, sensor_id: str | None, responders: list[str]) -> str:
+        incident_id = uuid.uuid4().hex[:12]
+        self.incidents[incident_id] = {
+            "event": event,
+            "sensor_id": sensor_id,
+            "opened": time.time(),
+            "pending": set(responders),
+        }
+        for r in responders:
+            self._assigned[r] = self._assigned.get(r, 0) + 1
+            self.responder_index.set_available(r, False)
+        if self.journal is not None:
+            self.journal.append("open", incident=incident_id, event=event,
+                                sensor_id=sensor_id, responders=list(responders))
+        return incident_id
+
+    def complete_incident(self, incident_id: str, responder: str) -> None:
+        incident = self.incidents.get(incident_id)
+        if incident is None or responder not in incident["pending"]:
+            return
+        incident["pending"].discard(responder)
+        left = self._assigned.get(responder, 1) - 1
+        if left > 0:
+            self._assigned[responder] = left
+        else:
+            self._assigned.pop(responder, None)
+            self.responder_index.set_available(responder, True)
+        RESPONDER_LATENCY_SECONDS.labels(responder).add(time.time() - incident["opened"])
+        if self.journal is not None:
+            self.journal.append("complete", incident=incident_id, responder=responder)
+        if not incident["pending"]:
+            del self.incidents[incident_id]
+            if self.journal is not None:
+                self.journal.append("close", incident=incident_id)
+
+    def abandon_responder(self, responder: str) -> list[str]:
+        """Give up on every REQUEST ``responder`` has not completed; returns the incident ids.
+
+        Used when a responder is gone for good.  Incidents left with nobody
+        pending are closed.
+        """
+        abandoned = []
+        for incident_id, incident in list(self.incidents.items()):
+            if responder not in incident["pending"]:
+                continue
+            incident["pending"].discard(responder)
+            abandoned.append(incident_id)
+            if self.journal is not None:
+                self.journal.append("complete", incident=incident_id, responder=responder, abandoned=True)
+            if not incident["pending"]:
+                del self.incidents[incident_id]
+                if self.journal is not None:
+                    self.journal.append("close", incident=incident_id)
+        self._assigned.pop(responder, None)
+        self.responder_index.remove(responder)
+        return abandoned
 
     class MessageHandler(CyclicBehaviour):
         async def run(self) -> None:
-            msg = await self.receive(timeout=3)
-            if msg:
-                body = msg.body
-                perf = msg.get_metadata("performative")
-                sender = str(msg.sender)
+            intake = self.agent.intake
+            # only block on the mailbox when there is no backlog to work on
+            msg = await self.receive(timeout=None if len(intake) else 3)
+            drained = 0
+            while msg is not None:
+                self._admit(msg)
+                drained += 1
+                if drained >= self.agent.DRAIN_BATCH:
+                    break
+                msg = await self.receive()
 
-                # shutdown signal from sensor
-                if body == "SHUTDOWN":
-                    print("[Coordinator] received shutdown request. Forwarding to responses and stopping.")
-                    for r in self.agent.response_jids:
-                        shutdown_msg = Message(to=r)
-                        shutdown_msg.set_metadata("performative", "inform")
-                        shutdown_msg.body = "SHUTDOWN"
-                        await self.send(shutdown_msg)
-                    await self.agent.stop()
-                    return
+            self.agent.expire_incidents()
+            item = intake.pop()
+            if item is None:
+                await asyncio.sleep(0.2)
+                return
+            name = self.agent.name
+            t0 = time.perf_counter()
+            INTAKE_WAIT_SECONDS.labels(name).observe(time.monotonic() - item.enqueued_at)
+            msg, payload = item.payload
+            await self._handle(msg, item.count, payload, first_ts_ms=item.first[1].ts_ms)
+            INCIDENT_HANDLING_SECONDS.labels(name).observe(time.monotonic() - item.enqueued_at)
+            BEHAVIOUR_RUN_SECONDS.labels(name, "MessageHandler").observe(time.perf_counter() - t0)
 
-                # message from sensor
-                if sender.startswith(self.agent.sensor_jid):
-                    print(f"[Coordinator] INFORM from sensor -> event={body}")
-                    # dispatch REQUESTs to responders
-                    for r in self.agent.response_jids:
-                        request = Message(to=r)
-                        request.set_metadata("performative", "request")
-                        request.set_metadata("ontology", "lpg_station_ontology")
-                        request.body = f"handle_{body}"
-                        await self.send(request)
-                        print(f"[Coordinator] sent REQUEST to {r}: {request.body}")
-                else:
-                    # assume feedback from a response agent
-                    print(f"[Coordinator] received {perf.upper()} from {sender}: {body}")
+        def _admit(self, msg: Message) -> None:
+            MESSAGES_RECEIVED.labels(self.agent.name, msg.get_metadata("performative") or "none").inc()
+            try:
+                payload = decode(msg.body)
+            except PayloadError as exc:
+                print(f"[Coordinator] dropping message from {msg.sender}: {exc}")
+                return
+            kind = payload.kind
+            if kind is Kind.SHUTDOWN:
+                priority = EventCode.SHUTDOWN
+            elif kind is Kind.PERCEPT:
+                priority = payload.event
+            elif kind is Kind.POSITION:
+                priority = EventCode.NORMAL_CONDITION
             else:
-                await asyncio.sleep(0.2)
+                # responder feedback ranks with early warnings
+                priority = EventCode.POSSIBLE_GAS_LEAK
+            key = (
+                str(msg.sender),
+                kind,
+                payload.event,
+                payload.station or msg.get_metadata("sensor_id"),
+                payload.correlation or msg.get_metadata("incident_id"),
+            )
+            label = payload.event.name if kind is Kind.PERCEPT else kind.name
+            self.agent.intake.offer(key, priority, (msg, payload), label=label)
+
+        async def _handle(
+            self, msg: Message, count: int = 1, payload: Payload | None = None, first_ts_ms: int | None = None
+        ) -> None:
+            if payload is None:
+                payload = decode(msg.body)
+            kind = payload.kind
+
+            # shutdown signal from sensor
+            if kind is Kind.SHUTDOWN:
+                print("[Coordinator] received shutdown request. Forwarding to responses and stopping.")
+                for r in self.agent.response_jids:
+                    shutdown_msg = Message(to=r)
+                    shutdown_msg.set_metadata("performative", "inform")
+                    shutdown_msg.set_metadata("ontology", ONTOLOGY)
+                    shutdown_msg.body = shutdown()
+                    await self.send(shutdown_msg)
+                    MESSAGES_SENT.labels(self.agent.name, "inform").inc()
+                await self.agent.stop()
+                return
+
+            if kind is Kind.PERCEPT:
+                # a gateway tags each INFORM with the logical sensor it came from
+                sensor_id = payload.station or msg.get_metadata("sensor_id")
+                event = payload.event.name
+                station = sensor_id or str(msg.sender).split("/")[0]
+                action, station_incident = self.agent.stations.observe(
+                    station, payload.event, count, payload.ts_ms, first_ts_ms
+                )
+                TRACER.emit(
+                    TRACE_PERCEPT, self.agent.trace_id, TRACER.intern(station), payload.event, count,
+                    TRACER.intern(action.value),
+                )
+                if not action.dispatches:
+                    return
+                responders = self.agent.select_responders(station, parse_location(msg.get_metadata("location")))
+                incident_id = self._open_incident(msg, event, sensor_id, responders)
+                self.agent.stations.dispatched(station_incident, incident_id, len(responders))
+                body = encode(Kind.REQUEST, payload.event, sensor_id, now_ms(), incident_id)
+                # dispatch REQUESTs to responders
+                for r in responders:
+                    request = Message(to=r)
+                    request.set_metadata("performative", "request")
+                    request.set_metadata("ontology", ONTOLOGY)
+                    request.set_metadata("incident_id", incident_id)
+                    if sensor_id:
+                        request.set_metadata("sensor_id", sensor_id)
+                    request.body = body
+                    await self.send(request)
+                    MESSAGES_SENT.labels(self.agent.name, "request").inc()
+                    TRACER.emit(
+                        TRACE_DISPATCH, self.agent.trace_id, TRACER.intern(r), payload.event,
+                        TRACER.intern(sensor_id), hex_id(incident_id),
+                    )
+            elif kind is Kind.COMPLETED:
+                sender = str(msg.sender)
+                location = parse_location(msg.get_metadata("location"))
+                if location is not None:
+                    self.agent.update_responder(sender.split("/")[0], location)
+                incident_id = payload.correlation or msg.get_metadata("incident_id")
+                TRACER.emit(
+                    TRACE_COMPLETED, self.agent.trace_id, TRACER.intern(sender.split("/")[0]), payload.event,
+                    count, hex_id(incident_id),
+                )
+                if incident_id:
+                    self.agent.complete_incident(incident_id, sender.split("/")[0])
+            elif kind is Kind.POSITION:
+                location = parse_location(msg.get_metadata("location"))
+                if location is not None:
+                    self.agent.update_responder(str(msg.sender).split("/")[0], location)
+
+        def _open_incident(self, msg: Message, event: str, sensor_id: str | None, responders: list[str]) -> str:
+            """Open the incident ``msg`` triggered; subclasses can stamp it from the message."""
+            return self.agent.open_incident(event, sensor_id, responders)
+
+        async def on_end(self) -> None:
+            if self.agent.journal is not None:
+                await self.agent.journal.close()  # no-op if stop() closed it already
+
+    class RecoverIncidents(OneShotBehaviour):
+        """Re-send REQUESTs for incidents rebuilt from the journal."""
+
+        async def run(self) -> None:
+            for incident_id, incident in list(self.agent.incidents.items()):
+                for r in incident["pending"]:
+                    request = Message(to=r)
+                    request.set_metadata("performative", "request")
+                    request.set_metadata("ontology", ONTOLOGY)
+                    request.set_metadata("incident_id", incident_id)
+                    if incident["sensor_id"]:
+                        request.set_metadata("sensor_id", incident["sensor_id"])
+                    request.body = encode(
+                        Kind.REQUEST, event_code(incident["event"]), incident["sensor_id"], now_ms(), incident_id
+                    )
+                    await self.send(request)
+                    MESSAGES_SENT.labels(self.agent.name, "request").inc()
 
     async def setup(self) -> None:
         print(f"[Coordinator] setup complete for {self.jid}")
+        if self.journal is not None:
+            recovery = self.journal.recover()
+            self.incidents.update(recovery.incidents)
+            for incident in recovery.incidents.values():
+                for r in incident["pending"]:
+                    self._assigned[r] = self._assigned.get(r, 0) + 1
+                    self.responder_index.set_available(r, False)
+            for incident_id, incident in recovery.incidents.items():
+                if incident["sensor_id"]:
+                    self.stations.restore(
+                        incident["sensor_id"], event_code(incident["event"]), incident_id, incident.get("opened")
+                    )
+            await self.journal.start(snapshot=lambda: self.incidents)
+            print(
+                f"[Coordinator] journal replayed: {recovery.records} records "
+                f"({recovery.bytes} bytes) in {recovery.seconds * 1000:.1f} ms, "
+                f"{len(recovery.incidents)} incidents in flight"
+            )
+            if recovery.incidents:
+                self.add_behaviour(self.RecoverIncidents())
         self.add_behaviour(self.MessageHandler())
 
 
@@ -0,0 +1,242 @@
+"""Lab 4 – gateway agent hosting many logical sensors over one XMPP connection.
+
+A ``SensorAgent`` is a full SPADE agent with its own XMPP session and its own
+periodic behaviour.  That is fine for one station but does not scale to a site
+with thousands of detectors.  ``SensorGatewayAgent`` instead hosts any number of
+``LogicalSensor`` objects, each with its own simulated station and polling
+period, and drives them all from a single behaviour backed by a heap of due
+times.  Every INFORM sent to the coordinator carries a ``sensor_id`` metadata
+field identifying the logical sensor that produced it; the same id is the
+``station`` of the :mod:`labs.common.payload` body.
+
+A logical sensor with a ``driver`` (:mod:`labs.lab4.devices`) is read from
+its device instead of the simulator; the reads of one batch run concurrently,
+so a slow or silent detector only costs its own reading.
+
+Each logical sensor keeps its own reading history (``HISTORY_CAPACITY``
+samples, smaller than a ``SensorAgent``'s because a gateway may host
+thousands); a ``query-ref`` whose ``sensor_id`` metadata names one of them is
+answered as described in :mod:`labs.lab4.agents.sensor_agent`.
+
+A logical sensor with a ``sampler`` (:mod:`labs.lab4.sampling`) has its
+``period`` set from each reading; without one it polls at a fixed rate.
+
+Each reading is classified with the thresholds that the gateway's
+``thresholds`` registry (:mod:`labs.common.thresholds`) holds for the
+sensor's ``sensor_id``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Optional
+
+from spade.agent import Agent
+from spade.behaviour import CyclicBehaviour
+from spade.message import Message
+
+if __package__ in (None, ""):
+    # executed as a script: make the project root importable
+    sys.path.insert(0, str(Path(__file__).resolve().parents[3]))
+
+from labs.common.core import determine_event, event_code  # noqa: E402
+from labs.common.history import ReadingHistory  # noqa: E402
+from labs.common.metrics import STATION_PPM  # noqa: E402
+from labs.common.payload import ONTOLOGY, Kind, encode, now_ms  # noqa: E402
+from labs.common.thresholds import THRESHOLDS, ThresholdRegistry  # noqa: E402
+from labs.lab2_perception.environment.simulated_lpg_station import SimulatedLPGStation  # noqa: E402
+from labs.common.history_query import HistoryQueryBehaviour  # noqa: E402
+from labs.lab4.devices import DeviceError, SensorDriver  # noqa: E402
+from labs.lab4.rollups import RollupEngine  # noqa: E402
+from labs.lab4.sampling import AdaptiveSampler  # noqa: E402
+
+
+@dataclass
+class LogicalSensor:
+    """One gas detector multiplexed over the gateway's connection."""
+
+    sensor_id: str
+    station: SimulatedLPGStation
+    period: float = 2.0
+    max_cycles: Optional[int] = None
+    offset: float = 0.0  # delay before the first reading
+    cycles: int = 0
+    next_due: float = 0.0
+    driver: Optional[SensorDriver] = None  # read the device instead of ``station``
+    history: Optional[ReadingHistory] = None  # created by the gateway if not given
+    sampler: Optional[AdaptiveSampler] = None  # adapts ``period`` to the readings
+
+    @property
+    def finished(self) -> bool:
+        return self.max_cycles is not None and self.cycles >= self.max_cycles
+
+    async def read(self) -> dict:
+        if self.driver is not None:
+            return await self.driver.read()
+        return self.station.get_current_readings()
+
+
+class SensorGatewayAgent(Agent):
+    """Single XMPP identity that perceives on behalf of many logical sensors."""
+
+    MAX_IDLE_SLEEP: float = 1.0
+    MAX_BATCH: int = 500  # sensors serviced per run() before yielding
+    HISTORY_CAPACITY: int = 120  # readings kept per logical sensor
+
+    def __init__(
+        self,
+        jid: str,
+        password: str,
+        target_jid: str,
+        sensors: Iterable[LogicalSensor] = (),
+        *args,
+        rollups: RollupEngine | None = None,
+        thresholds: ThresholdRegistry | None = None,
+        **kwargs,
+    ) -> None:
+        super().__init__(jid, password, *args, **kwargs)
+        self.target_jid = target_jid
+        self.rollups = rollups
+        self.thresholds = thresholds or THRESHOLDS
+        self.sensors: dict[str, LogicalSensor] = {}
+        self._schedule: list[tuple[float, int, str]] = []
+        self._seq = itertools.count()
+        for sensor in sensors:
+            self.add_sensor(sensor)
+
+    def add_sensor(self, sensor: LogicalSensor) -> None:
+        if sensor.sensor_id in self.sensors:
+            raise ValueError(f"duplicate sensor_id {sensor.sensor_id!r}")
+        if sensor.history is None:
+            sensor.history = ReadingHistory(self.HISTORY_CAPACITY)
+        self.sensors[sensor.sensor_id] = sensor
+        sensor.next_due = time.monotonic() + sensor.offset
+        heapq.heappush(self._schedule, (sensor.next_due, next(self._seq), sensor.sensor_id))
+
+    def remove_sensor(self, sensor_id: str) -> None:
+        # heap entries for removed sensors are discarded lazily when popped
+        self.sensors.pop(sensor_id, None)
+
+    class GatewayScheduler(CyclicBehaviour):
+        async def run(self) -> None:
+            agent = self.agent
+            schedule = agent._schedule
+            if not schedule:
+                await self._finish()
+                return
+
+            now = time.monotonic()
+            due = []
+            while schedule and schedule[0][0] <= now and len(due) < agent.MAX_BATCH:
+                _, _, sensor_id = heapq.heappop(schedule)
+                sensor = agent.sensors.get(sensor_id)
+                if sensor is not None:
+                    due.append(sensor)
+            serviced = len(due)
+            if any(sensor.driver is not None for sensor in due):
+                # device reads overlap; a slow detector only delays itself
+                await asyncio.gather(*(self._perceive(sensor) for sensor in due))
+            else:
+                for sensor in due:
+                    await self._perceive(sensor)
+            for sensor in due:
+                sensor_id = sensor.sensor_id
+                if sensor.finished:
+                    del agent.sensors[sensor_id]
+                    continue
+                # keep the original cadence; skip ticks that were missed entirely
+                sensor.next_due += sensor.period
+                if sensor.next_due <= now:
+                    sensor.next_due = now + sensor.period
+                heapq.heappush(schedule, (sensor.next_due, next(agent._seq), sensor_id))
+
+            if not schedule:
+                await self._finish()
+            elif serviced == 0:
+                delay = min(schedule[0][0] - now, agent.MAX_IDLE_SLEEP)
+                await asyncio.sleep(max(delay, 0))
+
+        async def _perceive(self, sensor: LogicalSensor) -> None:
+            try:
+                readings = await sensor.read()
+            except DeviceError as exc:
+                # the tick still counts; the next one retries the device
+                print(f"[Gateway] {sensor.sensor_id}: {exc}")
+                sensor.cycles += 1
+                return
+            ts = now_ms()
+            sensor.history.append(readings, ts)
+            thresholds = self.agent.thresholds.for_station(sensor.sensor_id)
+            if sensor.sampler is not None:
+                sensor.period = sensor.sampler.update(readings["lpg_ppm"], time.monotonic(), thresholds)
+            STATION_PPM.labels(sensor.sensor_id).add(readings["lpg_ppm"])
+            if self.agent.rollups is not None:
+                self.agent.rollups.add(sensor.sensor_id, readings)
+            event = determine_event(thresholds.classify(readings["lpg_ppm"]))
+
+            msg = Message(to=self.agent.target_jid)
+            msg.set_metadata("performative", "inform")
+            msg.set_metadata("ontology", ONTOLOGY)
+            msg.set_metadata("sensor_id", sensor.sensor_id)
+            msg.body = encode(
+                Kind.PERCEPT, event_code(event), sensor.sensor_id, ts, None,
+                readings["lpg_ppm"], readings["tank_pressure_kpa"], readings["pump_state"] == "ON",
+            )
+            await self.send(msg)
+            sensor.cycles += 1
+
+        async def _finish(self) -> None:
+            print("[Gateway] all logical sensors finished – stopping.")
+            await self.agent.stop()
+
+    async def setup(self) -> None:
+        print(f"[Gateway] setup complete for {self.jid} hosting {len(self.sensors)} sensors")
+        self.add_behaviour(self.GatewayScheduler())
+        self.add_behaviour(HistoryQueryBehaviour(self._history_for), HistoryQueryBehaviour.TEMPLATE)
+
+    def _history_for(self, msg: Message) -> Optional[ReadingHistory]:
+        sensor = self.sensors.get(msg.get_metadata("sensor_id") or "")
+        return sensor.history if sensor is not None else None
+
+
+def build_site(count: int, period: float = 2.0, max_cycles: Optional[int] = 25) -> list[LogicalSensor]:
+    """Create ``count`` logical sensors with staggered start times."""
+    sensors = []
+    for i in range(count):
+        sensors.append(
+            LogicalSensor(
+                sensor_id=f"S{i:05d}",
+                station=SimulatedLPGStation(normal_duration=4, leak_duration=10),
+                period=period,
+                max_cycles=max_cycles,
+                offset=period * i / max(count, 1),
+            )
+        )
+    return sensors
+
+
+async def main() -> None:
+    # Example stand-alone execution with a small site
+    agent = SensorGatewayAgent(
+        jid="sensor_gateway@localhost",
+        password="password",
+        target_jid="coordinator@localhost",
+        sensors=build_site(50),
+    )
+    try:
+        await agent.start(auto_register=True)
+        while agent.is_alive():
+            await asyncio.sleep(0.5)
+    finally:
+        if agent.is_alive():
+            await agent.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,112 @@
+"""PeriodicBehaviour with tick-lateness tracking and configurable catch-up.
+
+SPADE's ``PeriodicBehaviour`` silently skips activations that were missed
+while ``run()`` (or anything else on the event loop) was slow, so there is no
+way to see how late ticks fire.  ``TrackedPeriodicBehaviour`` keeps the same
+constructor and ``period`` property but schedules on the monotonic clock and
+records, per tick:
+
+* lateness – actual start time minus scheduled time
+  (``lpg_tick_lateness_seconds``),
+* run duration (``lpg_behaviour_run_seconds``),
+* ticks skipped by the catch-up policy (``lpg_ticks_skipped_total``).
+
+Catch-up policies, applied when a run finishes after the next slot:
+
+``skip``      jump to the next future slot on the original grid (SPADE's
+              behaviour); missed slots are counted as skipped.
+``burst``     run the missed slots back to back, at most ``max_burst`` of them;
+              older ones are skipped.
+``reanchor``  start a new grid one period after the run finished.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from datetime import datetime
+from typing import Optional
+
+from spade.behaviour import PeriodicBehaviour
+
+from labs.common.metrics import BEHAVIOUR_RUN_SECONDS, REGISTRY
+
+TICK_LATENESS_SECONDS = REGISTRY.histogram(
+    "lpg_tick_lateness_seconds",
+    "Delay between a periodic behaviour's scheduled and actual start",
+    ("agent", "behaviour"),
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+TICKS_SKIPPED = REGISTRY.counter(
+    "lpg_ticks_skipped_total", "Periodic activations dropped by the catch-up policy", ("agent", "behaviour")
+)
+
+CATCH_UP_POLICIES = ("skip", "burst", "reanchor")
+
+
+class TrackedPeriodicBehaviour(PeriodicBehaviour):
+    def __init__(
+        self,
+        period: float,
+        start_at: Optional[datetime] = None,
+        catch_up: str = "skip",
+        max_burst: int = 3,
+    ) -> None:
+        super().__init__(period=period, start_at=start_at)
+        if catch_up not in CATCH_UP_POLICIES:
+            raise ValueError(f"catch_up must be one of {CATCH_UP_POLICIES}, got {catch_up!r}")
+        self.catch_up = catch_up
+        self.max_burst = max(1, max_burst)
+        self.ticks = 0
+        self.skipped = 0
+        self.last_lateness = 0.0
+        self._scheduled: Optional[float] = None  # monotonic time of the next slot
+
+    async def _run(self) -> None:
+        now = time.monotonic()
+        if self._scheduled is None:
+            delay = (self._next_activation - datetime.now()).total_seconds()
+            self._scheduled = now + max(delay, 0.0)
+        if now < self._scheduled:
+            await asyncio.sleep(self._scheduled - now)
+            return
+
+        name = self.agent.name
+        behaviour = type(self).__name__
+        self.last_lateness = now - self._scheduled
+        TICK_LATENESS_SECONDS.labels(name, behaviour).observe(self.last_lateness)
+
+        t0 = time.perf_counter()
+        await self.run()
+        BEHAVIOUR_RUN_SECONDS.labels(name, behaviour).observe(time.perf_counter() - t0)
+        self.ticks += 1
+
+        skipped = self._advance(time.monotonic())
+        if skipped:
+            self.skipped += skipped
+            TICKS_SKIPPED.labels(name, behaviour).inc(skipped)
+
+    def _advance(self, now: float) -> int:
+        """Move ``_scheduled`` to the next slot; return the number of slots skipped."""
+        period = self.period.total_seconds()
+        if period <= 0:
+            self._scheduled = now
+            return 0
+
+        nxt = self._scheduled + period
+        if nxt >= now:
+            self._scheduled = nxt
+            return 0
+
+        # slots in the past, including ``nxt`` itself
+        behind = math.floor((now - nxt) / period) + 1
+        if self.catch_up == "reanchor":
+            self._scheduled = now + period
+            return behind
+        if self.catch_up == "burst":
+            dropped = max(0, behind - self.max_burst)
+            self._scheduled = nxt + dropped * period
+            return dropped
+        self._scheduled = nxt + behind * period
+        return behind
@@ -2,56 +2,135 @@
 
 Listens for REQUEST messages from the CoordinatorAgent. When a request arrives the
 agent simulates performing an action then sends an INFORM back to the
-coordinator confirming completion.  A special SHUTDOWN inform stops the agent.
+coordinator confirming completion.  A shutdown payload from an older sender
+still stops the agent; normally the host process stops it.
+
+A responder with a ``location`` attaches it to every completion, and
+``move_to()`` reports a new position straight away, so the coordinator's
+spatial index (:mod:`labs.lab4.spatial`) follows mobile units.
+
+Requests and completions are recorded as binary trace events
+(:mod:`labs.common.tracing`) rather than printed.
 """
 
 from __future__ import annotations
 
 import asyncio
 import sys
+import time
 from pathlib import Path
 
 from spade.agent import Agent
-from spade.behaviour import CyclicBehaviour
+from spade.behaviour import CyclicBehaviour, OneShotBehaviour
 from spade.message import Message
 
-# path hack so we can import other labs if necessary
-_SCRIPT_DIR = Path(__file__).resolve().parent
-_LAB4_DIR = _SCRIPT_DIR.parent
-sys.path.insert(0, str(_LAB4_DIR.parent))
+if __package__ in (None, ""):
+    # executed as a script: make the project root importable
+    sys.path.insert(0, str(Path(__file__).resolve().parents[3]))
+
+from labs.common.metrics import (  # noqa: E402
+    BEHAVIOUR_RUN_SECONDS,
+    INCIDENT_HANDLING_SECONDS,
+    MAILBOX_DEPTH,
+    MESSAGES_RECEIVED,
+    MESSAGES_SENT,
+)
+from labs.common.payload import ONTOLOGY, Kind, PayloadError, decode, encode, now_ms  # noqa: E402
+from labs.common.tracing import TRACER, hex_id  # noqa: E402
+from labs.lab4.spatial import format_location  # noqa: E402
+
+TRACE_REQUEST = TRACER.define("responder.request", sender="str", event="event", station="str", incident="hex")
+TRACE_COMPLETED = TRACER.define("responder.completed", sender="str", event="event", station="str", incident="hex")
 
 
 class ResponseAgent(Agent):
-    def __init__(self, jid: str, password: str, coordinator_jid: str, *args, **kwargs):
+    WORK_SECONDS: float = 1.0  # simulated time spent acting on one request
+
+    def __init__(
+        self,
+        jid: str,
+        password: str,
+        coordinator_jid: str,
+        *args,
+        location: tuple[float, float] | None = None,
+        **kwargs,
+    ):
         super().__init__(jid, password, *args, **kwargs)
         self.coordinator_jid = coordinator_jid
+        self.location = location
+        self.trace_id = TRACER.intern(self.name)
+
+    def move_to(self, x: float, y: float) -> None:
+        self.location = (x, y)
+        if self.is_alive():
+            self.add_behaviour(self.ReportPosition())
+
+    class ReportPosition(OneShotBehaviour):
+        async def run(self) -> None:
+            msg = Message(to=self.agent.coordinator_jid)
+            msg.set_metadata("performative", "inform")
+            msg.set_metadata("ontology", ONTOLOGY)
+            msg.set_metadata("location", format_location(*self.agent.location))
+            msg.body = encode(Kind.POSITION, ts_ms=now_ms())
+            await self.send(msg)
+            MESSAGES_SENT.labels(self.agent.name, "inform").inc()
 
     class HandleRequests(CyclicBehaviour):
         async def run(self) -> None:
             msg = await self.receive(timeout=3)
             if msg:
+                t0 = time.perf_counter()
+                name = self.agent.name
                 perf = msg.get_metadata("performative")
-                body = msg.body
                 sender = str(msg.sender)
+                MESSAGES_RECEIVED.labels(name, perf or "none").inc()
+                try:
+                    payload = decode(msg.body)
+                except PayloadError as exc:
+                    print(f"[{self.agent.jid}] ignoring message from {sender}: {exc}")
+                    payload = None
 
-                if perf == "request":
-                    print(f"[{self.agent.jid}] received REQUEST {body} from {sender}")
+                if payload is None:
+                    pass
+                elif perf == "request":
+                    incident_id = payload.correlation or msg.get_metadata("incident_id")
+                    trace_args = (
+                        TRACER.intern(sender.split("/")[0]), payload.event,
+                        TRACER.intern(payload.station), hex_id(incident_id),
+                    )
+                    TRACER.emit(TRACE_REQUEST, self.agent.trace_id, *trace_args)
                     # simulate a bit of work
-                    await asyncio.sleep(1)
+                    await asyncio.sleep(self.agent.WORK_SECONDS)
                     reply = Message(to=self.agent.coordinator_jid)
                     reply.set_metadata("performative", "inform")
-                    reply.body = f"completed_{body}"
+                    reply.set_metadata("ontology", ONTOLOGY)
+                    if incident_id:
+                        reply.set_metadata("incident_id", incident_id)
+                    if self.agent.location is not None:
+                        reply.set_metadata("location", format_location(*self.agent.location))
+                    reply.body = encode(Kind.COMPLETED, payload.event, payload.station, now_ms(), incident_id)
                     await self.send(reply)
-                    print(f"[{self.agent.jid}] sent INFORM back: {reply.body}")
-                elif body == "SHUTDOWN":
+                    MESSAGES_SENT.labels(name, "inform").inc()
+                    INCIDENT_HANDLING_SECONDS.labels(name).observe(time.perf_counter() - t0)
+                    TRACER.emit(TRACE_COMPLETED, self.agent.trace_id, *trace_args)
+                elif payload.kind is Kind.SHUTDOWN:
                     print(f"[{self.agent.jid}] shutdown signal received, stopping agent.")
                     await self.agent.stop()
+                BEHAVIOUR_RUN_SECONDS.labels(name, "HandleRequests").observe(time.perf_counter() - t0)
             else:
                 await asyncio.sleep(0.2)
 
     async def setup(self) -> None:
         print(f"[ResponseAgent] setup complete for {self.jid}")
         self.add_behaviour(self.HandleRequests())
+        MAILBOX_DEPTH.labels(self.name).set_function(self.mailbox_depth)
+
+    def mailbox_depth(self) -> int:
+        return sum(b.mailbox_size() for b in self.behaviours if b.queue)
+
+    async def stop(self) -> None:
+        MAILBOX_DEPTH.remove(self.name)
+        await super().stop()
 
 
 async def main() -> None:
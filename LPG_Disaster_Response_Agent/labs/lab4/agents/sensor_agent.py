@@ -2,9 +2,32 @@
 
 The agent polls the same simulated LPG station used in earlier labs, classifies
 hazard levels and then sends an INFORM message to a coordinator whenever the
-reading is not NORMAL.  A special ``SHUTDOWN`` inform is emitted at the end of
-the simulation so that the coordinator and response agents can terminate
-cleanly.
+reading is not NORMAL.  Bodies use the compact schema in
+:mod:`labs.common.payload`.  At the end of the simulation the agent simply
+stops; whoever hosts the agents (``main.py`` or :mod:`labs.lab4.supervisor`)
+sees that and shuts the rest down, so no shutdown message is sent.
+
+Pass ``driver`` (:mod:`labs.lab4.devices`) to read a real or emulated
+detector without blocking the event loop; the simulator is used otherwise.
+
+The polling period adapts to the readings (:mod:`labs.lab4.sampling`):
+slow while NORMAL, fast from WARNING up or while ppm is rising towards the
+next level.  ``POLL_INTERVAL`` is only the first period; pass
+``sampling=SamplingPolicy.fixed(2.0)`` for the old fixed rate.
+
+Hazard levels use the thresholds that ``thresholds`` (by default the shared
+:data:`~labs.common.thresholds.THRESHOLDS` registry) holds for
+``station_id``, which defaults to the agent's name.  They are looked up on
+every reading, so a reloaded threshold file applies from the next reading.
+Percepts, ``lpg_station_ppm`` and rollups are keyed by ``station_id`` too, so
+the coordinator's incidents match the thresholds they were classified with.
+
+Every reading is also kept in a :class:`~labs.common.history.ReadingHistory`
+(``history_capacity`` samples).  ``HistoryQueryBehaviour``
+(:mod:`labs.common.history_query`) answers FIPA
+``query-ref`` messages with body ``last=<n>`` or ``seconds=<s>`` from it, so an
+investigator gets the context of an alarm on demand instead of the sensor
+streaming full telemetry.
 """
 
 from __future__ import annotations
@@ -12,66 +35,92 @@ from __future__ import annotations
 import asyncio
 import logging
 import sys
+import time
 from datetime import datetime
 from pathlib import Path
 
 from spade.agent import Agent
-from spade.behaviour import PeriodicBehaviour
 from spade.message import Message
 
-# adjust path so we can import lab2 environment package
-_SCRIPT_DIR = Path(__file__).resolve().parent
-_LAB4_DIR = _SCRIPT_DIR.parent
-sys.path.insert(0, str(_LAB4_DIR.parent))
-
-from lab2_perception.environment.simulated_lpg_station import SimulatedLPGStation  # noqa: E402
+if __package__ in (None, ""):
+    # executed as a script: make the project root importable
+    sys.path.insert(0, str(Path(__file__).resolve().parents[3]))
+
+from labs.common.core import (  # noqa: E402,F401  (re-exported for compatibility)
+    PPM_CRITICAL,
+    PPM_DANGER,
+    PPM_WARNING,
+    classify_hazard,
+    determine_event,
+    event_code,
+)
+from labs.common.history import ReadingHistory  # noqa: E402
+from labs.common.history_query import HistoryQueryBehaviour  # noqa: E402
+from labs.common.metrics import MESSAGES_SENT, STATION_PPM  # noqa: E402
+from labs.common.payload import ONTOLOGY, Kind, encode, now_ms  # noqa: E402
+from labs.common.thresholds import THRESHOLDS, ThresholdRegistry  # noqa: E402
+from labs.lab4.agents.periodic import TrackedPeriodicBehaviour  # noqa: E402
+from labs.lab4.devices import DeviceError, SensorDriver  # noqa: E402
+from labs.lab4.rollups import RollupEngine  # noqa: E402
+from labs.lab4.sampling import SAMPLING_PERIOD, AdaptiveSampler, SamplingPolicy  # noqa: E402
+from labs.lab2_perception.environment.simulated_lpg_station import SimulatedLPGStation  # noqa: E402
 
 logger = logging.getLogger("Lab4.SensorAgent")
 logger.setLevel(logging.INFO)
-_stream_handler = logging.StreamHandler(sys.stdout)
-_stream_handler.setFormatter(logging.Formatter("%(message)s"))
-logger.addHandler(_stream_handler)
-
-PPM_WARNING = 200
-PPM_DANGER = 500
-PPM_CRITICAL = 900
-
-
-def classify_hazard(lpg_ppm: float) -> str:
-    if lpg_ppm >= PPM_CRITICAL:
-        return "CRITICAL"
-    if lpg_ppm >= PPM_DANGER:
-        return "DANGER"
-    if lpg_ppm >= PPM_WARNING:
-        return "WARNING"
-    return "NORMAL"
-
-
-def determine_event(hazard_level: str) -> str:
-    mapping = {
-        "NORMAL": "NORMAL_CONDITION",
-        "WARNING": "POSSIBLE_GAS_LEAK",
-        "DANGER": "GAS_LEAK_CONFIRMED",
-        "CRITICAL": "CRITICAL_GAS_LEVEL",
-    }
-    return mapping.get(hazard_level, "NORMAL_CONDITION")
-
-
-class PerceptionBehaviour(PeriodicBehaviour):
-    def __init__(self, period: float, station: SimulatedLPGStation, target_jid: str) -> None:
-        super().__init__(period=period)
+
+
+def _configure_logging() -> None:
+    """Attach the console handler on first use rather than at import time."""
+    if not logger.handlers:
+        _stream_handler = logging.StreamHandler(sys.stdout)
+        _stream_handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(_stream_handler)
+
+
+class PerceptionBehaviour(TrackedPeriodicBehaviour):
+    def __init__(
+        self,
+        period: float,
+        station: SimulatedLPGStation,
+        target_jid: str,
+        catch_up: str = "skip",
+        rollups: RollupEngine | None = None,
+        driver: SensorDriver | None = None,
+        sampler: AdaptiveSampler | None = None,
+    ) -> None:
+        super().__init__(period=period, catch_up=catch_up)
         self.station = station
+        self.driver = driver
+        self.sampler = sampler  # sets the period after each reading; fixed if None
         self.target_jid = target_jid
+        self.rollups = rollups
         self._cycles = 0
         self._max_cycles = 25  # run long enough to exercise all hazard stages
 
     async def run(self) -> None:
-        readings = self.station.get_current_readings()
+        if self.driver is not None:
+            try:
+                readings = await self.driver.read()
+            except DeviceError as exc:
+                logger.info(f"[SensorAgent] {self.driver.name}: {exc}")
+                await self._end_cycle()  # a dead detector must not keep the agent running forever
+                return
+        else:
+            readings = self.station.get_current_readings()
+        ts = now_ms()
+        self.agent.history.append(readings, ts)
         lpg_ppm = readings["lpg_ppm"]
+        thresholds = self.agent.thresholds.for_station(self.agent.station_id)
+        if self.sampler is not None:
+            self.period = self.sampler.update(lpg_ppm, time.monotonic(), thresholds)
+            SAMPLING_PERIOD.labels(self.agent.name).set(self.sampler.period)
         pressure = readings["tank_pressure_kpa"]
         pump = readings["pump_state"]
+        STATION_PPM.labels(self.agent.station_id).add(lpg_ppm)
+        if self.rollups is not None:
+            self.rollups.add(self.agent.station_id, readings)
 
-        hazard = classify_hazard(lpg_ppm)
+        hazard = thresholds.classify(lpg_ppm)
         event = determine_event(hazard)
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
@@ -85,36 +134,63 @@ class PerceptionBehaviour(PeriodicBehaviour):
         # send FIPA-ACL INFORM to coordinator
         msg = Message(to=self.target_jid)
         msg.set_metadata("performative", "inform")
-        msg.set_metadata("ontology", "lpg_station_ontology")
-        msg.body = event
+        msg.set_metadata("ontology", ONTOLOGY)
+        msg.body = encode(
+            Kind.PERCEPT, event_code(event), self.agent.station_id, ts, None, lpg_ppm, pressure, pump == "ON"
+        )
         await self.send(msg)
+        MESSAGES_SENT.labels(self.agent.name, "inform").inc()
+        await self._end_cycle()
 
+    async def _end_cycle(self) -> None:
         self._cycles += 1
         if self._cycles >= self._max_cycles:
-            logger.info("\n[SensorAgent] Simulation complete – sending SHUTDOWN inform.")
-            shutdown_msg = Message(to=self.target_jid)
-            shutdown_msg.set_metadata("performative", "inform")
-            shutdown_msg.body = "SHUTDOWN"
-            await self.send(shutdown_msg)
+            logger.info("\n[SensorAgent] Simulation complete – stopping.")
             await self.agent.stop()
 
 
 class SensorAgent(Agent):
     POLL_INTERVAL: float = 2.0
-
-    def __init__(self, jid: str, password: str, target_jid: str, *args, **kwargs):
+    CATCH_UP: str = "skip"  # see labs.lab4.agents.periodic for the policies
+
+    def __init__(
+        self,
+        jid: str,
+        password: str,
+        target_jid: str,
+        *args,
+        rollups: RollupEngine | None = None,
+        driver: SensorDriver | None = None,
+        history_capacity: int = 600,
+        sampling: SamplingPolicy | None = None,
+        station_id: str | None = None,
+        thresholds: ThresholdRegistry | None = None,
+        **kwargs,
+    ):
         super().__init__(jid, password, *args, **kwargs)
         self.target_jid = target_jid
+        self.rollups = rollups
+        self.driver = driver
+        self.history = ReadingHistory(history_capacity)
+        self.sampling = sampling or SamplingPolicy()
+        self.station_id = station_id or self.name
+        self.thresholds = thresholds or THRESHOLDS
 
     async def setup(self) -> None:
+        _configure_logging()
         logger.info(f"[SensorAgent] setup complete for JID: {self.jid}")
         station = SimulatedLPGStation(normal_duration=4, leak_duration=10)
         behaviour = PerceptionBehaviour(
             period=self.POLL_INTERVAL,
             station=station,
             target_jid=self.target_jid,
+            catch_up=self.CATCH_UP,
+            rollups=self.rollups,
+            driver=self.driver,
+            sampler=AdaptiveSampler(self.sampling, period=self.POLL_INTERVAL),
         )
         self.add_behaviour(behaviour)
+        self.add_behaviour(HistoryQueryBehaviour(lambda msg: self.history), HistoryQueryBehaviour.TEMPLATE)
 
 
 async def main() -> None:
@@ -123,6 +199,7 @@ async def main() -> None:
     password = "password"
     coord_jid = "coordinator@localhost"
 
+    _configure_logging()
     agent = SensorAgent(jid=jid, password=password, target_jid=coord_jid)
     try:
         await asyncio.wait_for(agent.start(auto_register=True), timeout=15)
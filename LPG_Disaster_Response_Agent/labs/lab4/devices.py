@@ -0,0 +1,355 @@
+"""Async sensor drivers and a pty-backed gas-detector emulator.
+
+``SimulatedLPGStation.get_current_readings()`` is synchronous, which is fine
+for a simulator but not for a detector on a serial/RS-485 line: a blocking
+read holds the event loop for the whole round trip and stalls every other
+behaviour and agent on it.  This module defines the driver interface the
+perception behaviours await instead:
+
+``SensorDriver``
+    ``await driver.read()`` returns the usual readings dict
+    (``lpg_ppm``, ``tank_pressure_kpa``, ``pump_state``) or raises
+    :class:`DeviceError` (:class:`DeviceTimeout` when the device does not
+    answer within its ``timeout``).
+``StationDriver``
+    Wraps any object with ``get_current_readings()`` (the simulator,
+    ``ScenarioStation``) so existing code keeps working behind the interface.
+``ModbusDevice``
+    One detector on a :class:`SerialLine`, spoken to with Modbus RTU.  All
+    channels are fetched with a single *read holding registers* (0x03)
+    request (:data:`REGISTERS`).  Reads are non-blocking: the line's file
+    descriptor is watched with ``loop.add_reader``.  Several devices may
+    share a line (a multidrop bus, one ``unit`` id each); the line serialises
+    their requests, while devices on different lines are read in parallel.
+``DeviceEmulator``
+    Opens a pseudo-terminal and answers Modbus requests from a background
+    thread with readings from a simulator station, so the whole stack can be
+    exercised locally: ``ModbusDevice(SerialLine(emulator.path), unit=1)``.
+    ``latency`` adds a per-request delay, like a slow line would.
+
+``read_all()`` polls many drivers concurrently; a failed or slow device only
+costs its own reading.  Only the standard library is used (``pty``,
+``termios``), so this is POSIX-only.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import select
+import struct
+import threading
+import time
+import tty
+from typing import Iterable, Optional, Protocol
+
+from labs.common.metrics import REGISTRY
+
+DEVICE_ERRORS = REGISTRY.counter(
+    "lpg_device_errors_total", "Failed sensor-device reads by error kind", ("device", "kind")
+)
+DEVICE_READ_SECONDS = REGISTRY.histogram(
+    "lpg_device_read_seconds",
+    "Round-trip time of sensor-device reads",
+    ("device",),
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+
+READ_HOLDING_REGISTERS = 0x03
+
+# holding register -> (readings key, scale); values are unsigned 16-bit
+REGISTERS = (
+    ("lpg_ppm", 10),
+    ("tank_pressure_kpa", 10),
+    ("pump_state", 1),
+)
+
+
+class DeviceError(Exception):
+    """A device read failed (bad frame, exception response, I/O error)."""
+
+
+class DeviceTimeout(DeviceError):
+    """The device did not answer within its timeout."""
+
+
+class SensorDriver(Protocol):
+    name: str
+
+    async def read(self) -> dict: ...
+
+
+# ── Modbus RTU framing ──────────────────────────────────────────────────
+
+
+def _crc_table() -> list[int]:
+    table = []
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0xA001 if crc & 1 else crc >> 1
+        table.append(crc)
+    return table
+
+
+_CRC_TABLE = _crc_table()
+
+
+def crc16(data: bytes) -> int:
+    crc = 0xFFFF
+    for byte in data:
+        crc = (crc >> 8) ^ _CRC_TABLE[(crc ^ byte) & 0xFF]
+    return crc
+
+
+def frame(pdu: bytes) -> bytes:
+    return pdu + struct.pack("<H", crc16(pdu))
+
+
+def check_frame(data: bytes) -> bytes:
+    """Return the PDU of ``data`` or raise ``DeviceError`` on a CRC mismatch."""
+    if len(data) < 4 or struct.unpack("<H", data[-2:])[0] != crc16(data[:-2]):
+        raise DeviceError(f"bad frame {data.hex()}")
+    return data[:-2]
+
+
+def encode_readings(readings: dict) -> list[int]:
+    values = []
+    for key, scale in REGISTERS:
+        value = readings[key]
+        if key == "pump_state":
+            value = 1 if value == "ON" else 0
+        values.append(max(0, min(0xFFFF, round(value * scale))))
+    return values
+
+
+def decode_registers(values: Iterable[int]) -> dict:
+    readings = {}
+    for (key, scale), raw in zip(REGISTERS, values):
+        readings[key] = ("ON" if raw else "OFF") if key == "pump_state" else raw / scale
+    return readings
+
+
+# ── drivers ─────────────────────────────────────────────────────────────
+
+
+class StationDriver:
+    """Driver interface over a synchronous simulator station."""
+
+    def __init__(self, station, name: str = "sim") -> None:
+        self.station = station
+        self.name = name
+
+    async def read(self) -> dict:
+        return self.station.get_current_readings()
+
+
+class SerialLine:
+    """A serial port (or pty) opened non-blocking, shared by the devices on it."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._fd: Optional[int] = None
+        self._lock = asyncio.Lock()
+        self._buffer = bytearray()
+        self._waiter: Optional[asyncio.Future] = None
+
+    def _open(self) -> int:
+        if self._fd is None:
+            fd = os.open(self.path, os.O_RDWR | os.O_NOCTTY | os.O_NONBLOCK)
+            if os.isatty(fd):
+                tty.setraw(fd)
+            self._fd = fd
+            asyncio.get_running_loop().add_reader(fd, self._on_readable)
+        return self._fd
+
+    def _on_readable(self) -> None:
+        try:
+            chunk = os.read(self._fd, 4096)
+        except BlockingIOError:
+            return
+        except OSError as exc:
+            self.close()  # the port went away; the next request reopens it
+            if self._waiter is not None and not self._waiter.done():
+                error = DeviceError(f"{self.path}: {exc}")
+                error.__cause__ = exc
+                self._waiter.set_exception(error)
+            return
+        self._buffer += chunk
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    async def transact(self, request: bytes, expect, timeout: float) -> bytes:
+        """Send ``request`` and return the reply once ``expect(buffer)`` gives its length."""
+        async with self._lock:
+            try:
+                fd = self._open()
+                self._buffer.clear()  # late replies to a timed-out request
+                os.write(fd, request)
+            except OSError as exc:  # missing or unplugged port, EIO, EAGAIN
+                self.close()
+                raise DeviceError(f"{self.path}: {exc}") from exc
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + timeout
+            while True:
+                size = expect(self._buffer)
+                if size is not None and len(self._buffer) >= size:
+                    reply = bytes(self._buffer[:size])
+                    del self._buffer[:size]
+                    return reply
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise DeviceTimeout(f"{self.path}: no reply within {timeout:g}s")
+                self._waiter = loop.create_future()
+                try:
+                    await asyncio.wait_for(self._waiter, remaining)
+                except asyncio.TimeoutError:
+                    raise DeviceTimeout(f"{self.path}: no reply within {timeout:g}s") from None
+                finally:
+                    self._waiter = None
+
+    def close(self) -> None:
+        if self._fd is not None:
+            try:
+                asyncio.get_running_loop().remove_reader(self._fd)
+            except RuntimeError:
+                pass  # no loop running any more
+            fd, self._fd = self._fd, None
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+
+def _reply_length(buffer: bytearray) -> Optional[int]:
+    if len(buffer) < 3:
+        return None
+    if buffer[1] & 0x80:
+        return 5  # unit, function | 0x80, exception code, crc
+    return 5 + buffer[2]
+
+
+class ModbusDevice:
+    """A gas detector at ``unit`` on ``line``; all channels in one bulk read."""
+
+    def __init__(self, line: SerialLine, unit: int = 1, timeout: float = 0.5, name: Optional[str] = None) -> None:
+        self.line = line
+        self.unit = unit
+        self.timeout = timeout
+        self.name = name or f"{line.path}#{unit}"
+
+    async def read_registers(self, address: int, count: int) -> list[int]:
+        request = frame(struct.pack(">BBHH", self.unit, READ_HOLDING_REGISTERS, address, count))
+        reply = check_frame(await self.line.transact(request, _reply_length, self.timeout))
+        unit, function = reply[0], reply[1]
+        if unit != self.unit:
+            raise DeviceError(f"{self.name}: reply from unit {unit}")
+        if function & 0x80:
+            raise DeviceError(f"{self.name}: exception code {reply[2]}")
+        if reply[2] != 2 * count:
+            raise DeviceError(f"{self.name}: expected {count} registers, got {reply[2] // 2}")
+        return list(struct.unpack(f">{count}H", reply[3:]))
+
+    async def read(self) -> dict:
+        t0 = time.perf_counter()
+        try:
+            values = await self.read_registers(0, len(REGISTERS))
+        except DeviceTimeout:
+            DEVICE_ERRORS.labels(self.name, "timeout").inc()
+            raise
+        except DeviceError as exc:
+            DEVICE_ERRORS.labels(self.name, "io" if isinstance(exc.__cause__, OSError) else "protocol").inc()
+            raise
+        DEVICE_READ_SECONDS.labels(self.name).observe(time.perf_counter() - t0)
+        return decode_registers(values)
+
+
+async def read_all(drivers: Iterable[SensorDriver]) -> dict[str, dict | DeviceError]:
+    """Read every driver concurrently; failures are returned, not raised."""
+    drivers = list(drivers)
+    results = await asyncio.gather(*(d.read() for d in drivers), return_exceptions=True)
+    out = {}
+    for driver, result in zip(drivers, results):
+        if isinstance(result, BaseException) and not isinstance(result, DeviceError):
+            raise result
+        out[driver.name] = result
+    return out
+
+
+# ── emulator ────────────────────────────────────────────────────────────
+
+
+class DeviceEmulator:
+    """Modbus RTU gas detector(s) on a pseudo-terminal, fed by simulator stations.
+
+    ``stations`` maps unit ids to objects with ``get_current_readings()``.
+    Each bulk read advances that unit's station by one tick.  Requests for
+    units that are not present get no answer, as on a real bus.
+    """
+
+    def __init__(self, stations: dict, latency: float = 0.0) -> None:
+        self.stations = dict(stations)
+        self.latency = latency
+        self.requests = 0
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._slave)
+        self.path = os.ttyname(self._slave)
+        self._stop_r, self._stop_w = os.pipe()
+        self._thread = threading.Thread(target=self._serve, name=f"emulator {self.path}", daemon=True)
+
+    def start(self) -> "DeviceEmulator":
+        self._thread.start()
+        return self
+
+    def __enter__(self) -> "DeviceEmulator":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _serve(self) -> None:
+        buffer = bytearray()
+        while True:
+            ready, _, _ = select.select([self._master, self._stop_r], [], [])
+            if self._stop_r in ready:
+                return
+            try:
+                buffer += os.read(self._master, 4096)
+            except OSError:
+                return
+            while len(buffer) >= 8:
+                request, buffer = bytes(buffer[:8]), buffer[8:]
+                reply = self._answer(request)
+                if reply is None:
+                    continue
+                if self.latency:
+                    time.sleep(self.latency)
+                os.write(self._master, reply)
+
+    def _answer(self, request: bytes) -> Optional[bytes]:
+        try:
+            pdu = check_frame(request)
+        except DeviceError:
+            return None
+        unit, function, address, count = struct.unpack(">BBHH", pdu)
+        station = self.stations.get(unit)
+        if station is None:
+            return None
+        self.requests += 1
+        if function != READ_HOLDING_REGISTERS:
+            return frame(bytes([unit, function | 0x80, 0x01]))  # illegal function
+        registers = encode_readings(station.get_current_readings())
+        if address + count > len(registers):
+            return frame(bytes([unit, function | 0x80, 0x02]))  # illegal data address
+        values = registers[address:address + count]
+        return frame(struct.pack(f">BBB{count}H", unit, function, 2 * count, *values))
+
+    def close(self) -> None:
+        if self._thread.is_alive():
+            os.write(self._stop_w, b"x")
+            self._thread.join(1)
+        for fd in (self._master, self._slave, self._stop_r, self._stop_w):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
@@ -0,0 +1,229 @@
+"""Per-station incident table for the CoordinatorAgent.
+
+Without it the coordinator turns every sensor INFORM into a fresh round of
+REQUESTs – including ``NORMAL_CONDITION`` – so a leak that persists for ten
+ticks is dispatched ten times.  ``StationIncidentTable`` keeps at most one
+open incident per station and classifies each percept:
+
+``OPEN``      no incident open and the event is above ``NORMAL_CONDITION``:
+              open one and dispatch.
+``ESCALATE``  the event is more severe than the incident's current severity:
+              raise the severity and dispatch again.
+``SUPPRESS``  same or lower severity while the incident is open: nothing is
+              sent; the percept only refreshes ``last_seen``.
+``CLOSE``     ``clear_after`` consecutive ``NORMAL_CONDITION`` percepts close
+              the incident (hysteresis, so one good reading in the middle of a
+              leak does not close and re-open it).
+``IGNORE``    ``NORMAL_CONDITION`` with no incident open.
+
+Percepts do not arrive oldest first: the coordinator's intake serves them by
+priority and folds repeats of the same event together.  ``observe`` therefore
+takes the sensor timestamps of the newest and oldest report (``ts_ms``,
+``first_ts_ms``).  A percept older than the newest one seen for the incident
+can still escalate it but is otherwise only suppressed, so a stale
+``NORMAL_CONDITION`` cannot close an incident that a newer reading opened.
+Only ``NORMAL_CONDITION`` reports newer than the last abnormal reading count
+towards ``clear_after``.  Percepts without timestamps are taken in arrival
+order.
+
+An incident whose station has not reported for ``stale_after`` seconds
+(``last_seen``) is expired: its sensor has probably died, and an incident
+that stays open forever would suppress every later percept from the station.
+``expire()`` drops such incidents, and a percept arriving for one is treated
+as if no incident were open.
+
+Only ``OPEN`` and ``ESCALATE`` produce REQUESTs; the coordinator reports each
+dispatch with ``dispatched()``, including how many responders it went to.
+``stats()`` reports how many percepts fell into each class and the responder
+requests sent and avoided.
+
+The module has no SPADE dependency.
+"""
+
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Callable, Optional
+
+from labs.common.core import EventCode
+from labs.common.metrics import REGISTRY
+
+INCIDENT_DECISIONS = REGISTRY.counter(
+    "lpg_incident_decisions_total",
+    "Sensor percepts by incident-table decision (open, escalate, suppress, close, ignore)",
+    ("agent", "action"),
+)
+
+
+class Action(Enum):
+    OPEN = "open"
+    ESCALATE = "escalate"
+    SUPPRESS = "suppress"
+    CLOSE = "close"
+    IGNORE = "ignore"
+
+    @property
+    def dispatches(self) -> bool:
+        return self in (Action.OPEN, Action.ESCALATE)
+
+
+@dataclass
+class StationIncident:
+    station: str
+    severity: EventCode
+    opened: float
+    last_seen: float
+    percepts: int = 1
+    clear_streak: int = 0
+    dispatches: list[str] = field(default_factory=list)  # dispatch (correlation) ids
+    last_ts: Optional[int] = None  # sensor timestamp (ms) of the newest percept
+    last_abnormal_ts: Optional[int] = None
+    clears: list[tuple[Optional[int], Optional[int], int]] = field(default_factory=list)  # (first, last, count)
+
+    def clear(self, first_ts: Optional[int], ts: Optional[int], count: int) -> None:
+        """Count ``NORMAL_CONDITION`` reports that follow the last abnormal reading."""
+        if ts is not None and self.last_abnormal_ts is not None:
+            if ts <= self.last_abnormal_ts:
+                return
+            if first_ts is not None and first_ts <= self.last_abnormal_ts:
+                count = 1  # folded reports straddle it: only the newest is known to follow
+        self.clears.append((first_ts, ts, count))
+        self.clear_streak += count
+
+    def abnormal(self, ts: Optional[int]) -> None:
+        """An abnormal reading: forget the clears it interrupts."""
+        if ts is None:
+            self.clears.clear()
+        else:
+            if self.last_abnormal_ts is None or ts > self.last_abnormal_ts:
+                self.last_abnormal_ts = ts
+            self.clears = [
+                (first, last, count if first is not None and first > ts else 1)
+                for first, last, count in self.clears
+                if last is not None and last > ts
+            ]
+        self.clear_streak = sum(count for _, _, count in self.clears)
+
+
+class StationIncidentTable:
+    def __init__(
+        self,
+        clear_after: int = 3,
+        name: str = "coordinator",
+        clock: Callable[[], float] = time.time,
+        stale_after: Optional[float] = None,
+    ) -> None:
+        if clear_after < 1:
+            raise ValueError("clear_after must be at least 1")
+        self.clear_after = clear_after
+        self.name = name
+        self._clock = clock
+        self.stale_after = stale_after
+        self.open: dict[str, StationIncident] = {}
+        self.counts = {action: 0 for action in Action}
+        self.closed = 0
+        self.expired = 0
+        self.requests_sent = 0
+
+    def observe(
+        self,
+        station: str,
+        event: EventCode,
+        count: int = 1,
+        ts_ms: Optional[int] = None,
+        first_ts_ms: Optional[int] = None,
+    ) -> tuple[Action, Optional[StationIncident]]:
+        """Classify a percept (``count`` coalesced reports) and update the table.
+
+        ``ts_ms`` is the sensor timestamp of the newest report and
+        ``first_ts_ms`` that of the oldest (``ts_ms`` if not given).
+        """
+        if first_ts_ms is None:
+            first_ts_ms = ts_ms
+        now = self._clock()
+        incident = self.open.get(station)
+        if incident is not None and self.stale_after is not None and now - incident.last_seen > self.stale_after:
+            del self.open[station]
+            self.expired += 1
+            incident = None
+        if incident is None:
+            if event <= EventCode.NORMAL_CONDITION:
+                action = Action.IGNORE
+            else:
+                incident = self.open[station] = StationIncident(
+                    station, event, now, now, percepts=count, last_ts=ts_ms, last_abnormal_ts=ts_ms
+                )
+                action = Action.OPEN
+        else:
+            incident.last_seen = now
+            incident.percepts += count
+            stale = ts_ms is not None and incident.last_ts is not None and ts_ms < incident.last_ts
+            if ts_ms is not None and not stale:
+                incident.last_ts = ts_ms
+            if event <= EventCode.NORMAL_CONDITION:
+                if not stale:
+                    incident.clear(first_ts_ms, ts_ms, count)
+                if not stale and incident.clear_streak >= self.clear_after:
+                    del self.open[station]
+                    self.closed += 1
+                    action = Action.CLOSE
+                else:
+                    action = Action.SUPPRESS
+            else:
+                incident.abnormal(ts_ms)
+                if event > incident.severity:
+                    incident.severity = event
+                    action = Action.ESCALATE
+                else:
+                    action = Action.SUPPRESS
+        self.counts[action] += count
+        INCIDENT_DECISIONS.labels(self.name, action.value).inc(count)
+        return action, incident
+
+    def expire(self) -> list[StationIncident]:
+        """Drop and return the incidents not seen for ``stale_after`` seconds."""
+        if self.stale_after is None:
+            return []
+        cutoff = self._clock() - self.stale_after
+        stale = [incident for incident in self.open.values() if incident.last_seen < cutoff]
+        for incident in stale:
+            del self.open[incident.station]
+        self.expired += len(stale)
+        return stale
+
+    def restore(self, station: str, severity: EventCode, dispatch_id: str, opened: Optional[float] = None) -> None:
+        """Re-open an incident rebuilt from the journal after a restart."""
+        now = self._clock()
+        incident = self.open.get(station)
+        if incident is None:
+            incident = self.open[station] = StationIncident(station, severity, opened or now, now, percepts=0)
+        elif severity > incident.severity:
+            incident.severity = severity
+        incident.dispatches.append(dispatch_id)
+
+    def dispatched(self, incident: StationIncident, dispatch_id: str, requests: int) -> None:
+        """Record a dispatch for ``incident`` that sent ``requests`` REQUESTs."""
+        incident.dispatches.append(dispatch_id)
+        self.requests_sent += requests
+
+    def stats(self, responders: int = 1) -> dict:
+        """Decision counts plus the responder REQUESTs avoided versus one round per percept.
+
+        A suppressed percept is costed at the mean fan-out of the dispatches
+        so far, or ``responders`` before the first one.
+        """
+        percepts = sum(self.counts.values())
+        dispatched = self.counts[Action.OPEN] + self.counts[Action.ESCALATE]
+        fan_out = self.requests_sent / dispatched if dispatched and self.requests_sent else responders
+        return {
+            "open_incidents": len(self.open),
+            "closed_incidents": self.closed,
+            "expired_incidents": self.expired,
+            "percepts": percepts,
+            **{action.value: n for action, n in self.counts.items()},
+            "requests_sent": self.requests_sent,
+            "requests_avoided": round((percepts - dispatched) * fan_out),
+            "avoided_ratio": round((percepts - dispatched) / percepts, 4) if percepts else 0.0,
+        }
@@ -0,0 +1,165 @@
+"""Bounded, priority-aware message intake for the CoordinatorAgent.
+
+SPADE's per-behaviour mailbox is an unbounded ``asyncio.Queue``.  When sensors
+outrun the coordinator it grows without limit and every queued message waits
+behind every older one.  ``BoundedIntake`` sits between the mailbox and the
+handler:
+
+* items are bucketed by priority (the event's severity code) and served
+  highest priority first, FIFO within a priority;
+* an item whose key (source + event) is already queued is *coalesced* into the
+  queued entry instead of taking another slot;
+* when full, the oldest item of the lowest queued priority is shed to make
+  room, or the incoming item is shed if nothing queued is less important;
+* items at or above ``protected_priority`` (``CRITICAL_GAS_LEVEL`` and control
+  messages such as ``SHUTDOWN``) are never shed, even past capacity.
+
+The module has no SPADE dependency; payloads are opaque.
+"""
+
+from __future__ import annotations
+
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable, Optional
+
+from labs.common.core import EventCode
+
+
+@dataclass
+class IntakeItem:
+    """A queued payload plus the number of duplicates folded into it.
+
+    ``payload`` is the newest of them and ``first`` the oldest.
+    """
+
+    key: Hashable
+    priority: int
+    payload: Any
+    label: str
+    enqueued_at: float
+    count: int = 1
+    first: Any = None
+
+
+class BoundedIntake:
+    def __init__(
+        self,
+        capacity: int = 1000,
+        protected_priority: int = EventCode.CRITICAL_GAS_LEVEL,
+        rate_window: float = 5.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.protected_priority = protected_priority
+        self.rate_window = rate_window
+        self._clock = clock
+
+        self._levels: dict[int, deque[IntakeItem]] = {}
+        self._by_key: dict[Hashable, IntakeItem] = {}
+        self._depth = 0
+
+        self.offered = 0
+        self.admitted = 0
+        self.coalesced = 0
+        self.shed: dict[str, int] = {}
+
+        self._window_start = clock()
+        self._window_count = 0
+        self._rate = 0.0
+
+    def __len__(self) -> int:
+        return self._depth
+
+    # ── producer side ──────────────────────────────────────────────────
+
+    def offer(self, key: Hashable, priority: int, payload: Any, label: str = "") -> bool:
+        """Queue ``payload``; return False if it was shed instead."""
+        now = self._clock()
+        self._count_arrival(now)
+        self.offered += 1
+
+        existing = self._by_key.get(key)
+        if existing is not None:
+            existing.payload = payload
+            existing.count += 1
+            self.coalesced += 1
+            return True
+
+        if self._depth >= self.capacity and priority < self.protected_priority:
+            if not self._evict_below(priority):
+                self._record_shed(label)
+                return False
+
+        item = IntakeItem(key, priority, payload, label, now, first=payload)
+        level = self._levels.get(priority)
+        if level is None:
+            level = self._levels[priority] = deque()
+        level.append(item)
+        self._by_key[key] = item
+        self._depth += 1
+        self.admitted += 1
+        return True
+
+    def _evict_below(self, priority: int) -> bool:
+        for level_priority in sorted(self._levels):
+            if level_priority >= priority:
+                return False
+            level = self._levels[level_priority]
+            if level:
+                victim = level.popleft()
+                del self._by_key[victim.key]
+                self._depth -= 1
+                self._record_shed(victim.label)
+                return True
+        return False
+
+    def _record_shed(self, label: str) -> None:
+        self.shed[label] = self.shed.get(label, 0) + 1
+
+    def _count_arrival(self, now: float) -> None:
+        elapsed = now - self._window_start
+        if elapsed >= self.rate_window:
+            self._rate = self._window_count / elapsed
+            self._window_start = now
+            self._window_count = 0
+        self._window_count += 1
+
+    # ── consumer side ──────────────────────────────────────────────────
+
+    def pop(self) -> Optional[IntakeItem]:
+        """Return the oldest item of the highest queued priority, or None."""
+        for priority in sorted(self._levels, reverse=True):
+            level = self._levels[priority]
+            if level:
+                item = level.popleft()
+                del self._by_key[item.key]
+                self._depth -= 1
+                return item
+        return None
+
+    # ── introspection ──────────────────────────────────────────────────
+
+    @property
+    def intake_rate(self) -> float:
+        """Arrivals per second over the last completed window."""
+        now = self._clock()
+        elapsed = now - self._window_start
+        if elapsed >= self.rate_window:
+            return self._window_count / elapsed
+        return self._rate
+
+    def stats(self) -> dict:
+        return {
+            "depth": self._depth,
+            "capacity": self.capacity,
+            "offered": self.offered,
+            "admitted": self.admitted,
+            "coalesced": self.coalesced,
+            "shed": dict(self.shed),
+            "shed_total": sum(self.shed.values()),
+            "intake_rate": round(self.intake_rate, 3),
+        }
@@ -0,0 +1,295 @@
+"""Write-ahead incident journal with group commit for the CoordinatorAgent.
+
+Each record is one JSON line appended to the journal file::
+
+    {"seq": 12, "ts": 1700000000.1, "kind": "open", "incident": "c-12",
+     "event": "GAS_LEAK_CONFIRMED", "sensor_id": null,
+     "responders": ["responder1@localhost", "responder2@localhost"]}
+    {"seq": 13, "ts": ..., "kind": "complete", "incident": "c-12", "responder": "responder1@localhost"}
+    {"seq": 14, "ts": ..., "kind": "close", "incident": "c-12"}
+
+``append()`` only buffers the record and returns a future.  A background
+committer writes everything buffered within ``commit_window`` seconds (or as
+soon as ``max_batch`` records are waiting) and issues a single ``fsync`` for
+the whole batch, off the event loop.  Callers that need the record on disk
+before continuing await the future; callers that only need bounded loss (at
+most one commit window) do not.
+
+``replay()`` rebuilds the in-flight incident table from a journal and reports
+how long that took, so recovery time can be measured against journal size
+(``python -m labs.lab4.journal --bench``).
+
+Without compaction the file, and with it the replay time, would grow with
+every incident ever handled.  Given a ``snapshot`` callable that returns the
+open incidents, the committer writes a checkpoint once ``compact_after``
+records have been written since the last one::
+
+    {"seq": 90, "ts": ..., "kind": "checkpoint", "incidents": {"c-12": {
+     "event": "GAS_LEAK_CONFIRMED", "sensor_id": null, "opened": 1700000000.1,
+     "pending": ["responder2@localhost"]}}}
+
+The checkpoint is written to a new file, fsynced and renamed over the
+journal, so the journal only ever holds the open incidents plus the records
+since.  Records buffered when the snapshot is taken are already part of it.
+``replay()`` starts over at a checkpoint and skips older records.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Optional
+
+
+@dataclass
+class Recovery:
+    """Result of replaying a journal."""
+
+    incidents: dict[str, dict] = field(default_factory=dict)
+    records: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+    last_seq: int = 0
+    torn: int = 0  # unparsable (partially written) lines skipped
+    checkpoint_seq: int = 0  # seq of the last checkpoint, 0 if there is none
+
+
+def replay(path) -> Recovery:
+    """Rebuild in-flight incidents from the journal at ``path``."""
+    recovery = Recovery()
+    path = Path(path)
+    if not path.exists():
+        return recovery
+    t0 = time.perf_counter()
+    incidents = recovery.incidents
+    with open(path, "rb") as fh:
+        for raw in fh:
+            recovery.bytes += len(raw)
+            try:
+                rec = json.loads(raw)
+            except ValueError:
+                recovery.torn += 1
+                continue
+            recovery.records += 1
+            seq = rec.get("seq", 0)
+            recovery.last_seq = max(recovery.last_seq, seq)
+            kind = rec.get("kind")
+            incident = rec.get("incident")
+            if kind == "checkpoint":
+                incidents.clear()
+                for incident_id, state in rec.get("incidents", {}).items():
+                    incidents[incident_id] = {**state, "pending": set(state.get("pending", ()))}
+                recovery.checkpoint_seq = seq
+            elif seq < recovery.checkpoint_seq:
+                continue  # already part of the checkpoint
+            elif kind == "open":
+                incidents[incident] = {
+                    "event": rec.get("event"),
+                    "sensor_id": rec.get("sensor_id"),
+                    "opened": rec.get("ts"),
+                    "pending": set(rec.get("responders", ())),
+                }
+            elif kind == "complete" and incident in incidents:
+                incidents[incident]["pending"].discard(rec.get("responder"))
+            elif kind == "close":
+                incidents.pop(incident, None)
+    recovery.seconds = time.perf_counter() - t0
+    return recovery
+
+
+class IncidentJournal:
+    def __init__(
+        self,
+        path,
+        commit_window: float = 0.02,
+        max_batch: int = 512,
+        fsync: bool = True,
+        compact_after: int = 10_000,
+    ) -> None:
+        self.path = Path(path)
+        self.commit_window = commit_window
+        self.max_batch = max_batch
+        self.fsync = fsync
+        self.compact_after = compact_after
+
+        self._seq = 0
+        self._pending: list[tuple[str, asyncio.Future]] = []
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._fh = None
+        self._closing = False
+        self._snapshot: Optional[Callable[[], dict]] = None
+        self._since_checkpoint = 0
+
+        self.commits = 0
+        self.records_written = 0
+        self.commit_seconds = 0.0
+        self.checkpoints = 0
+
+    def recover(self) -> Recovery:
+        """Replay the existing journal and continue its sequence numbers."""
+        recovery = replay(self.path)
+        self._seq = recovery.last_seq
+        self._since_checkpoint = recovery.records
+        return recovery
+
+    async def start(self, snapshot: Optional[Callable[[], dict]] = None) -> None:
+        """Start the committer; ``snapshot()`` returns the open incidents for checkpoints."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._fh = open(self.path, "ab")
+        self._wake = asyncio.Event()
+        self._closing = False
+        self._snapshot = snapshot
+        self._task = asyncio.create_task(self._committer())
+
+    def append(self, kind: str, **fields) -> asyncio.Future:
+        """Buffer a record; the returned future resolves once it is durable."""
+        if self._task is None:
+            raise RuntimeError("journal not started")
+        self._seq += 1
+        record = {"seq": self._seq, "ts": time.time(), "kind": kind, **fields}
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((json.dumps(record, separators=(",", ":")) + "\n", future))
+        if len(self._pending) >= self.max_batch:
+            self._wake.set()
+        return future
+
+    async def close(self) -> None:
+        if self._task is None:
+            return
+        self._closing = True
+        self._wake.set()
+        await self._task
+        self._task = None
+        self._fh.close()
+        self._fh = None
+
+    async def _committer(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.commit_window)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            batch, self._pending = self._pending, []
+            if batch:
+                t0 = time.perf_counter()
+                try:
+                    await asyncio.to_thread(self._write, "".join(line for line, _ in batch))
+                except Exception as exc:
+                    for _, future in batch:
+                        if not future.done():
+                            future.set_exception(exc)
+                else:
+                    for _, future in batch:
+                        if not future.done():
+                            future.set_result(None)
+                self.commit_seconds += time.perf_counter() - t0
+                self.commits += 1
+                self.records_written += len(batch)
+                self._since_checkpoint += len(batch)
+            if self._snapshot is not None and self._since_checkpoint >= self.compact_after:
+                await self._checkpoint()
+            if self._closing and not self._pending:
+                return
+
+    async def _checkpoint(self) -> None:
+        # snapshot and buffer are taken together, so buffered records are in the snapshot
+        self._seq += 1
+        incidents = {
+            incident_id: {**state, "pending": sorted(state["pending"])}
+            for incident_id, state in self._snapshot().items()
+        }
+        record = {"seq": self._seq, "ts": time.time(), "kind": "checkpoint", "incidents": incidents}
+        batch, self._pending = self._pending, []
+        try:
+            await asyncio.to_thread(self._rewrite, json.dumps(record, separators=(",", ":")) + "\n")
+        except Exception as exc:
+            print(f"[Journal] checkpoint failed, journal left as it was: {exc}")
+            self._pending = batch + self._pending
+            self._since_checkpoint = 0  # retry after another compact_after records
+            return
+        for _, future in batch:
+            if not future.done():
+                future.set_result(None)
+        self._since_checkpoint = 0
+        self.checkpoints += 1
+
+    def _rewrite(self, checkpoint: str) -> None:
+        tmp = self.path.with_name(self.path.name + ".checkpoint")
+        with open(tmp, "wb") as fh:
+            fh.write(checkpoint.encode("utf-8"))
+            fh.flush()
+            if self.fsync:
+                os.fsync(fh.fileno())
+        os.replace(tmp, self.path)
+        self._fh.close()
+        self._fh = open(self.path, "ab")
+
+    def _write(self, data: str) -> None:
+        self._fh.write(data.encode("utf-8"))
+        self._fh.flush()
+        if self.fsync:
+            os.fsync(self._fh.fileno())
+
+    def stats(self) -> dict:
+        return {
+            "records_written": self.records_written,
+            "commits": self.commits,
+            "records_per_commit": round(self.records_written / self.commits, 2) if self.commits else 0.0,
+            "commit_seconds": round(self.commit_seconds, 4),
+            "buffered": len(self._pending),
+            "checkpoints": self.checkpoints,
+        }
+
+
+async def _bench(sizes: list[int], compact_after: Optional[int] = None) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            path = Path(tmp) / f"journal_{size}.jsonl"
+            journal = IncidentJournal(path, compact_after=compact_after or 10_000)
+            incidents: dict[str, dict] = {}
+            await journal.start(snapshot=(lambda: incidents) if compact_after else None)
+            t0 = time.perf_counter()
+            for i in range(size // 3):
+                incident = f"c-{i}"
+                incidents[incident] = {"event": "GAS_LEAK_CONFIRMED", "sensor_id": None, "opened": time.time(),
+                                       "pending": {"r2"}}
+                journal.append("open", incident=incident, event="GAS_LEAK_CONFIRMED",
+                               sensor_id=None, responders=["r1", "r2"])
+                journal.append("complete", incident=incident, responder="r1")
+                if i % 10:  # leave every tenth incident in flight
+                    del incidents[incident]
+                    journal.append("close", incident=incident)
+                if i % 100 == 0:
+                    await asyncio.sleep(0)  # let the committer run, as a live agent would
+            await journal.close()
+            write_s = time.perf_counter() - t0
+            recovery = replay(path)
+            print(
+                f"{recovery.records:>9} records {recovery.bytes / 1e6:>8.2f} MB | "
+                f"write {journal.records_written / write_s:>10.0f} rec/s "
+                f"({journal.stats()['records_per_commit']} rec/fsync, {journal.checkpoints} checkpoints) | "
+                f"replay {recovery.seconds * 1000:>8.1f} ms, {len(recovery.incidents)} in flight"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incident journal utilities")
+    parser.add_argument("--bench", action="store_true", help="measure write throughput and recovery time")
+    parser.add_argument("--sizes", type=int, nargs="*", default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--compact-after", type=int, metavar="N",
+                        help="checkpoint every N records during the benchmark")
+    parser.add_argument("path", nargs="?", help="journal to replay")
+    args = parser.parse_args()
+    if args.bench:
+        asyncio.run(_bench(args.sizes, args.compact_after))
+    elif args.path:
+        result = replay(args.path)
+        print(f"{result.records} records, {len(result.incidents)} in flight, replayed in {result.seconds:.3f}s")
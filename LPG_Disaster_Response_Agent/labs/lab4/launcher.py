@@ -0,0 +1,217 @@
+"""Concurrent agent launcher for Lab 4.
+
+Starting agents one after another means every XMPP connect (and, with
+``auto_register=True``, every in-band registration round trip) is paid in
+sequence.  The launcher groups agents into *phases*: agents inside a phase are
+independent and are started concurrently, while phases run in order so that,
+for example, the coordinator is online before the sensor starts talking to it.
+
+Accounts that registered successfully are remembered in a small JSON cache so
+later runs can skip the registration step entirely.
+
+With ``local=True`` agents are started without any XMPP connection at all:
+SPADE's ``Container`` already delivers messages between agents of the same
+process directly, so ``start_local()`` only runs ``setup()`` and the
+behaviours.  That is enough for load tests and for runs where no XMPP server
+is available, as long as every recipient lives in the same process.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import tempfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable, Optional, Sequence
+
+_LAB4_DIR = Path(__file__).resolve().parent
+DEFAULT_CACHE_FILE = _LAB4_DIR / ".registered_jids.json"
+
+
+class RegistrationCache:
+    """Set of JIDs known to already exist on the XMPP server, persisted as JSON."""
+
+    def __init__(self, path: Optional[Path] = DEFAULT_CACHE_FILE) -> None:
+        self.path = Path(path) if path is not None else None
+        self._known: set[str] = set()
+        self._forgotten: set[str] = set()
+        if self.path is not None and self.path.exists():
+            try:
+                self._known = set(json.loads(self.path.read_text(encoding="utf-8")))
+            except (OSError, ValueError):
+                # a corrupt cache only costs us a registration round trip
+                self._known = set()
+
+    def is_known(self, jid: str) -> bool:
+        return str(jid) in self._known
+
+    def mark(self, jid: str) -> None:
+        self._known.add(str(jid))
+        self._forgotten.discard(str(jid))
+
+    def forget(self, jid: str) -> None:
+        self._known.discard(str(jid))
+        self._forgotten.add(str(jid))
+
+    def save(self) -> None:
+        """Write the cache atomically; safe when several processes save at once.
+
+        Each save goes through its own temporary file and first merges the
+        JIDs already in the file, which other processes may have written.
+        """
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            self._known |= set(json.loads(self.path.read_text(encoding="utf-8"))) - self._forgotten
+        except (OSError, ValueError):
+            pass
+        with tempfile.NamedTemporaryFile(
+            "w", encoding="utf-8", dir=self.path.parent, prefix=self.path.name + ".", suffix=".tmp", delete=False
+        ) as tmp:
+            tmp.write(json.dumps(sorted(self._known)))
+        try:
+            os.replace(tmp.name, self.path)
+        except OSError:
+            os.unlink(tmp.name)
+            raise
+
+
+@dataclass
+class AgentStartup:
+    """Timing record for a single agent start."""
+
+    jid: str
+    phase: int
+    seconds: float
+    registered: bool
+    error: Optional[BaseException] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+@dataclass
+class StartupReport:
+    """Breakdown of startup time per phase and per agent."""
+
+    agents: list[AgentStartup] = field(default_factory=list)
+    phase_seconds: list[float] = field(default_factory=list)
+    total_seconds: float = 0.0
+
+    @property
+    def failures(self) -> list[AgentStartup]:
+        return [a for a in self.agents if not a.ok]
+
+    def summary(self) -> str:
+        registered = sum(1 for a in self.agents if a.registered)
+        lines = [
+            f"[Launcher] started {len(self.agents) - len(self.failures)}/{len(self.agents)} agents "
+            f"in {self.total_seconds:.3f}s ({registered} registered, "
+            f"{len(self.agents) - registered} cached)"
+        ]
+        for idx, seconds in enumerate(self.phase_seconds):
+            phase_agents = [a for a in self.agents if a.phase == idx]
+            slowest = max(phase_agents, key=lambda a: a.seconds, default=None)
+            detail = f", slowest {slowest.jid} {slowest.seconds:.3f}s" if slowest else ""
+            lines.append(
+                f"[Launcher]   phase {idx}: {len(phase_agents)} agents in {seconds:.3f}s{detail}"
+            )
+        for failure in self.failures:
+            lines.append(f"[Launcher]   FAILED {failure.jid}: {failure.error}")
+        return "\n".join(lines)
+
+
+class _LocalClient:
+    """Stands in for the XMPP client of an agent started with ``start_local``."""
+
+    async def disconnect(self) -> None:
+        pass
+
+
+async def start_local(agent) -> None:
+    """Start ``agent`` in-process: ``setup()`` plus behaviours, no XMPP connection.
+
+    Mirrors the tail of ``spade.agent.Agent._async_start``.  Messages reach
+    the agent through the container; ``agent.stop()`` works as usual.
+    """
+    agent.client = _LocalClient()
+    await agent.setup()
+    agent._alive.set()
+    for behaviour in agent.behaviours:
+        if not behaviour.is_running:
+            behaviour.set_agent(agent)
+            states = getattr(behaviour, "get_states", None)
+            if states is not None:
+                for state in states().values():
+                    state.set_agent(agent)
+            behaviour.start()
+
+
+async def _start_one(
+    agent, phase: int, cache: RegistrationCache, sem: asyncio.Semaphore, local: bool = False
+) -> AgentStartup:
+    jid = str(agent.jid)
+    if local:
+        t0 = time.perf_counter()
+        try:
+            await start_local(agent)
+        except Exception as exc:
+            return AgentStartup(jid, phase, time.perf_counter() - t0, False, exc)
+        return AgentStartup(jid, phase, time.perf_counter() - t0, False)
+    register = not cache.is_known(jid)
+    async with sem:
+        t0 = time.perf_counter()
+        try:
+            try:
+                await agent.start(auto_register=register)
+            except Exception:
+                if register:
+                    raise
+                # the cache is stale (e.g. the server was wiped); register once
+                cache.forget(jid)
+                register = True
+                await agent.start(auto_register=True)
+        except Exception as exc:  # usually spade.agent.DisconnectedException
+            return AgentStartup(jid, phase, time.perf_counter() - t0, register, exc)
+    cache.mark(jid)
+    return AgentStartup(jid, phase, time.perf_counter() - t0, register)
+
+
+async def launch(
+    phases: Sequence[Iterable],
+    cache: Optional[RegistrationCache] = None,
+    concurrency: int = 64,
+    local: bool = False,
+) -> StartupReport:
+    """Start ``phases`` of agents in order, each phase concurrently.
+
+    ``concurrency`` caps the number of simultaneous connection attempts so a
+    large fleet does not overwhelm the XMPP server.  If any agent in a phase
+    fails to start, later phases are skipped and the first error is raised
+    with the partial report attached as ``exc.report``.  ``local=True`` starts
+    every agent with :func:`start_local` and leaves the cache untouched.
+    """
+    cache = cache if cache is not None else RegistrationCache(None if local else DEFAULT_CACHE_FILE)
+    sem = asyncio.Semaphore(max(1, concurrency))
+    report = StartupReport()
+    t_start = time.perf_counter()
+    try:
+        for idx, agents in enumerate(phases):
+            t_phase = time.perf_counter()
+            results = await asyncio.gather(*(_start_one(a, idx, cache, sem, local) for a in agents))
+            report.phase_seconds.append(time.perf_counter() - t_phase)
+            report.agents.extend(results)
+            if report.failures:
+                report.total_seconds = time.perf_counter() - t_start
+                error = report.failures[0].error
+                error.report = report
+                raise error
+    finally:
+        cache.save()
+    report.total_seconds = time.perf_counter() - t_start
+    return report
@@ -0,0 +1,365 @@
+"""Load harness for the Lab 4 topology.
+
+``main.py`` always runs one sensor, one coordinator and two responders.  This
+harness builds an arbitrary topology instead and drives it with synthetic
+sensor traffic at a fixed aggregate rate:
+
+* ``sensors`` load generators, each reporting for ``stations`` logical
+  stations (``sensor_id`` metadata) with a configurable event mix;
+* ``coordinators`` unmodified ``CoordinatorAgent`` s, each owning a share of
+  the sensors and ``responders`` unmodified ``ResponseAgent`` s whose
+  simulated work time is ``work_seconds``.
+
+Agents are started with :func:`labs.lab4.launcher.start_local` by default, so
+messages travel through SPADE's in-process container and no XMPP server is
+needed; ``--xmpp`` connects them to a real server instead.
+
+``sweep()`` runs one level per requested rate and reports, per level:
+offered rate, incident throughput, coalesced/shed reports, backlog left after
+the drain period and p50/p99/p999 of dispatch latency (report sent ->
+REQUESTs out) and end-to-end latency (report sent -> last responder done).
+A level counts as *saturated* when it sheds reports, leaves a backlog, or
+its end-to-end p99 exceeds ``latency_slo``; the first saturated rate is the
+saturation point.
+
+Run ``python -m labs.lab4.loadtest --help`` for the options, e.g.::
+
+    python -m labs.lab4.loadtest --coordinators 2 --responders 3 --rates 10 50 200 1000
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import logging
+import os
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Optional, Sequence
+
+from spade.agent import Agent
+from spade.behaviour import CyclicBehaviour
+from spade.container import Container
+from spade.message import Message
+
+from labs.common.core import event_code
+from labs.common.payload import ONTOLOGY, Kind, encode, now_ms
+from labs.common.sketches import DDSketch
+from labs.lab4.agents.coordinator_agent import CoordinatorAgent
+from labs.lab4.agents.response_agent import ResponseAgent
+from labs.lab4.launcher import launch
+
+DEFAULT_EVENT_MIX = {
+    "NORMAL_CONDITION": 0.70,
+    "POSSIBLE_GAS_LEAK": 0.20,
+    "GAS_LEAK_CONFIRMED": 0.08,
+    "CRITICAL_GAS_LEVEL": 0.02,
+}
+
+
+@dataclass
+class Topology:
+    sensors: int = 1
+    coordinators: int = 1
+    responders: int = 2  # per coordinator
+    stations: int = 10  # logical stations per sensor
+    event_mix: dict = field(default_factory=lambda: dict(DEFAULT_EVENT_MIX))
+
+
+@dataclass
+class LevelResult:
+    rate: float
+    duration: float
+    sent: int = 0
+    handled: int = 0  # reports handled by coordinators, coalesced ones included
+    opened: int = 0
+    completed: int = 0
+    coalesced: int = 0
+    shed: int = 0
+    avoided: int = 0  # responder REQUESTs the station incident table did not send
+    backlog: int = 0  # incidents in flight + reports queued after the drain
+    elapsed: float = 0.0
+    dispatch: DDSketch = field(default_factory=DDSketch)
+    e2e: DDSketch = field(default_factory=DDSketch)
+
+    @property
+    def offered_rate(self) -> float:
+        return self.sent / self.duration if self.duration else 0.0
+
+    @property
+    def throughput(self) -> float:
+        """Incidents completed per second over the whole level."""
+        return self.completed / self.elapsed if self.elapsed else 0.0
+
+    def saturated(self, latency_slo: float) -> bool:
+        p99 = self.e2e.quantile(0.99)
+        return bool(self.shed or self.backlog or (p99 is not None and p99 > latency_slo))
+
+
+class LoadSensorAgent(Agent):
+    """Emits INFORM reports at ``rate`` per second for ``duration`` seconds."""
+
+    TICK = 0.005  # pacing granularity
+
+    def __init__(self, jid, password, target_jid, rate, duration, stations, event_mix, seed=0, **kwargs):
+        super().__init__(jid, password, **kwargs)
+        self.target_jid = target_jid
+        self.rate = rate
+        self.duration = duration
+        self.station_ids = [f"{self.name}-st{i}" for i in range(stations)]
+        self.events = list(event_mix)
+        self.weights = list(event_mix.values())
+        self.rng = random.Random(seed)
+        self.sent = 0
+        self.finished = asyncio.Event()
+
+    class Generate(CyclicBehaviour):
+        async def on_start(self) -> None:
+            self.started = time.monotonic()
+            self.total = int(self.agent.rate * self.agent.duration)
+
+        async def run(self) -> None:
+            agent = self.agent
+            elapsed = time.monotonic() - self.started
+            due = min(int(agent.rate * elapsed), self.total) - agent.sent
+            for _ in range(due):
+                msg = Message(to=agent.target_jid)
+                msg.set_metadata("performative", "inform")
+                msg.set_metadata("ontology", ONTOLOGY)
+                msg.set_metadata("sent_at", repr(time.monotonic()))
+                event = event_code(agent.rng.choices(agent.events, agent.weights)[0])
+                msg.body = encode(Kind.PERCEPT, event, agent.rng.choice(agent.station_ids), now_ms())
+                await self.send(msg)
+                agent.sent += 1
+            if agent.sent >= self.total:
+                self.kill()
+            else:
+                await asyncio.sleep(agent.TICK)
+
+        async def on_end(self) -> None:
+            # also reached if run() raised, so the harness never waits forever
+            self.agent.finished.set()
+
+    async def setup(self) -> None:
+        self.add_behaviour(self.Generate())
+
+
+class MeasuredCoordinator(CoordinatorAgent):
+    """``CoordinatorAgent`` that timestamps incidents for the harness."""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.handled = 0
+        self.opened = 0
+        self.completed = 0
+        self.dispatch_latency = DDSketch()
+        self.e2e_latency = DDSketch()
+
+    class MessageHandler(CoordinatorAgent.MessageHandler):
+        async def _handle(self, msg: Message, count: int = 1, payload=None, first_ts_ms=None) -> None:
+            sent_at = msg.get_metadata("sent_at")
+            if sent_at is None:  # responder feedback
+                await super()._handle(msg, count, payload, first_ts_ms)
+                return
+            self.agent.handled += count
+            await super()._handle(msg, count, payload, first_ts_ms)
+            self.agent.dispatch_latency.add(time.monotonic() - float(sent_at))
+
+        def _open_incident(self, msg: Message, event, sensor_id, responders) -> str:
+            # the origin travels with the percept that opened the incident
+            incident_id = super()._open_incident(msg, event, sensor_id, responders)
+            sent_at = msg.get_metadata("sent_at")
+            self.agent.incidents[incident_id]["origin"] = None if sent_at is None else float(sent_at)
+            self.agent.opened += 1
+            return incident_id
+
+    def complete_incident(self, incident_id: str, responder: str) -> None:
+        incident = self.incidents.get(incident_id)
+        super().complete_incident(incident_id, responder)
+        if incident is not None and incident_id not in self.incidents:
+            self.completed += 1
+            if incident.get("origin") is not None:
+                self.e2e_latency.add(time.monotonic() - incident["origin"])
+
+
+def _build(topology: Topology, rate: float, duration: float, work_seconds: float, prefix: str):
+    coordinators, responders, sensors = [], [], []
+    sensor_prefix = f"{prefix}sensor"
+    for c in range(topology.coordinators):
+        coord_jid = f"{prefix}coordinator{c}@localhost"
+        response_jids = [f"{prefix}c{c}_responder{r}@localhost" for r in range(topology.responders)]
+        for jid in response_jids:
+            responder = ResponseAgent(jid, "password", coord_jid)
+            responder.WORK_SECONDS = work_seconds
+            responders.append(responder)
+        coordinators.append(MeasuredCoordinator(coord_jid, "password", sensor_prefix, response_jids))
+    per_sensor = rate / max(topology.sensors, 1)
+    for s in range(topology.sensors):
+        target = coordinators[s % len(coordinators)]
+        sensors.append(
+            LoadSensorAgent(
+                f"{sensor_prefix}{s}@localhost", "password", str(target.jid),
+                per_sensor, duration, topology.stations, topology.event_mix, seed=s,
+            )
+        )
+    return coordinators, responders, sensors
+
+
+def _backlog(coordinators: Sequence[MeasuredCoordinator]) -> int:
+    """Incidents in flight plus reports queued in intakes and mailboxes."""
+    total = 0
+    for c in coordinators:
+        total += len(c.incidents) + len(c.intake)
+        total += sum(b.mailbox_size() for b in c.behaviours if b.queue is not None)
+    return total
+
+
+def _drained(coordinators: Sequence[MeasuredCoordinator], sensors: Sequence[LoadSensorAgent]) -> bool:
+    # every report sent was handled (possibly coalesced) or shed, and nothing is in flight;
+    # reports still being delivered are not visible in any queue yet
+    accounted = sum(c.handled + sum(c.intake.shed.values()) for c in coordinators)
+    return accounted >= sum(s.sent for s in sensors) and not _backlog(coordinators)
+
+
+async def run_level(
+    topology: Topology,
+    rate: float,
+    duration: float = 5.0,
+    work_seconds: float = 0.05,
+    drain_timeout: float = 5.0,
+    local: bool = True,
+    prefix: str = "load_",
+) -> LevelResult:
+    """Run one load level and return its measurements."""
+    coordinators, responders, sensors = _build(topology, rate, duration, work_seconds, prefix)
+    agents = [*responders, *coordinators, *sensors]
+    result = LevelResult(rate=rate, duration=duration)
+    t0 = time.monotonic()
+    try:
+        await launch([[*responders, *coordinators], sensors], local=local)
+        await asyncio.gather(*(s.finished.wait() for s in sensors))
+        deadline = time.monotonic() + drain_timeout
+        while not _drained(coordinators, sensors) and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        result.elapsed = time.monotonic() - t0
+    finally:
+        for agent in agents:
+            await agent.stop()
+        # killed behaviours finish their current run() (at most one receive
+        # timeout); unregister only then so late replies still route locally
+        deadline = time.monotonic() + 4.0
+        while any(a.behaviours for a in agents) and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        for agent in agents:
+            Container().unregister(str(agent.jid))
+
+    result.sent = sum(s.sent for s in sensors)
+    result.backlog = _backlog(coordinators)
+    for c in coordinators:
+        result.handled += c.handled
+        result.opened += c.opened
+        result.completed += c.completed
+        result.coalesced += c.intake.coalesced
+        result.shed += sum(c.intake.shed.values())
+        result.avoided += c.incident_stats()["requests_avoided"]
+        result.dispatch.merge(c.dispatch_latency)
+        result.e2e.merge(c.e2e_latency)
+    return result
+
+
+async def sweep(
+    topology: Topology,
+    rates: Sequence[float],
+    latency_slo: float = 2.0,
+    stop_after_saturation: bool = True,
+    quiet: bool = True,
+    **level_kwargs,
+) -> list[LevelResult]:
+    """Run ``run_level`` for each rate (ascending) and print a report line per level."""
+    results = []
+    print(format_header())
+    for idx, rate in enumerate(sorted(rates)):
+        sink = open(os.devnull, "w") if quiet else None
+        try:
+            # the agents print every message; keep them off the report
+            with contextlib.redirect_stdout(sink) if sink else contextlib.nullcontext():
+                result = await run_level(topology, rate, prefix=f"load{idx}_", **level_kwargs)
+        finally:
+            if sink:
+                sink.close()
+        results.append(result)
+        print(format_row(result, latency_slo))
+        if stop_after_saturation and result.saturated(latency_slo):
+            break
+    point = saturation_point(results, latency_slo)
+    print(f"saturation point: {point:g} reports/s" if point is not None else "no saturation in the tested range")
+    return results
+
+
+def saturation_point(results: Sequence[LevelResult], latency_slo: float) -> Optional[float]:
+    for result in results:
+        if result.saturated(latency_slo):
+            return result.rate
+    return None
+
+
+def _ms(value: Optional[float]) -> str:
+    return f"{value * 1000:9.1f}" if value is not None else f"{'-':>9}"
+
+
+def format_header() -> str:
+    return (
+        f"{'rate/s':>8}{'offered':>9}{'handled':>9}{'inc/s':>8}{'coalesc':>9}{'shed':>7}{'avoided':>8}{'backlog':>8}"
+        f"{'disp p50':>9}{'disp p99':>9}{'e2e p50':>9}{'e2e p99':>9}{'e2e p999':>9}  state"
+    )
+
+
+def format_row(r: LevelResult, latency_slo: float) -> str:
+    return (
+        f"{r.rate:>8g}{r.offered_rate:>9.1f}{r.handled:>9}{r.throughput:>8.1f}{r.coalesced:>9}{r.shed:>7}{r.avoided:>8}{r.backlog:>8}"
+        f"{_ms(r.dispatch.quantile(0.5))}{_ms(r.dispatch.quantile(0.99))}"
+        f"{_ms(r.e2e.quantile(0.5))}{_ms(r.e2e.quantile(0.99))}{_ms(r.e2e.quantile(0.999))}"
+        f"  {'SATURATED' if r.saturated(latency_slo) else 'ok'}"
+    )
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Sweep load levels over a generated Lab 4 topology")
+    parser.add_argument("--sensors", type=int, default=1)
+    parser.add_argument("--coordinators", type=int, default=1)
+    parser.add_argument("--responders", type=int, default=2, help="responders per coordinator")
+    parser.add_argument("--stations", type=int, default=10, help="logical stations per sensor")
+    parser.add_argument("--rates", type=float, nargs="+", default=[1, 5, 20, 50, 100, 500],
+                        help="aggregate sensor reports per second, one level each")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds of traffic per level")
+    parser.add_argument("--work", type=float, default=0.05, help="responder work time per request (s)")
+    parser.add_argument("--drain", type=float, default=5.0, help="seconds allowed to drain the backlog")
+    parser.add_argument("--slo", type=float, default=2.0, help="end-to-end p99 latency limit (s)")
+    parser.add_argument("--all", action="store_true", help="keep going after the first saturated level")
+    parser.add_argument("--verbose", action="store_true", help="show the agents' own output")
+    parser.add_argument("--xmpp", action="store_true", help="connect agents to the XMPP server")
+    args = parser.parse_args(argv)
+    if not args.verbose:
+        # replies that arrive after a saturated level is torn down are expected
+        logging.getLogger("spade").setLevel(logging.ERROR)
+
+    topology = Topology(args.sensors, args.coordinators, args.responders, args.stations)
+    asyncio.run(
+        sweep(
+            topology,
+            args.rates,
+            latency_slo=args.slo,
+            stop_after_saturation=not args.all,
+            quiet=not args.verbose,
+            duration=args.duration,
+            work_seconds=args.work,
+            drain_timeout=args.drain,
+            local=not args.xmpp,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
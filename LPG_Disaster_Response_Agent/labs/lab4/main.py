@@ -1,13 +1,24 @@
 """Entry point for Lab 4 simulation.
 
 Starts a SensorAgent, CoordinatorAgent and two ResponseAgents.  Demonstrates the
-FIPA-ACL workflow outlined in the lab instructions.
+FIPA-ACL workflow outlined in the lab instructions.  Independent agents are
+brought up concurrently by :mod:`labs.lab4.launcher`; pass ``--responders N``
+to start a larger pool of response agents, or ``--autoscale`` to let
+:mod:`labs.lab4.pool` grow and shrink the pool with the incident backlog.
+Agent events are shown as trace lines (:mod:`labs.common.tracing`);
+``--trace PATH`` also writes them to a binary trace file and ``--quiet``
+stops showing them.  ``--thresholds PATH`` loads per-station hazard
+thresholds (:mod:`labs.common.thresholds`) and reloads them when the file
+changes.  When the sensor finishes, the coordinator gets up to
+``--drain-timeout`` seconds to work off its queued percepts and collect the
+completions it is still waiting for before everything is stopped.
 
 Run `python -m labs.lab4.main` from the project root after ensuring a local
 XMPP server (e.g. `docker run --rm -p 5222:5222 rroemhildt/ejabberd`) is
 available.
 """
 
+import argparse
 import asyncio
 import sys
 from pathlib import Path
@@ -20,16 +31,57 @@ sys.path.insert(0, str(_PROJECT_ROOT))
 from labs.lab4.agents.sensor_agent import SensorAgent  # noqa: E402
 from labs.lab4.agents.coordinator_agent import CoordinatorAgent  # noqa: E402
 from labs.lab4.agents.response_agent import ResponseAgent  # noqa: E402
-
-
-async def main() -> None:
+from labs.common.metrics import MetricsServer  # noqa: E402
+from labs.common.profiling import BehaviourProfiler  # noqa: E402
+from labs.common.thresholds import THRESHOLDS, ThresholdConfigError  # noqa: E402
+from labs.common.tracing import TRACER  # noqa: E402
+from labs.lab4.journal import IncidentJournal  # noqa: E402
+from labs.lab4.launcher import launch  # noqa: E402
+from labs.lab4.pool import ResponderPool, ScaleResponders, ScalingPolicy  # noqa: E402
+
+
+def _outstanding(coordinator: CoordinatorAgent) -> int:
+    # queued percepts, unread messages and responders the coordinator still waits on
+    queued = len(coordinator.intake) + sum(b.mailbox_size() for b in coordinator.behaviours if b.queue)
+    return queued + sum(len(i["pending"]) for i in coordinator.incidents.values())
+
+
+async def stop_started(agents) -> None:
+    """Stop every agent in ``agents`` that is running, in order."""
+    for agent in agents:
+        if agent.is_alive():
+            await agent.stop()
+
+
+async def drain(coordinator: CoordinatorAgent, timeout: float) -> bool:
+    """Wait until the coordinator has nothing queued or pending; False on timeout."""
+    deadline = asyncio.get_running_loop().time() + timeout
+    while coordinator.is_alive() and _outstanding(coordinator):
+        if asyncio.get_running_loop().time() >= deadline:
+            print(f"[Warning] stopping with {_outstanding(coordinator)} percepts or completions outstanding")
+            return False
+        await asyncio.sleep(0.1)
+    return True
+
+
+async def main(
+    num_responders: int = 2,
+    metrics_port: int | None = 9464,
+    profile_dir: str | None = None,
+    journal_path: str | None = None,
+    max_responders: int | None = None,
+    trace_path: str | None = None,
+    echo: bool = True,
+    thresholds_path: str | None = None,
+    drain_timeout: float = 5.0,
+) -> None:
     print("=" * 60)
     print("Lab 4: Agent Communication (FIPA-ACL) Simulation")
     print("=" * 60)
 
     coord_jid = "coordinator@localhost"
     sensor_jid = "sensor_agent@localhost"
-    responder_jids = ["responder1@localhost", "responder2@localhost"]
+    responder_jids = [f"responder{i}@localhost" for i in range(1, num_responders + 1)]
 
     # instantiate agents
     coordinator = CoordinatorAgent(
@@ -37,6 +89,7 @@ async def main() -> None:
         password="password",
         sensor_jid=sensor_jid,
         response_jids=responder_jids,
+        journal=IncidentJournal(journal_path) if journal_path else None,
     )
 
     responders = [
@@ -46,40 +99,95 @@ async def main() -> None:
 
     sensor = SensorAgent(jid=sensor_jid, password="password", target_jid=coord_jid)
 
-    # start all agents (allow them to register with the XMPP server if
-    # the accounts do not already exist).  Connection failures are handled
-    # gracefully so the script can explain the problem rather than crash.
+    if thresholds_path:
+        try:
+            await THRESHOLDS.start(thresholds_path)
+        except ThresholdConfigError as exc:
+            print(f"[Error] {exc}")
+            return
+
+    pool = None
+    metrics_server = None
+    await TRACER.start(trace_path, echo=echo)
+    if metrics_port is not None:
+        metrics_server = MetricsServer(port=metrics_port)
+        try:
+            await metrics_server.start()
+            print(f"Metrics available at http://127.0.0.1:{metrics_server.port}/metrics")
+        except OSError as exc:
+            print(f"[Warning] metrics endpoint disabled: {exc}")
+            metrics_server = None
+
+    # start all agents (registering accounts that are not yet known to exist).
+    # The coordinator and responders are independent so they connect
+    # concurrently; the sensor only starts once they are all online.
+    # Connection failures are handled gracefully so the script can explain
+    # the problem rather than crash.
     try:
-        await coordinator.start(auto_register=True)
-        print("Coordinator started.")
-
-        for r in responders:
-            await r.start(auto_register=True)
-            print(f"Response agent {r.jid} started.")
+        try:
+            report = await launch([[coordinator, *responders], [sensor]])
+        except Exception as exc:  # usually spade.agent.DisconnectedException
+            print("\n[Error] Unable to connect to XMPP server:", exc)
+            print("Please ensure an XMPP server is running on localhost:5222 and"
+                  " that the hostname/domain in the JIDs matches the server config.")
+            if getattr(exc, "report", None) is not None:
+                print(exc.report.summary())  # which agents came up before the failure
+            return  # the finally below stops the agents that did start
+        print(report.summary() + "\n")
+        if max_responders:
+            pool = ResponderPool(
+                coordinator,
+                responders,
+                ScalingPolicy(min_responders=min(num_responders, max_responders), max_responders=max_responders),
+            )
+            coordinator.add_behaviour(ScaleResponders(pool))
+        if profile_dir:
+            BehaviourProfiler.for_agent(coordinator).enable("wall", "cpu")
 
-        await sensor.start(auto_register=True)
-        print("Sensor agent started.\n")
-    except Exception as exc:  # usually spade.agent.DisconnectedException
-        print("\n[Error] Unable to connect to XMPP server:", exc)
-        print("Please ensure an XMPP server is running on localhost:5222 and"
-              " that the hostname/domain in the JIDs matches the server config.")
-        return
-
-    try:
         while sensor.is_alive() and coordinator.is_alive():
             await asyncio.sleep(1)
+        await drain(coordinator, drain_timeout)
     except KeyboardInterrupt:
         print("\nInterrupted, stopping all agents...")
     finally:
-        if sensor.is_alive():
-            await sensor.stop()
-        for r in responders:
-            if r.is_alive():
-                await r.stop()
-        if coordinator.is_alive():
-            await coordinator.stop()
+        await stop_started([sensor, *(pool.agents.values() if pool is not None else responders), coordinator])
+        profiler = getattr(coordinator, "profiler", None)
+        if profile_dir and profiler is not None and profiler.enabled:
+            for path in profiler.dump(profile_dir):
+                print(f"Profile written to {path}")
+            profiler.disable()
+        if metrics_server is not None:
+            await metrics_server.stop()
+        await TRACER.close()
+        await THRESHOLDS.close()
+        if trace_path:
+            print(f"Trace written to {trace_path} (python -m labs.common.tracing {trace_path})")
         print("All agents stopped. Exiting.")
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--responders", type=int, default=2, help="number of response agents")
+    parser.add_argument("--metrics-port", type=int, default=9464, help="port of the /metrics endpoint")
+    parser.add_argument("--no-metrics", action="store_true", help="do not serve metrics over HTTP")
+    parser.add_argument("--profile", metavar="DIR", help="profile the coordinator and write results to DIR")
+    parser.add_argument("--autoscale", type=int, metavar="MAX",
+                        help="scale the responder pool between --responders and MAX")
+    parser.add_argument("--journal", metavar="PATH", help="write-ahead incident journal for the coordinator")
+    parser.add_argument("--trace", metavar="PATH", help="write agent trace events to a binary file")
+    parser.add_argument("--quiet", action="store_true", help="do not show trace events on stdout")
+    parser.add_argument("--thresholds", metavar="PATH", help="per-station hazard thresholds (JSON, hot-reloaded)")
+    parser.add_argument("--drain-timeout", type=float, default=5.0, metavar="SECONDS",
+                        help="time the coordinator gets to finish outstanding work after the sensor stops")
+    args = parser.parse_args()
+    asyncio.run(main(
+        num_responders=args.responders,
+        metrics_port=None if args.no_metrics else args.metrics_port,
+        profile_dir=args.profile,
+        journal_path=args.journal,
+        max_responders=args.autoscale,
+        trace_path=args.trace,
+        echo=not args.quiet,
+        thresholds_path=args.thresholds,
+        drain_timeout=args.drain_timeout,
+    ))
@@ -0,0 +1,306 @@
+"""Autoscaling pool of ResponseAgents.
+
+``main.py`` used to start a fixed list of responders: requests queued up
+during an incident spike and the idle responders kept their connections open
+the rest of the time.  ``ResponderPool`` owns the responders of one
+coordinator and, on every tick of the :class:`ScaleResponders` behaviour,
+looks at
+
+* **backlog** – REQUESTs the coordinator is still waiting on (the pending
+  responders of its in-flight incidents), in total and per responder,
+* **oldest pending** – age of the oldest incident that is not complete yet,
+  i.e. the completion latency the slowest request is already seeing,
+* **idle time** – per responder, time since it last had a request pending.
+
+``ScalingPolicy.decide()`` turns that snapshot into a decision:
+
+``up``    backlog per responder or the oldest pending age crossed its
+          threshold and the pool is below ``max_responders``: start ``step``
+          new responders and add them to ``coordinator.response_jids``.
+``down``  nothing is pending and a responder has been idle for
+          ``idle_seconds`` while the pool is above ``min_responders``: take it
+          out of ``response_jids`` (no new work is routed to it), then stop it
+          once it has nothing pending, or after ``drain_timeout``.
+``hold``  anything else, including the ``cooldown`` after a change.
+
+Every ``up``/``down`` decision is printed together with the metrics that
+triggered it, kept in ``pool.decisions`` and counted in
+``lpg_pool_scaling_total``; ``lpg_pool_responders`` is the pool size.
+
+``coordinator.response_jids`` is replaced, never mutated in place, so a
+dispatch that is iterating over the old list is not disturbed.
+
+The responders handed to the pool must already be running.  A responder that
+stops on its own is removed on the next tick, like a drained one, and the
+REQUESTs it still held are released with ``coordinator.abandon_responder()``
+so that they neither count as backlog nor age forever; if that leaves the
+pool below ``min_responders`` it is topped up.  Incidents only count towards
+``oldest pending`` while an active responder is still working on them.  If
+starting new responders fails, the ones that did start join the pool and the
+failure is reported; the next tick tries again.
+
+A new responder with a ``location`` is added to ``coordinator.responder_index``
+so that nearest-responder dispatch (``dispatch_k``) can pick it; give the
+``factory`` agents a location when the coordinator dispatches by distance.
+"""
+
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from spade.container import Container
+
+from labs.common.metrics import REGISTRY
+from labs.lab4.agents.periodic import TrackedPeriodicBehaviour
+from labs.lab4.agents.response_agent import ResponseAgent
+from labs.lab4.launcher import launch
+
+POOL_RESPONDERS = REGISTRY.gauge("lpg_pool_responders", "Responders routed to by the coordinator", ("agent",))
+POOL_SCALING = REGISTRY.counter(
+    "lpg_pool_scaling_total", "Responder pool scaling decisions", ("agent", "direction")
+)
+
+
+@dataclass
+class PoolSnapshot:
+    responders: int
+    backlog: int  # REQUESTs not yet completed
+    oldest_pending: float  # seconds
+    idle: dict[str, float]  # responder -> seconds since it last had work
+
+    @property
+    def backlog_per_responder(self) -> float:
+        return self.backlog / self.responders if self.responders else float(self.backlog)
+
+    def describe(self) -> str:
+        most_idle = max(self.idle.values(), default=0.0)
+        return (
+            f"responders={self.responders} backlog={self.backlog} "
+            f"({self.backlog_per_responder:.1f}/responder) oldest_pending={self.oldest_pending:.1f}s "
+            f"max_idle={most_idle:.1f}s"
+        )
+
+
+@dataclass
+class ScalingDecision:
+    action: str  # "up", "down" or "hold"
+    reason: str
+    snapshot: PoolSnapshot
+    count: int = 0
+    responder: Optional[str] = None  # the responder to drain on "down"
+    at: float = field(default_factory=time.time)
+
+
+@dataclass
+class ScalingPolicy:
+    min_responders: int = 1
+    max_responders: int = 8
+    backlog_per_responder: float = 3.0
+    pending_seconds: float = 5.0
+    idle_seconds: float = 30.0
+    cooldown: float = 10.0
+    step: int = 1
+
+    def __post_init__(self) -> None:
+        if not 1 <= self.min_responders <= self.max_responders:
+            raise ValueError("need 1 <= min_responders <= max_responders")
+
+    def decide(self, snap: PoolSnapshot, since_last_change: float) -> ScalingDecision:
+        if since_last_change < self.cooldown:
+            return ScalingDecision("hold", f"cooldown ({since_last_change:.1f}s < {self.cooldown:g}s)", snap)
+
+        if snap.responders < self.min_responders:
+            return ScalingDecision(
+                "up", f"{snap.responders} responders < min_responders {self.min_responders}", snap,
+                count=min(self.step, self.min_responders - snap.responders),
+            )
+
+        reasons = []
+        if snap.backlog_per_responder >= self.backlog_per_responder:
+            reasons.append(f"backlog {snap.backlog_per_responder:.1f}/responder >= {self.backlog_per_responder:g}")
+        if snap.oldest_pending >= self.pending_seconds:
+            reasons.append(f"oldest pending {snap.oldest_pending:.1f}s >= {self.pending_seconds:g}s")
+        if reasons:
+            room = self.max_responders - snap.responders
+            if room <= 0:
+                return ScalingDecision("hold", "at max_responders; " + ", ".join(reasons), snap)
+            return ScalingDecision("up", ", ".join(reasons), snap, count=min(self.step, room))
+
+        if snap.backlog == 0 and snap.responders > self.min_responders and snap.idle:
+            jid, idle = max(snap.idle.items(), key=lambda kv: kv[1])
+            if idle >= self.idle_seconds:
+                return ScalingDecision(
+                    "down", f"{jid} idle {idle:.1f}s >= {self.idle_seconds:g}s", snap, count=1, responder=jid
+                )
+        return ScalingDecision("hold", "within thresholds", snap)
+
+
+class ResponderPool:
+    def __init__(
+        self,
+        coordinator,
+        responders: list[ResponseAgent],
+        policy: Optional[ScalingPolicy] = None,
+        factory: Optional[Callable[[str], ResponseAgent]] = None,
+        jid_template: str = "responder{n}@localhost",
+        drain_timeout: float = 30.0,
+        local: bool = False,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.coordinator = coordinator
+        self.policy = policy or ScalingPolicy()
+        self.factory = factory or (
+            lambda jid: ResponseAgent(jid=jid, password="password", coordinator_jid=str(coordinator.jid))
+        )
+        self.jid_template = jid_template
+        self.drain_timeout = drain_timeout
+        self.local = local
+        self._clock = clock
+        now = clock()
+        self.agents: dict[str, ResponseAgent] = {str(r.jid): r for r in responders}
+        self.draining: dict[str, float] = {}  # responder -> drain start
+        self.last_busy: dict[str, float] = {jid: now for jid in self.agents}
+        self.last_change = now - self.policy.cooldown
+        self.decisions: list[ScalingDecision] = []
+        self._sync()
+
+    @property
+    def active(self) -> list[str]:
+        return [jid for jid in self.agents if jid not in self.draining]
+
+    def _sync(self) -> None:
+        # replace, don't mutate: _handle may be iterating the old list
+        self.coordinator.response_jids = self.active
+        POOL_RESPONDERS.labels(self.coordinator.name).set(len(self.coordinator.response_jids))
+
+    def _pending(self) -> tuple[dict[str, int], float]:
+        now = time.time()
+        active = set(self.active)
+        per_responder: dict[str, int] = {}
+        oldest = 0.0
+        for incident in self.coordinator.incidents.values():
+            pending = incident["pending"]
+            # work held by a drained or stopped responder is not helped by scaling up
+            if not active.isdisjoint(pending):
+                oldest = max(oldest, now - incident["opened"])
+            for jid in pending:
+                per_responder[jid] = per_responder.get(jid, 0) + 1
+        return per_responder, oldest
+
+    def snapshot(self) -> PoolSnapshot:
+        now = self._clock()
+        pending, oldest = self._pending()
+        for jid in pending:
+            self.last_busy[jid] = now
+        active = self.active
+        return PoolSnapshot(
+            responders=len(active),
+            backlog=sum(n for jid, n in pending.items() if jid in self.agents),
+            oldest_pending=oldest,
+            idle={jid: now - self.last_busy.get(jid, now) for jid in active},
+        )
+
+    async def tick(self) -> ScalingDecision:
+        await self._reap()
+        snap = self.snapshot()
+        now = self._clock()
+        decision = self.policy.decide(snap, now - self.last_change)
+        if decision.action == "up":
+            await self.scale_up(decision.count)
+        elif decision.action == "down":
+            self.drain(decision.responder)
+        if decision.action != "hold":
+            self.last_change = now
+            self.decisions.append(decision)
+            POOL_SCALING.labels(self.coordinator.name, decision.action).inc()
+            print(
+                f"[Pool] scale {decision.action} to {len(self.active)} responders: "
+                f"{decision.reason} [{snap.describe()}]"
+            )
+        return decision
+
+    def _free_jid(self, taken: set[str]) -> str:
+        """The ``jid_template`` JID with the lowest index not in ``taken``.
+
+        Retired responders' JIDs are reused, so a long-running pool does not
+        keep creating XMPP accounts (and registration cache entries).
+        """
+        n = 1
+        while self.jid_template.format(n=n) in taken:
+            n += 1
+        return self.jid_template.format(n=n)
+
+    async def scale_up(self, count: int) -> list[str]:
+        new = []
+        taken = set(self.agents)
+        for _ in range(count):
+            jid = self._free_jid(taken)
+            taken.add(jid)
+            new.append(self.factory(jid))
+        try:
+            await launch([new], local=self.local)
+        except Exception as exc:  # usually spade.agent.DisconnectedException
+            print(f"[Pool] could not start every new responder: {exc}")
+            for agent in [a for a in new if not a.is_alive()]:
+                new.remove(agent)
+                Container().unregister(str(agent.jid))
+        now = self._clock()
+        for agent in new:
+            jid = str(agent.jid)
+            self.agents[jid] = agent
+            self.last_busy[jid] = now
+        self._sync()
+        for agent in new:
+            if agent.location is not None:
+                self.coordinator.update_responder(str(agent.jid), agent.location)
+        return [str(a.jid) for a in new]
+
+    def drain(self, jid: str) -> None:
+        """Stop routing to ``jid``; it is stopped by a later tick once idle."""
+        self.draining[jid] = self._clock()
+        self.coordinator.responder_index.remove(jid)
+        self._sync()
+
+    async def _reap(self) -> None:
+        pending, _ = self._pending()
+        now = self._clock()
+        changed = False
+        for jid, agent in list(self.agents.items()):
+            since = self.draining.get(jid)
+            if since is None:
+                if agent.is_alive():
+                    continue
+                reason = "stopped"
+            elif pending.get(jid) and now - since < self.drain_timeout:
+                continue
+            else:
+                reason = "drained"
+            del self.agents[jid]
+            self.draining.pop(jid, None)
+            self.last_busy.pop(jid, None)
+            if agent.is_alive():
+                await agent.stop()
+            Container().unregister(jid)
+            abandoned = self.coordinator.abandon_responder(jid)
+            changed = True
+            print(f"[Pool] removed {reason} responder {jid}" + (f", released {len(abandoned)} requests" if abandoned else ""))
+        if changed:
+            self._sync()
+
+    async def stop(self) -> None:
+        for agent in self.agents.values():
+            if agent.is_alive():
+                await agent.stop()
+
+
+class ScaleResponders(TrackedPeriodicBehaviour):
+    """Runs ``pool.tick()`` on the coordinator every ``period`` seconds."""
+
+    def __init__(self, pool: ResponderPool, period: float = 2.0) -> None:
+        super().__init__(period=period, catch_up="reanchor")
+        self.pool = pool
+
+    async def run(self) -> None:
+        await self.pool.tick()
@@ -0,0 +1,164 @@
+"""Incremental time-window rollups of station telemetry.
+
+Dashboards want min/max/mean/last of ``lpg_ppm`` and ``tank_pressure_kpa`` per
+station at 1 s, 1 min and 1 h resolution.  Rather than rescanning raw log
+lines, ``RollupEngine.add()`` folds every sample into one open bucket per
+resolution – O(1) work per resolution – and ``query()`` reads closed buckets
+straight out of fixed-size ring buffers.
+
+Memory is bounded: each (station, metric, resolution) keeps at most
+``retention`` buckets (by default 1 h of 1 s buckets, 24 h of 1 min buckets
+and 7 days of 1 h buckets).  Buckets with no samples are not stored, so a gap
+in the data simply shows up as a gap in the series.
+
+The module has no SPADE dependency.
+"""
+
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from typing import Callable, Iterable, Optional
+
+DEFAULT_RESOLUTIONS = {1: 3600, 60: 1440, 3600: 168}  # bucket seconds -> buckets kept
+DEFAULT_METRICS = ("lpg_ppm", "tank_pressure_kpa")
+
+
+@dataclass
+class Bucket:
+    """Aggregate of the samples whose timestamps fall in ``[start, start + width)``."""
+
+    start: float
+    count: int
+    min: float
+    max: float
+    sum: float
+    last: float
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count
+
+    def as_dict(self) -> dict:
+        return {
+            "start": self.start,
+            "count": self.count,
+            "min": self.min,
+            "max": self.max,
+            "mean": self.mean,
+            "last": self.last,
+        }
+
+
+class _Series:
+    """Open bucket plus a ring of closed buckets for one resolution."""
+
+    __slots__ = ("width", "capacity", "ring", "head", "size", "open_index", "count", "min", "max", "sum", "last")
+
+    def __init__(self, width: int, capacity: int) -> None:
+        self.width = width
+        self.capacity = capacity
+        self.ring: list[Optional[Bucket]] = [None] * capacity
+        self.head = 0  # slot for the next closed bucket
+        self.size = 0
+        self.open_index: Optional[int] = None
+        self.count = 0
+
+    def add(self, ts: float, value: float) -> None:
+        index = int(ts // self.width)
+        if index != self.open_index:
+            if self.open_index is not None and index < self.open_index:
+                return  # late sample for a bucket already closed; ignore
+            self._close()
+            self.open_index = index
+            self.count = 1
+            self.min = self.max = self.sum = self.last = value
+            return
+        self.count += 1
+        if value < self.min:
+            self.min = value
+        elif value > self.max:
+            self.max = value
+        self.sum += value
+        self.last = value
+
+    def _close(self) -> None:
+        if self.open_index is None or not self.count:
+            return
+        self.ring[self.head] = Bucket(
+            self.open_index * self.width, self.count, self.min, self.max, self.sum, self.last
+        )
+        self.head = (self.head + 1) % self.capacity
+        if self.size < self.capacity:
+            self.size += 1
+
+    def open_bucket(self) -> Optional[Bucket]:
+        if self.open_index is None:
+            return None
+        return Bucket(self.open_index * self.width, self.count, self.min, self.max, self.sum, self.last)
+
+    def closed(self) -> Iterable[Bucket]:
+        """Closed buckets, oldest first."""
+        start = (self.head - self.size) % self.capacity
+        for i in range(self.size):
+            yield self.ring[(start + i) % self.capacity]
+
+
+class RollupEngine:
+    def __init__(
+        self,
+        resolutions: Optional[dict[int, int]] = None,
+        metrics: Iterable[str] = DEFAULT_METRICS,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.resolutions = dict(resolutions or DEFAULT_RESOLUTIONS)
+        self.metrics = tuple(metrics)
+        self._clock = clock
+        self._series: dict[tuple[str, str], list[_Series]] = {}
+
+    def _station_series(self, station: str, metric: str) -> list[_Series]:
+        key = (station, metric)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = [_Series(w, n) for w, n in self.resolutions.items()]
+        return series
+
+    def add(self, station: str, readings: dict, ts: Optional[float] = None) -> None:
+        """Fold one reading (as returned by ``get_current_readings()``) into every resolution."""
+        ts = self._clock() if ts is None else ts
+        for metric in self.metrics:
+            value = readings.get(metric)
+            if value is None:
+                continue
+            for series in self._station_series(station, metric):
+                series.add(ts, float(value))
+
+    def stations(self) -> list[str]:
+        return sorted({station for station, _ in self._series})
+
+    def query(
+        self,
+        station: str,
+        metric: str,
+        resolution: int,
+        since: Optional[float] = None,
+        include_open: bool = True,
+    ) -> list[dict]:
+        """Return buckets (oldest first) for one station, metric and resolution."""
+        if resolution not in self.resolutions:
+            raise ValueError(f"resolution {resolution}s not tracked; choose from {sorted(self.resolutions)}")
+        series_list = self._series.get((station, metric))
+        if series_list is None:
+            return []
+        series = series_list[list(self.resolutions).index(resolution)]
+        buckets = list(series.closed())
+        if include_open and series.open_bucket() is not None:
+            buckets.append(series.open_bucket())
+        if since is not None:
+            buckets = [b for b in buckets if b.start + series.width > since]
+        return [b.as_dict() for b in buckets]
+
+    def latest(self, station: str, metric: str, resolution: int) -> Optional[dict]:
+        """The current (open) bucket, i.e. the most recent window."""
+        buckets = self.query(station, metric, resolution)
+        return buckets[-1] if buckets else None
@@ -0,0 +1,221 @@
+"""Adaptive sampling rate for perception, driven by hazard level and trend.
+
+A fixed ``POLL_INTERVAL`` samples a calm station as often as a leaking one:
+most readings (and the INFORMs they produce) say nothing new, while a
+developing leak is only seen every two seconds.  ``AdaptiveSampler`` picks
+the period of the next reading from the last one:
+
+* the hazard level selects a period from ``SamplingPolicy.periods``
+  (slow when NORMAL, fast from WARNING up),
+* with ``lookahead``, a rising reading is sampled again by the time its
+  trend would reach the next level's threshold (but not faster than that
+  level's period), so a leak is caught on its way up,
+* the period shortens at once but grows by at most ``relax`` per reading,
+  so one quiet reading in the middle of an incident does not drop the rate,
+* everything is clamped to ``[min_period, max_period]``.
+
+``PerceptionBehaviour`` and gateway ``LogicalSensor``s set their period from
+``sampler.update()`` after each reading (a ``SensorAgent`` exports it as
+``lpg_sampling_period_seconds``).  ``SamplingPolicy.fixed(p)`` is the old
+fixed-rate behaviour.  Levels come from the station's
+:class:`~labs.common.core.Thresholds` when ``update()`` is given them.
+
+``evaluate()`` replays recorded scenario traces (:mod:`scenarios`) through a
+policy without agents or sleeping and reports the samples taken and the
+detection latency per hazard level: the time from the trace first reaching a
+level to the first sample that sees it.  ``python -m labs.lab4.sampling``
+compares the adaptive default with the fixed 2 s baseline.
+
+The module has no SPADE dependency.
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+from dataclasses import dataclass, field
+from typing import Iterable, Optional
+
+from labs.common.core import (
+    DEFAULT_THRESHOLDS,
+    HAZARD_LEVELS,
+    PPM_CRITICAL,
+    PPM_DANGER,
+    PPM_WARNING,
+    Thresholds,
+    classify_hazard,
+)
+from labs.common.metrics import REGISTRY
+
+SAMPLING_PERIOD = REGISTRY.gauge("lpg_sampling_period_seconds", "Current adaptive perception period", ("agent",))
+
+TRACE_DT = 2.0  # seconds between scenario-trace ticks (they were recorded at POLL_INTERVAL)
+
+_LEVEL_PPM = {"WARNING": PPM_WARNING, "DANGER": PPM_DANGER, "CRITICAL": PPM_CRITICAL}
+
+
+@dataclass
+class SamplingPolicy:
+    min_period: float = 0.5
+    max_period: float = 5.0
+    periods: dict[str, float] = field(
+        default_factory=lambda: {"NORMAL": 4.0, "WARNING": 1.0, "DANGER": 1.0, "CRITICAL": 1.0}
+    )
+    lookahead: bool = True
+    relax: float = 1.5
+
+    def __post_init__(self) -> None:
+        if not 0 < self.min_period <= self.max_period:
+            raise ValueError("need 0 < min_period <= max_period")
+        if self.relax < 1:
+            raise ValueError("relax must be at least 1")
+        missing = set(HAZARD_LEVELS) - set(self.periods)
+        if missing:
+            raise ValueError(f"no period for hazard levels {sorted(missing)}")
+
+    @classmethod
+    def fixed(cls, period: float) -> "SamplingPolicy":
+        return cls(period, period, {level: period for level in HAZARD_LEVELS})
+
+    def target(self, ppm: float, ppm_slope: float, thresholds: Thresholds = DEFAULT_THRESHOLDS) -> float:
+        hazard = thresholds.classify(ppm)
+        period = self.periods[hazard]
+        if self.lookahead and ppm_slope > 0 and hazard != "CRITICAL":
+            above = HAZARD_LEVELS[HAZARD_LEVELS.index(hazard) + 1]
+            eta = (thresholds.level_ppm(above) - ppm) / ppm_slope
+            period = min(period, max(eta, self.periods[above]))
+        return min(max(period, self.min_period), self.max_period)
+
+
+class AdaptiveSampler:
+    """Per-sensor state: the current period and the previous reading."""
+
+    def __init__(self, policy: Optional[SamplingPolicy] = None, period: Optional[float] = None) -> None:
+        self.policy = policy or SamplingPolicy()
+        start = self.policy.max_period if period is None else period
+        self.period = min(max(start, self.policy.min_period), self.policy.max_period)
+        self._last: Optional[tuple[float, float]] = None  # (time, ppm)
+
+    def update(self, ppm: float, now: float, thresholds: Thresholds = DEFAULT_THRESHOLDS) -> float:
+        """Record a reading taken at ``now`` (seconds); return the next period."""
+        slope = 0.0
+        if self._last is not None and now > self._last[0]:
+            slope = (ppm - self._last[1]) / (now - self._last[0])
+        self._last = (now, ppm)
+        target = self.policy.target(ppm, slope, thresholds)
+        self.period = target if target <= self.period else min(target, self.period * self.policy.relax)
+        return self.period
+
+
+# ── offline evaluation ──────────────────────────────────────────────────
+
+
+def _onsets(values, dt: float) -> dict[str, float]:
+    """Time each level is first reached by the piecewise-linear trace."""
+    onset = {}
+    for level, threshold in _LEVEL_PPM.items():
+        for i, value in enumerate(values):
+            if value >= threshold:
+                prev = values[i - 1] if i else value
+                frac = (threshold - prev) / (value - prev) if i and value != prev else 1.0
+                onset[level] = (i - 1 + frac) * dt if i else 0.0
+                break
+    return onset
+
+
+def _at(values, x: float) -> float:
+    i = min(int(x), len(values) - 1)
+    if i + 1 >= len(values):
+        return float(values[i])
+    frac = x - i
+    return float(values[i] * (1 - frac) + values[i + 1] * frac)
+
+
+@dataclass
+class Replay:
+    samples: int
+    latency: dict[str, Optional[float]]  # level -> seconds, None if never seen; absent if never reached
+
+
+def replay(trace, policy: SamplingPolicy, dt: float = TRACE_DT) -> Replay:
+    """Sample ``trace`` (one reading per ``dt`` seconds, linear in between) under ``policy``."""
+    ppm = trace.lpg_ppm
+    duration = len(ppm) * dt
+    onset = _onsets(ppm, dt)
+
+    sampler = AdaptiveSampler(policy)
+    seen: dict[str, float] = {}
+    samples, t = 0, 0.0
+    while t < duration:
+        value = _at(ppm, t / dt)
+        samples += 1
+        rank = HAZARD_LEVELS.index(classify_hazard(value))
+        for level in HAZARD_LEVELS[1:rank + 1]:
+            seen.setdefault(level, t)
+        t += sampler.update(value, t)
+
+    latency = {level: (seen[level] - start if level in seen else None) for level, start in onset.items()}
+    return Replay(samples, latency)
+
+
+@dataclass
+class Evaluation:
+    traces: int = 0
+    samples: int = 0
+    latencies: dict[str, list[float]] = field(default_factory=lambda: {lvl: [] for lvl in HAZARD_LEVELS[1:]})
+    missed: dict[str, int] = field(default_factory=lambda: {lvl: 0 for lvl in HAZARD_LEVELS[1:]})
+
+    def add(self, result: Replay) -> None:
+        self.traces += 1
+        self.samples += result.samples
+        for level, latency in result.latency.items():
+            if latency is None:
+                self.missed[level] += 1
+            else:
+                self.latencies[level].append(latency)
+
+    def mean_latency(self, level: str) -> float:
+        values = self.latencies[level]
+        return sum(values) / len(values) if values else math.nan
+
+    def p95_latency(self, level: str) -> float:
+        values = sorted(self.latencies[level])
+        return values[min(len(values) - 1, int(0.95 * len(values)))] if values else math.nan
+
+
+def evaluate(traces: Iterable, policy: SamplingPolicy, dt: float = TRACE_DT) -> Evaluation:
+    result = Evaluation()
+    for trace in traces:
+        result.add(replay(trace, policy, dt))
+    return result
+
+
+def _report(names: list[str], per_scenario: int, baseline: float) -> None:
+    from labs.lab2_perception.environment.scenarios import build_corpus
+
+    policies = {f"fixed {baseline:g}s": SamplingPolicy.fixed(baseline), "adaptive": SamplingPolicy()}
+    print(f"{'scenario':<16} {'policy':<10} {'samples':>8} {'warn mean/p95 s':>16} {'danger mean/p95 s':>18} {'missed':>7}")
+    for name in names:
+        corpus = build_corpus([name], per_scenario=per_scenario)
+        for label, policy in policies.items():
+            ev = evaluate(corpus, policy)
+            cells = []
+            for level in ("WARNING", "DANGER"):
+                cells.append(f"{ev.mean_latency(level):.2f}/{ev.p95_latency(level):.2f}")
+            missed = sum(ev.missed.values())
+            print(f"{name:<16} {label:<10} {ev.samples:>8} {cells[0]:>16} {cells[1]:>18} {missed:>7}")
+
+
+def main(argv=None) -> None:
+    from labs.lab2_perception.environment.scenarios import SCENARIOS
+
+    parser = argparse.ArgumentParser(description="Compare adaptive and fixed-rate sampling on recorded scenarios")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="default: all")
+    parser.add_argument("--per-scenario", type=int, default=100, help="seeded variants of each scenario")
+    parser.add_argument("--baseline", type=float, default=2.0, help="fixed period to compare against")
+    args = parser.parse_args(argv)
+    _report(args.scenario or list(SCENARIOS), args.per_scenario, args.baseline)
+
+
+if __name__ == "__main__":
+    main()
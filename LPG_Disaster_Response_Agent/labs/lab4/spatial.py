@@ -0,0 +1,224 @@
+"""Uniform-grid spatial index for nearest-responder dispatch.
+
+Responders move and go busy/available all the time, so the index has to take
+updates as cheaply as queries.  A KD-tree answers nearest-neighbour queries
+well but has to be rebuilt (or rebalanced) as points move.  A uniform grid
+hashes each point to the cell ``(floor(x / cell), floor(y / cell))``, so
+``move()`` and ``set_available()`` are O(1) set operations.
+``nearest(x, y, k)`` searches rings of cells outwards from the query cell.
+It stops once it holds ``k`` candidates that are no farther than the
+distance already fully covered by the rings.
+
+Only *available* points are stored in the grid; busy ones keep their position
+but are skipped by queries at no cost.  Coordinates are planar (e.g. km on a
+local projection).  Pick ``cell_size`` so that a cell holds a handful of
+responders; ``for_fleet()`` derives one from the area and fleet size.
+
+``python -m labs.lab4.spatial --bench`` times queries against fleet size and
+compares them with a linear scan.
+"""
+
+from __future__ import annotations
+
+import argparse
+import heapq
+import math
+import random
+import time
+from typing import Hashable, Iterator, Optional
+
+Cell = tuple[int, int]
+
+
+def format_location(x: float, y: float) -> str:
+    """``location`` message metadata value."""
+    return f"{x:g},{y:g}"
+
+
+def parse_location(value: Optional[str]) -> Optional[tuple[float, float]]:
+    if not value:
+        return None
+    try:
+        x, y = value.split(",")
+        return float(x), float(y)
+    except ValueError:
+        return None
+
+
+class GridIndex:
+    def __init__(self, cell_size: float = 1.0) -> None:
+        if cell_size <= 0:
+            raise ValueError("cell_size must be positive")
+        self.cell_size = cell_size
+        self._cells: dict[Cell, set] = {}
+        self._points: dict[Hashable, tuple[float, float]] = {}
+        self._available: set = set()
+
+    @classmethod
+    def for_fleet(cls, width: float, height: float, fleet: int, per_cell: float = 2.0) -> "GridIndex":
+        """Grid sized so that ``fleet`` uniformly spread points give ``per_cell`` per cell."""
+        return cls(max(math.sqrt(width * height * per_cell / max(fleet, 1)), 1e-9))
+
+    # ── updates ────────────────────────────────────────────────────────
+
+    def _cell(self, x: float, y: float) -> Cell:
+        return (math.floor(x / self.cell_size), math.floor(y / self.cell_size))
+
+    def _link(self, key: Hashable) -> None:
+        self._cells.setdefault(self._cell(*self._points[key]), set()).add(key)
+
+    def _unlink(self, key: Hashable) -> None:
+        cell = self._cell(*self._points[key])
+        members = self._cells[cell]
+        members.discard(key)
+        if not members:
+            del self._cells[cell]
+
+    def add(self, key: Hashable, x: float, y: float, available: bool = True) -> None:
+        if key in self._points:
+            self.remove(key)
+        self._points[key] = (x, y)
+        if available:
+            self._available.add(key)
+            self._link(key)
+
+    def remove(self, key: Hashable) -> None:
+        if key in self._available:
+            self._unlink(key)
+            self._available.discard(key)
+        self._points.pop(key, None)
+
+    def move(self, key: Hashable, x: float, y: float) -> None:
+        available = key in self._available
+        if available:
+            self._unlink(key)
+        self._points[key] = (x, y)
+        if available:
+            self._link(key)
+
+    def set_available(self, key: Hashable, available: bool) -> None:
+        if key not in self._points or (key in self._available) == available:
+            return
+        if available:
+            self._available.add(key)
+            self._link(key)
+        else:
+            self._unlink(key)
+            self._available.discard(key)
+
+    # ── queries ────────────────────────────────────────────────────────
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._points
+
+    def position(self, key: Hashable) -> Optional[tuple[float, float]]:
+        return self._points.get(key)
+
+    def is_available(self, key: Hashable) -> bool:
+        return key in self._available
+
+    @property
+    def available(self) -> int:
+        return len(self._available)
+
+    def _ring(self, cx: int, cy: int, r: int) -> Iterator[Cell]:
+        if r == 0:
+            yield (cx, cy)
+            return
+        for dx in range(-r, r + 1):
+            yield (cx + dx, cy - r)
+            yield (cx + dx, cy + r)
+        for dy in range(-r + 1, r):
+            yield (cx - r, cy + dy)
+            yield (cx + r, cy + dy)
+
+    def nearest(self, x: float, y: float, k: int = 1) -> list[tuple[float, Hashable]]:
+        """Up to ``k`` available points as ``(distance, key)``, nearest first."""
+        if k <= 0 or not self._available:
+            return []
+        k = min(k, len(self._available))
+        cells, points, size = self._cells, self._points, self.cell_size
+        cx, cy = self._cell(x, y)
+        # distance from the query to the edge of its own cell bounds what each ring covers
+        inner = min(x / size - cx, cx + 1 - x / size, y / size - cy, cy + 1 - y / size) * size
+        best: list[tuple[float, Hashable]] = []  # max-heap of the k nearest so far (negated)
+        seen = 0
+        r = 0
+        while True:
+            for cell in self._ring(cx, cy, r):
+                members = cells.get(cell)
+                if not members:
+                    continue
+                seen += len(members)
+                for key in members:
+                    px, py = points[key]
+                    d = math.hypot(px - x, py - y)
+                    if len(best) < k:
+                        heapq.heappush(best, (-d, key))
+                    elif d < -best[0][0]:
+                        heapq.heapreplace(best, (-d, key))
+            covered = inner + r * size  # every point closer than this has been seen
+            if len(best) == k and -best[0][0] <= covered:
+                break
+            if seen >= len(self._available):
+                break
+            r += 1
+            if 8 * r > len(cells):
+                # far from the fleet (or a very fine grid): rings would visit
+                # more empty cells than there are occupied ones
+                return self.nearest_linear(x, y, k)
+        return sorted((-d, key) for d, key in best)
+
+    def nearest_linear(self, x: float, y: float, k: int = 1, busy: bool = False) -> list[tuple[float, Hashable]]:
+        """Brute-force reference for ``nearest``; ``busy=True`` also considers busy points."""
+        available = self._available
+        return heapq.nsmallest(k, (
+            (math.hypot(px - x, py - y), key)
+            for key, (px, py) in self._points.items()
+            if busy or key in available
+        ))
+
+
+def _bench(sizes: list[int], k: int, queries: int, busy: float) -> None:
+    rng = random.Random(7)
+    side = 200.0  # km
+    print(f"{side:g} x {side:g} km region, k={k}, {busy:.0%} of the fleet busy")
+    print(f"{'fleet':>8}{'grid us/q':>11}{'linear us/q':>13}{'update us':>11}")
+    for n in sizes:
+        index = GridIndex.for_fleet(side, side, n)
+        for i in range(n):
+            index.add(i, rng.uniform(0, side), rng.uniform(0, side), available=rng.random() >= busy)
+        probes = [(rng.uniform(0, side), rng.uniform(0, side)) for _ in range(queries)]
+
+        t0 = time.perf_counter()
+        for x, y in probes:
+            index.nearest(x, y, k)
+        grid = (time.perf_counter() - t0) / queries * 1e6
+
+        linear_probes = probes[: max(1, min(queries, 200_000 // max(n, 1)))]
+        t0 = time.perf_counter()
+        for x, y in linear_probes:
+            index.nearest_linear(x, y, k)
+        linear = (time.perf_counter() - t0) / len(linear_probes) * 1e6
+
+        t0 = time.perf_counter()
+        for i in range(min(n, queries)):
+            index.move(i, rng.uniform(0, side), rng.uniform(0, side))
+            index.set_available(i, not index.is_available(i))
+        update = (time.perf_counter() - t0) / min(n, queries) * 1e6
+        print(f"{n:>8}{grid:>11.1f}{linear:>13.1f}{update:>11.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Grid spatial index for responder dispatch")
+    parser.add_argument("--bench", action="store_true", help="time queries against fleet size")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1_000, 10_000, 100_000])
+    parser.add_argument("-k", type=int, default=3)
+    parser.add_argument("--queries", type=int, default=5_000)
+    parser.add_argument("--busy", type=float, default=0.3, help="fraction of responders busy")
+    args = parser.parse_args()
+    if args.bench:
+        _bench(args.sizes, args.k, args.queries, args.busy)
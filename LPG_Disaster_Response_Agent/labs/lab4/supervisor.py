@@ -0,0 +1,408 @@
+"""Multi-process agent host for Lab 4.
+
+``main.py`` runs every agent on one asyncio loop in one process, so a busy
+coordinator or a burst of sensor work stalls all the others and only one core
+is used.  The supervisor places agents into ``workers`` worker processes, each
+running its own loop, and watches over them:
+
+placement
+    Agents are described by picklable :class:`AgentSpec` records.  Specs that
+    share a ``group`` always land on the same worker (a coordinator with its
+    responders and sensors, say); groups are spread over the workers largest
+    first onto the least loaded one.
+restart
+    A worker that exits with a non-zero code (an exception escaping the loop,
+    a segfault, ``kill -9``) is restarted with the same specs.  More than
+    ``max_restarts`` crashes within ``restart_window`` seconds gives up and
+    shuts the whole tree down.
+shutdown
+    Sensors and gateways are *drivers*: once every driver has stopped, or on
+    SIGINT/SIGTERM, the supervisor sets a shared stop event.  Each worker stops
+    its remaining drivers, lets its coordinators finish in-flight incidents
+    for up to ``drain_timeout`` seconds, stops its agents and exits.  Workers
+    still alive after ``shutdown_timeout`` are terminated.  This replaces the
+    ``SHUTDOWN`` message sensors used to send through the coordinator to the
+    responders.
+
+Agents in different workers talk through the XMPP server, exactly as agents
+in different processes always have.  With ``local=True`` agents are started
+with :func:`~labs.lab4.launcher.start_local` and no server is needed, but then
+every group must be self-contained, which is checked up front.
+Independent groups (see :func:`cells`) are what lets throughput grow with
+the number of cores.
+
+Run ``python -m labs.lab4.supervisor --workers 4 --cells 4 --local``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import importlib
+import multiprocessing as mp
+import os
+import queue
+import signal
+import sys
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Optional
+
+if __package__ in (None, ""):
+    # executed as a script: make the project root importable
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+DRIVER_KINDS = frozenset({"sensor", "gateway"})
+_PEER_OPTIONS = ("coordinator", "target", "sensor")
+
+
+@dataclass
+class AgentSpec:
+    """Picklable description of one agent.
+
+    ``kind`` is one of :data:`AGENT_KINDS` or a ``"package.module:factory"``
+    path to a callable taking ``(spec, options)`` and returning an agent.
+    Peers (``coordinator``, ``target``, ``sensor``, ``responders``) are given
+    by name; ``@domain`` is appended when the agent is built.
+    """
+
+    kind: str
+    name: str
+    group: Optional[str] = None
+    options: dict = field(default_factory=dict)
+
+    @property
+    def driver(self) -> bool:
+        return self.options.get("driver", self.kind in DRIVER_KINDS)
+
+    def peers(self) -> list[str]:
+        names = [self.options[key] for key in _PEER_OPTIONS if key in self.options]
+        return names + list(self.options.get("responders", ()))
+
+
+@dataclass
+class HostOptions:
+    domain: str = "localhost"
+    password: str = "password"
+    local: bool = False
+    drain_timeout: float = 5.0
+
+    def jid(self, name: str) -> str:
+        return f"{name}@{self.domain}"
+
+
+# ── agent factories ──────────────────────────────────────────────────────
+# imported lazily so the supervisor process itself never loads SPADE
+
+
+def _coordinator(spec: AgentSpec, opts: HostOptions):
+    from labs.lab4.agents.coordinator_agent import CoordinatorAgent
+
+    return CoordinatorAgent(
+        jid=opts.jid(spec.name),
+        password=opts.password,
+        sensor_jid=opts.jid(spec.options.get("sensor", "sensor_agent")),
+        response_jids=[opts.jid(r) for r in spec.options.get("responders", ())],
+    )
+
+
+def _responder(spec: AgentSpec, opts: HostOptions):
+    from labs.lab4.agents.response_agent import ResponseAgent
+
+    return ResponseAgent(jid=opts.jid(spec.name), password=opts.password,
+                         coordinator_jid=opts.jid(spec.options["coordinator"]))
+
+
+def _sensor(spec: AgentSpec, opts: HostOptions):
+    from labs.lab4.agents.sensor_agent import SensorAgent
+
+    return SensorAgent(jid=opts.jid(spec.name), password=opts.password, target_jid=opts.jid(spec.options["target"]))
+
+
+def _gateway(spec: AgentSpec, opts: HostOptions):
+    from labs.lab4.agents.gateway_agent import SensorGatewayAgent, build_site
+
+    o = spec.options
+    return SensorGatewayAgent(
+        jid=opts.jid(spec.name),
+        password=opts.password,
+        target_jid=opts.jid(o["target"]),
+        sensors=build_site(o.get("sensors", 50), o.get("period", 2.0), o.get("max_cycles", 25)),
+    )
+
+
+AGENT_KINDS: dict[str, Callable] = {
+    "coordinator": _coordinator,
+    "responder": _responder,
+    "sensor": _sensor,
+    "gateway": _gateway,
+}
+
+
+def build_agent(spec: AgentSpec, opts: HostOptions):
+    factory = AGENT_KINDS.get(spec.kind)
+    if factory is None:
+        module, _, attr = spec.kind.partition(":")
+        if not attr:
+            raise ValueError(f"unknown agent kind {spec.kind!r}")
+        factory = getattr(importlib.import_module(module), attr)
+    return factory(spec, opts)
+
+
+# ── topology and placement ───────────────────────────────────────────────
+
+
+def cells(
+    count: int,
+    responders: int = 2,
+    sensors: int = 50,
+    period: float = 2.0,
+    max_cycles: Optional[int] = 25,
+) -> list[AgentSpec]:
+    """``count`` independent groups: coordinator, responders and a gateway."""
+    specs = []
+    for c in range(count):
+        group = f"cell{c}"
+        coord = f"coordinator{c}"
+        rs = [f"c{c}_responder{r}" for r in range(1, responders + 1)]
+        gateway = f"c{c}_gateway"
+        specs.append(AgentSpec("coordinator", coord, group, {"responders": rs, "sensor": gateway}))
+        specs.extend(AgentSpec("responder", r, group, {"coordinator": coord}) for r in rs)
+        specs.append(AgentSpec("gateway", gateway, group, {
+            "target": coord, "sensors": sensors, "period": period, "max_cycles": max_cycles,
+        }))
+    return specs
+
+
+def place(specs: list[AgentSpec], workers: int) -> list[list[AgentSpec]]:
+    """Assign groups of specs to ``workers`` workers, largest group first."""
+    if workers < 1:
+        raise ValueError("workers must be at least 1")
+    groups: dict[str, list[AgentSpec]] = {}
+    for spec in specs:
+        groups.setdefault(spec.group or spec.name, []).append(spec)
+    placement: list[list[AgentSpec]] = [[] for _ in range(workers)]
+    for members in sorted(groups.values(), key=len, reverse=True):
+        min(placement, key=len).extend(members)
+    return placement
+
+
+def check_local(placement: list[list[AgentSpec]]) -> None:
+    """Raise ``ValueError`` if an agent's peer lives in another worker."""
+    where = {spec.name: idx for idx, specs in enumerate(placement) for spec in specs}
+    for idx, specs in enumerate(placement):
+        for spec in specs:
+            for peer in spec.peers():
+                if where.get(peer, idx) != idx:
+                    raise ValueError(
+                        f"{spec.name} (worker {idx}) talks to {peer} (worker {where[peer]}); "
+                        "local mode needs self-contained groups"
+                    )
+
+
+# ── worker process ───────────────────────────────────────────────────────
+
+
+def _worker_main(worker_id: int, specs: list[AgentSpec], opts: HostOptions, stop, status) -> None:
+    # the supervisor owns Ctrl+C; workers stop through ``stop``
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(_host(worker_id, specs, opts, stop, status))
+
+
+async def _host(worker_id: int, specs: list[AgentSpec], opts: HostOptions, stop, status) -> None:
+    import logging
+
+    from labs.lab4.launcher import launch
+
+    logging.getLogger("spade.Agent").setLevel(logging.ERROR)
+    agents = [(spec, build_agent(spec, opts)) for spec in specs]
+    drivers = [a for spec, a in agents if spec.driver]
+    others = [a for spec, a in agents if not spec.driver]
+    t0 = time.perf_counter()
+    report = await launch([others, drivers], local=opts.local)
+    status.put(("up", worker_id, os.getpid(), report.total_seconds))
+
+    idle_reported = False
+    while not stop.is_set():
+        if not idle_reported and not any(a.is_alive() for a in drivers) and not _backlog(others):
+            status.put(("idle", worker_id))
+            idle_reported = True
+        await asyncio.sleep(0.1)
+
+    for agent in drivers:
+        if agent.is_alive():
+            await agent.stop()
+    # let coordinators collect the completions they are still waiting for
+    deadline = time.monotonic() + opts.drain_timeout
+    while time.monotonic() < deadline and any(getattr(a, "incidents", None) for a in others):
+        await asyncio.sleep(0.1)
+    percepts = sum(a.incident_stats()["percepts"] for a in others if hasattr(a, "incident_stats"))
+    for agent in others:
+        if agent.is_alive():
+            await agent.stop()
+    status.put(("stopped", worker_id, percepts, time.perf_counter() - t0))
+
+
+def _backlog(agents) -> int:
+    # percepts still queued at the coordinators of this worker
+    queued = 0
+    for agent in agents:
+        intake = getattr(agent, "intake", None)
+        if intake is not None:
+            queued += len(intake)
+            queued += sum(b.mailbox_size() for b in agent.behaviours if b.queue)
+    return queued
+
+
+# ── supervisor ───────────────────────────────────────────────────────────
+
+
+@dataclass
+class WorkerState:
+    specs: list[AgentSpec]
+    process: Optional[mp.process.BaseProcess] = None
+    restarts: int = 0
+    idle: bool = False
+    percepts: int = 0
+    seconds: float = 0.0
+
+    @property
+    def drives(self) -> bool:
+        return any(spec.driver for spec in self.specs)
+
+
+class Supervisor:
+    def __init__(
+        self,
+        specs: list[AgentSpec],
+        workers: Optional[int] = None,
+        options: Optional[HostOptions] = None,
+        max_restarts: int = 3,
+        restart_window: float = 60.0,
+        shutdown_timeout: float = 10.0,
+    ) -> None:
+        self.options = options or HostOptions()
+        placement = place(specs, workers or os.cpu_count() or 1)
+        if self.options.local:
+            check_local(placement)
+        # workers with nothing to host are not started
+        self.workers = [WorkerState(s) for s in placement if s]
+        self.max_restarts = max_restarts
+        self.restart_window = restart_window
+        self.shutdown_timeout = shutdown_timeout
+        self._ctx = mp.get_context("spawn")
+        self._stop = self._ctx.Event()
+        self._status = self._ctx.Queue()
+        self._crashes: deque[float] = deque()
+        self.failed = False
+
+    def _start(self, wid: int) -> None:
+        state = self.workers[wid]
+        state.idle = False
+        state.process = self._ctx.Process(
+            target=_worker_main,
+            args=(wid, state.specs, self.options, self._stop, self._status),
+            name=f"lab4-worker-{wid}",
+        )
+        state.process.start()
+
+    def request_stop(self, *_args) -> None:
+        self._stop.set()
+
+    def _on_status(self, event: tuple) -> None:
+        kind, wid = event[0], event[1]
+        state = self.workers[wid]
+        if kind == "up":
+            print(f"[Supervisor] worker {wid} (pid {event[2]}) hosting {len(state.specs)} agents, "
+                  f"started in {event[3]:.3f}s")
+        elif kind == "idle":
+            state.idle = True
+        elif kind == "stopped":
+            state.percepts, state.seconds = event[2], event[3]
+
+    def _check_crashes(self) -> None:
+        now = time.monotonic()
+        for wid, state in enumerate(self.workers):
+            code = state.process.exitcode
+            if code is None or code == 0 or self._stop.is_set():
+                continue
+            self._crashes.append(now)
+            while self._crashes and now - self._crashes[0] > self.restart_window:
+                self._crashes.popleft()
+            if len(self._crashes) > self.max_restarts:
+                print(f"[Supervisor] worker {wid} exited with {code}; restart limit reached, shutting down")
+                self.failed = True
+                self._stop.set()
+                return
+            state.restarts += 1
+            print(f"[Supervisor] worker {wid} exited with {code}; restarting (restart {state.restarts})")
+            self._start(wid)
+
+    def _drain_status(self, timeout: float) -> None:
+        try:
+            self._on_status(self._status.get(timeout=timeout))
+            while True:
+                self._on_status(self._status.get_nowait())
+        except queue.Empty:
+            pass
+
+    def run(self) -> int:
+        """Run the tree until the drivers finish or a signal arrives; return an exit code."""
+        previous = {sig: signal.signal(sig, self.request_stop) for sig in (signal.SIGINT, signal.SIGTERM)}
+        t0 = time.perf_counter()
+        try:
+            for wid in range(len(self.workers)):
+                self._start(wid)
+            driving = [s for s in self.workers if s.drives]
+            while not self._stop.is_set():
+                self._drain_status(0.2)
+                self._check_crashes()
+                if driving and all(s.idle for s in driving):
+                    print("[Supervisor] all sensors finished, shutting down")
+                    self._stop.set()
+            busy = time.perf_counter() - t0
+            self._shutdown()
+        finally:
+            for sig, handler in previous.items():
+                signal.signal(sig, handler)
+        percepts = sum(s.percepts for s in self.workers)
+        print(f"[Supervisor] {len(self.workers)} workers handled {percepts} percepts in {busy:.2f}s "
+              f"({percepts / busy:.0f}/s), {time.perf_counter() - t0:.2f}s including shutdown")
+        return 1 if self.failed else 0
+
+    def _shutdown(self) -> None:
+        deadline = time.monotonic() + self.shutdown_timeout
+        for state in self.workers:
+            while state.process.is_alive() and time.monotonic() < deadline:
+                self._drain_status(0.1)
+        for wid, state in enumerate(self.workers):
+            if state.process.is_alive():
+                print(f"[Supervisor] worker {wid} did not stop in time, terminating")
+                state.process.terminate()
+                state.process.join(2)
+                if state.process.is_alive():
+                    state.process.kill()
+            state.process.join()
+        self._drain_status(0.1)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run Lab 4 agents in several worker processes")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--cells", type=int, default=1, help="independent coordinator/responder/gateway groups")
+    parser.add_argument("--responders", type=int, default=2, help="responders per cell")
+    parser.add_argument("--sensors", type=int, default=50, help="logical sensors per gateway")
+    parser.add_argument("--period", type=float, default=2.0, help="sensor polling period in seconds")
+    parser.add_argument("--cycles", type=int, default=25, help="readings per sensor")
+    parser.add_argument("--local", action="store_true", help="no XMPP server; groups must be self-contained")
+    parser.add_argument("--max-restarts", type=int, default=3)
+    args = parser.parse_args(argv)
+    specs = cells(args.cells, args.responders, args.sensors, args.period, args.cycles)
+    supervisor = Supervisor(specs, args.workers, HostOptions(local=args.local), max_restarts=args.max_restarts)
+    return supervisor.run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -11,6 +11,8 @@ if root not in sys.path:
 
 from spade.message import Message
 
+from labs.common.core import EventCode
+from labs.common.payload import Kind, decode, encode
 from labs.lab4.agents.coordinator_agent import CoordinatorAgent
 
 
@@ -54,7 +56,10 @@ async def test_dispatch_requests():
     assert len(beh.sent_messages) == 2
     for m in beh.sent_messages:
         assert m.get_metadata("performative") == "request"
-        assert "GAS_LEAK_CONFIRMED" in m.body
+        payload = decode(m.body)
+        assert payload.kind is Kind.REQUEST
+        assert payload.event is EventCode.GAS_LEAK_CONFIRMED
+        assert payload.correlation == m.get_metadata("incident_id")
 
 
 @pytest.mark.asyncio
@@ -84,4 +89,202 @@ async def test_handle_shutdown():
 
     # expect that a shutdown inform was forwarded
     assert len(beh.sent_messages) == 1
-    assert beh.sent_messages[0].body == "SHUTDOWN"
+    assert decode(beh.sent_messages[0].body).kind is Kind.SHUTDOWN
+
+
+@pytest.mark.asyncio
+async def test_duplicate_informs_coalesced_into_one_dispatch():
+    agent = CoordinatorAgent(
+        jid="coord@localhost",
+        password="password",
+        sensor_jid="sensor@localhost",
+        response_jids=["r1@localhost"],
+    )
+    beh = DummyHandler()
+    beh.agent = agent
+
+    pending = []
+    for station, body in [
+        ("st_c", "NORMAL_CONDITION"),
+        ("st_a", "POSSIBLE_GAS_LEAK"),
+        ("st_a", "POSSIBLE_GAS_LEAK"),
+        ("st_b", "CRITICAL_GAS_LEVEL"),
+    ]:
+        m = Message(to=agent.jid)
+        m.set_metadata("performative", "inform")
+        m.set_metadata("sensor_id", station)
+        m.body = body
+        m.sender = agent.sensor_jid
+        pending.append(m)
+
+    async def fake_receive(timeout=None):
+        return pending.pop(0) if pending else None
+
+    beh.receive = fake_receive
+
+    await beh.run()
+    # the critical event jumps the queue
+    assert decode(beh.sent_messages[0].body).event is EventCode.CRITICAL_GAS_LEVEL
+    assert agent.intake.stats()["coalesced"] == 1
+
+    await beh.run()
+    await beh.run()
+    # NORMAL_CONDITION with no open incident is not dispatched
+    assert [decode(m.body).event for m in beh.sent_messages] == [
+        EventCode.CRITICAL_GAS_LEVEL,
+        EventCode.POSSIBLE_GAS_LEAK,
+    ]
+
+
+async def _feed(beh, agent, station, bodies):
+    for body in bodies:
+        m = Message(to=agent.jid)
+        m.set_metadata("performative", "inform")
+        m.set_metadata("sensor_id", station)
+        m.body = body
+        m.sender = agent.sensor_jid
+        # handle one at a time so the intake does not coalesce them
+        await beh._handle(m)
+
+
+@pytest.mark.asyncio
+async def test_station_incident_suppresses_repeats_and_escalates():
+    agent = CoordinatorAgent(
+        jid="coord@localhost",
+        password="password",
+        sensor_jid="sensor@localhost",
+        response_jids=["r1@localhost", "r2@localhost"],
+        clear_after=2,
+    )
+    beh = DummyHandler()
+    beh.agent = agent
+
+    await _feed(beh, agent, "st_a", [
+        "POSSIBLE_GAS_LEAK", "POSSIBLE_GAS_LEAK", "POSSIBLE_GAS_LEAK",  # open + 2 suppressed
+        "GAS_LEAK_CONFIRMED",  # escalate
+        "POSSIBLE_GAS_LEAK", "NORMAL_CONDITION",  # suppressed, clear streak 1
+        "GAS_LEAK_CONFIRMED",  # suppressed, streak reset
+        "NORMAL_CONDITION", "NORMAL_CONDITION",  # closes
+        "POSSIBLE_GAS_LEAK",  # new incident
+    ])
+
+    events = [decode(m.body).event for m in beh.sent_messages]
+    assert events == [EventCode.POSSIBLE_GAS_LEAK] * 2 + [EventCode.GAS_LEAK_CONFIRMED] * 2 + [
+        EventCode.POSSIBLE_GAS_LEAK
+    ] * 2
+    stats = agent.incident_stats()
+    assert stats["open"] == 2 and stats["escalate"] == 1 and stats["close"] == 1
+    assert stats["suppress"] == 6
+    assert stats["requests_sent"] == 6
+    assert stats["requests_avoided"] == 14
+    assert stats["open_incidents"] == 1
+
+
+def test_station_incident_expires_when_its_sensor_goes_quiet():
+    from labs.lab4.incidents import Action, StationIncidentTable
+
+    now = [1000.0]
+    table = StationIncidentTable(clock=lambda: now[0], stale_after=60)
+    assert table.observe("st_a", EventCode.GAS_LEAK_CONFIRMED)[0] is Action.OPEN
+    table.observe("st_b", EventCode.POSSIBLE_GAS_LEAK)
+    now[0] += 50
+    assert table.observe("st_a", EventCode.GAS_LEAK_CONFIRMED)[0] is Action.SUPPRESS  # refreshes last_seen
+    now[0] += 20
+    assert [i.station for i in table.expire()] == ["st_b"]
+    assert list(table.open) == ["st_a"]
+
+    # a sensor that comes back after its incident went stale opens a fresh one
+    now[0] += 61
+    assert table.observe("st_a", EventCode.POSSIBLE_GAS_LEAK)[0] is Action.OPEN
+    assert table.stats()["expired_incidents"] == 2
+
+
+
+@pytest.mark.asyncio
+async def test_out_of_order_backlog_does_not_close_a_newer_incident():
+    agent = CoordinatorAgent(
+        jid="coord@localhost",
+        password="password",
+        sensor_jid="sensor@localhost",
+        response_jids=["r1@localhost"],
+        clear_after=2,
+    )
+    beh = DummyHandler()
+    beh.agent = agent
+    pending = []
+
+    async def fake_receive(timeout=None):
+        return pending.pop(0) if pending else None
+
+    beh.receive = fake_receive
+
+    async def replay(readings):
+        # queue the whole backlog first: the intake serves it by priority and folds repeats
+        for event, ts in readings:
+            m = Message(to=agent.jid)
+            m.set_metadata("performative", "inform")
+            m.body = encode(Kind.PERCEPT, event, "st1", ts)
+            m.sender = agent.sensor_jid
+            pending.append(m)
+        while pending or len(agent.intake):
+            await beh.run()
+
+    N, C = EventCode.NORMAL_CONDITION, EventCode.CRITICAL_GAS_LEVEL
+    await replay([(N, 1000), (N, 2000), (N, 3000), (C, 4000)])
+    assert "st1" in agent.stations.open  # the stale NORMALs, handled last, do not close it
+    await replay([(N, 5000), (C, 6000), (N, 7000)])
+    assert agent.stations.open["st1"].clear_streak == 1  # only the NORMAL after the reading at 6000 counts
+    await replay([(N, 8000)])
+    assert "st1" not in agent.stations.open
+    assert len(beh.sent_messages) == 1  # one dispatch for the whole episode
+
+
+@pytest.mark.asyncio
+async def test_coordinator_expires_incidents_of_silent_stations():
+    agent = CoordinatorAgent(
+        jid="coord@localhost",
+        password="password",
+        sensor_jid="sensor@localhost",
+        response_jids=["r1@localhost"],
+        incident_timeout=0.05,
+    )
+    beh = DummyHandler()
+    beh.agent = agent
+    await _feed(beh, agent, "st_a", ["GAS_LEAK_CONFIRMED"])
+    assert "st_a" in agent.stations.open
+    await asyncio.sleep(0.1)
+    agent.expire_incidents()
+    assert not agent.stations.open
+    await _feed(beh, agent, "st_a", ["GAS_LEAK_CONFIRMED"])
+    assert len(beh.sent_messages) == 2  # dispatched again rather than suppressed
+
+
+@pytest.mark.asyncio
+async def test_main_drains_outstanding_completions_before_stopping():
+    from spade.container import Container
+
+    from labs.lab4.launcher import start_local
+    from labs.lab4.main import drain
+
+    agent = CoordinatorAgent(
+        jid="drain_coord@localhost",
+        password="password",
+        sensor_jid="sensor@localhost",
+        response_jids=["r1@localhost"],
+    )
+    await start_local(agent)
+    try:
+        incident_id = agent.open_incident("GAS_LEAK_CONFIRMED", None, ["r1@localhost"])
+        assert not await drain(agent, 0.2)  # nobody completes it
+
+        async def complete_later():
+            await asyncio.sleep(0.2)
+            agent.complete_incident(incident_id, "r1@localhost")
+
+        task = asyncio.create_task(complete_later())
+        assert await drain(agent, 5.0)
+        await task
+        assert not agent.incidents
+    finally:
+        await agent.stop()
+        Container().unregister("drain_coord@localhost")
@@ -0,0 +1,166 @@
+"""Tests for the async sensor drivers and the pty device emulator."""
+
+import sys, os
+import asyncio
+import time
+import pytest
+
+root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if root not in sys.path:
+    sys.path.insert(0, root)
+
+from labs.common.payload import Kind, decode
+from labs.lab2_perception.environment.simulated_lpg_station import SimulatedLPGStation
+from labs.lab4.agents.gateway_agent import LogicalSensor, SensorGatewayAgent
+from labs.lab4.devices import (
+    DEVICE_ERRORS,
+    DeviceEmulator,
+    DeviceError,
+    DeviceTimeout,
+    ModbusDevice,
+    SerialLine,
+    crc16,
+    decode_registers,
+    encode_readings,
+    read_all,
+)
+
+
+class FixedStation:
+    def __init__(self, ppm=612.4, kpa=955.1, pump="ON"):
+        self.readings = {"lpg_ppm": ppm, "tank_pressure_kpa": kpa, "pump_state": pump}
+
+    def get_current_readings(self):
+        return dict(self.readings)
+
+
+def test_crc_and_register_codec():
+    # reference frame from the Modbus RTU spec examples: 01 03 00 00 00 0A -> C5 CD
+    assert crc16(bytes.fromhex("01030000000a")) == 0xCDC5
+    readings = {"lpg_ppm": 1500.0, "tank_pressure_kpa": 400.5, "pump_state": "OFF"}
+    assert decode_registers(encode_readings(readings)) == readings
+
+
+@pytest.mark.asyncio
+async def test_bulk_read_through_emulator():
+    with DeviceEmulator({1: FixedStation(), 2: FixedStation(ppm=80.0, pump="OFF")}) as emulator:
+        line = SerialLine(emulator.path)
+        try:
+            one, two = ModbusDevice(line, 1), ModbusDevice(line, 2)
+            assert await one.read() == {"lpg_ppm": 612.4, "tank_pressure_kpa": 955.1, "pump_state": "ON"}
+            assert (await two.read())["pump_state"] == "OFF"
+            # every channel in one request per read
+            assert emulator.requests == 2
+        finally:
+            line.close()
+
+
+@pytest.mark.asyncio
+async def test_silent_device_times_out_without_blocking_others():
+    with DeviceEmulator({1: FixedStation()}, latency=0.2) as slow, DeviceEmulator({1: FixedStation()}, latency=0.2) as other:
+        lines = [SerialLine(slow.path), SerialLine(other.path)]
+        try:
+            devices = [ModbusDevice(lines[0], 1), ModbusDevice(lines[1], 1), ModbusDevice(lines[1], 9, timeout=0.1)]
+            ticks = 0
+
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    ticks += 1
+                    await asyncio.sleep(0.01)
+
+            task = asyncio.ensure_future(ticker())
+            t0 = time.perf_counter()
+            results = await read_all(devices)
+            elapsed = time.perf_counter() - t0
+            task.cancel()
+
+            assert results[devices[0].name]["lpg_ppm"] == 612.4
+            assert results[devices[1].name]["lpg_ppm"] == 612.4
+            assert isinstance(results[devices[2].name], DeviceTimeout)
+            # the two lines are read in parallel and the loop keeps running
+            assert elapsed < 0.39
+            assert ticks >= 10
+        finally:
+            for line in lines:
+                line.close()
+
+
+
+@pytest.mark.asyncio
+async def test_missing_port_is_a_device_error(tmp_path):
+    path = str(tmp_path / "ttyUSB9")
+    line = SerialLine(path)
+    device = ModbusDevice(line, 1)
+    errors = DEVICE_ERRORS.labels(device.name, "io")
+    before = errors.value
+    with pytest.raises(DeviceError):
+        await device.read()
+    assert errors.value == before + 1
+    assert isinstance((await read_all([device]))[device.name], DeviceError)
+
+    # once the port shows up the next read opens it
+    with DeviceEmulator({1: FixedStation()}) as emulator:
+        os.symlink(emulator.path, path)
+        try:
+            assert (await device.read())["lpg_ppm"] == 612.4
+        finally:
+            line.close()
+
+
+class DummyScheduler(SensorGatewayAgent.GatewayScheduler):
+    def __init__(self):
+        super().__init__()
+        self.sent = []
+
+    async def send(self, msg):
+        self.sent.append(msg)
+
+
+@pytest.mark.asyncio
+async def test_gateway_reads_logical_sensors_from_devices():
+    with DeviceEmulator({1: SimulatedLPGStation(), 2: FixedStation(ppm=950.0)}) as emulator:
+        line = SerialLine(emulator.path)
+        try:
+            sensors = [
+                LogicalSensor("S0", SimulatedLPGStation(), period=60.0, driver=ModbusDevice(line, 1)),
+                LogicalSensor("S1", SimulatedLPGStation(), period=60.0, driver=ModbusDevice(line, 2)),
+                LogicalSensor("S2", SimulatedLPGStation(), period=60.0, driver=ModbusDevice(line, 7, timeout=0.05)),
+            ]
+            agent = SensorGatewayAgent("gw_dev@localhost", "password", "coord@localhost", sensors=sensors)
+            beh = DummyScheduler()
+            beh.agent = agent
+            await beh.run()
+        finally:
+            line.close()
+
+    by_station = {decode(m.body).station: decode(m.body) for m in beh.sent}
+    assert set(by_station) == {"S0", "S1"}  # S2 timed out and was skipped
+    assert by_station["S1"].kind is Kind.PERCEPT and by_station["S1"].lpg_ppm == 950.0
+    assert all(s.cycles == 1 for s in agent.sensors.values())
+
+
+class DeadDriver:
+    name = "dead@/dev/ttyUSB9"
+
+    async def read(self):
+        raise DeviceTimeout("no reply")
+
+
+@pytest.mark.asyncio
+async def test_failed_reads_still_count_towards_the_cycle_limit():
+    from labs.lab4.agents.sensor_agent import PerceptionBehaviour, SensorAgent
+
+    agent = SensorAgent("dead_sensor@localhost", "password", "coord@localhost")
+    stopped = []
+
+    async def stop():
+        stopped.append(True)
+
+    agent.stop = stop
+    beh = PerceptionBehaviour(period=2.0, station=None, target_jid="coord@localhost", driver=DeadDriver())
+    beh.agent = agent
+    beh._max_cycles = 3
+    for _ in range(3):
+        await beh.run()
+    assert stopped == [True]
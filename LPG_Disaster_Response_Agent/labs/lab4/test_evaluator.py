@@ -0,0 +1,48 @@
+"""Tests for the headless Monte Carlo evaluator of the Lab 3 FSM policy."""
+
+import sys, os
+from types import SimpleNamespace
+
+root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if root not in sys.path:
+    sys.path.insert(0, root)
+
+from labs.lab2_perception.environment.scenarios import SCENARIOS, compile_scenario
+from labs.lab3_fsm import policy as fsm
+from labs.lab3_fsm.evaluator import evaluate, run_incident
+
+
+def test_response_follows_danger_by_the_fsm_dwell_times():
+    trace = compile_scenario(SCENARIOS["sudden_rupture"].with_seed(3))
+    outcome = run_incident(trace, period=2.0, offset=0.7, history=False)
+    # the sensor sees the rupture within one period, then Alert and Assessment run
+    dwell = fsm.ALERT_SECONDS + fsm.ASSESSMENT_SECONDS
+    assert dwell <= outcome.time_to_response <= dwell + 2.0
+    assert not outcome.missed and outcome.false_alarms == 0
+
+
+def test_missed_escalations_and_false_alarms_are_counted():
+    trace = compile_scenario(SCENARIOS["station_cycle"].with_seed(1))
+    never = run_incident(trace, assess=lambda event, context: (fsm.STATE_COMPLETION, ""))
+    assert never.missed and never.time_to_response is None
+
+    spike = SimpleNamespace(name="spike", seed=0, lpg_ppm=[50.0] * 10 + [650.0] + [50.0] * 20)
+    outcome = run_incident(spike, leaking=[False] * 31)
+    assert len(outcome.responses) == 1 and outcome.false_alarms == 1
+    # a short spike that is a real leak is answered, not a false alarm
+    assert run_incident(spike).false_alarms == 0
+
+
+def test_trend_escalation_responds_before_danger_on_slow_leaks():
+    with_history = evaluate(200, scenarios=["slow_leak"], workers=1, history=True)
+    without = evaluate(200, scenarios=["slow_leak"], workers=1, history=False)
+    assert with_history.percentile(0.5) < without.percentile(0.5)
+    assert with_history.missed == without.missed == 0
+
+
+def test_process_pool_gives_the_same_report():
+    serial = evaluate(300, workers=1, chunk=100)
+    pooled = evaluate(300, workers=2, chunk=100)
+    assert serial.incidents == pooled.incidents == 300
+    assert [o.responses for o in serial.outcomes] == [o.responses for o in pooled.outcomes]
+    assert set(serial.by_scenario()) == set(SCENARIOS)
@@ -0,0 +1,55 @@
+"""Tests for the multiplexing SensorGatewayAgent."""
+
+import sys, os
+import pytest
+
+root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if root not in sys.path:
+    sys.path.insert(0, root)
+
+from labs.common.payload import Kind, decode
+from labs.lab2_perception.environment.simulated_lpg_station import SimulatedLPGStation
+from labs.lab4.agents.gateway_agent import LogicalSensor, SensorGatewayAgent
+
+
+class DummyScheduler(SensorGatewayAgent.GatewayScheduler):
+    def __init__(self):
+        super().__init__()
+        self.sent = []
+
+    async def send(self, msg):
+        self.sent.append(msg)
+
+
+def make_gateway(count, max_cycles=None):
+    sensors = [
+        LogicalSensor(sensor_id=f"S{i}", station=SimulatedLPGStation(), period=60.0, max_cycles=max_cycles)
+        for i in range(count)
+    ]
+    agent = SensorGatewayAgent("gw@localhost", "password", "coord@localhost", sensors=sensors)
+    beh = DummyScheduler()
+    beh.agent = agent
+    return agent, beh
+
+
+@pytest.mark.asyncio
+async def test_each_logical_sensor_is_tagged():
+    agent, beh = make_gateway(3)
+    await beh.run()
+
+    assert sorted(m.get_metadata("sensor_id") for m in beh.sent) == ["S0", "S1", "S2"]
+    assert all(m.get_metadata("performative") == "inform" for m in beh.sent)
+    # nothing is due again until a full period has elapsed
+    assert all(s.cycles == 1 for s in agent.sensors.values())
+    assert len(agent._schedule) == 3
+
+
+@pytest.mark.asyncio
+async def test_stops_without_shutdown_message_after_all_sensors_finish():
+    agent, beh = make_gateway(2, max_cycles=1)
+    await beh.run()
+
+    # the host notices the gateway has stopped; no SHUTDOWN body is sent any more
+    assert all(decode(m.body).kind is Kind.PERCEPT for m in beh.sent)
+    assert not agent.sensors
+    assert not agent.is_alive()
@@ -0,0 +1,175 @@
+"""Tests for the sensor reading history and its query-ref protocol."""
+
+import sys, os
+import pytest
+
+root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if root not in sys.path:
+    sys.path.insert(0, root)
+
+from spade.message import Message
+
+from labs.common.history import (
+    HistoryQueryError,
+    ReadingHistory,
+    answer_query,
+    decode_history,
+    encode_window,
+    format_query,
+    summarize,
+)
+from labs.lab3_fsm.agents.fsm_agent import STATE_COMPLETION, STATE_RESPONSE, AssessmentState, DisasterFSMAgent
+from labs.lab4.agents.gateway_agent import LogicalSensor, SensorGatewayAgent
+from labs.common.history_query import HistoryQueryBehaviour
+from labs.lab4.agents.sensor_agent import SensorAgent
+from labs.lab2_perception.environment.simulated_lpg_station import SimulatedLPGStation
+
+
+def reading(ppm, kpa=1000.0, pump="ON"):
+    return {"lpg_ppm": ppm, "tank_pressure_kpa": kpa, "pump_state": pump}
+
+
+def filled(capacity, count, step_ms=1000):
+    history = ReadingHistory(capacity)
+    for i in range(count):
+        history.append(reading(100.0 + i, pump="ON" if i % 2 else "OFF"), ts_ms=i * step_ms)
+    return history
+
+
+def test_ring_wraps_and_windows_are_views():
+    history = filled(5, 8)
+    assert len(history) == 5
+
+    window = history.last(4)
+    assert len(window.segments) == 2  # wraps around the end of the ring
+    assert all(isinstance(v, memoryview) for v in window.column("lpg_ppm"))
+    ts, columns = decode_history(encode_window(window))
+    assert list(ts) == [4000, 5000, 6000, 7000]
+    assert list(columns["lpg_ppm"]) == [104.0, 105.0, 106.0, 107.0]
+    assert list(columns["pump_on"]) == [0.0, 1.0, 0.0, 1.0]
+
+    # only what is still in the ring comes back
+    assert list(decode_history(encode_window(history.last(50)))[0]) == [3000, 4000, 5000, 6000, 7000]
+    assert list(decode_history(encode_window(history.since(2.5, now_ms=7000)))[0]) == [5000, 6000, 7000]
+    assert len(history.since(1, now_ms=60_000)) == 0
+    assert decode_history(encode_window(ReadingHistory(3).last(2)))[0].tolist() == []
+
+
+def test_queries_and_summary():
+    history = filled(100, 20)
+    body = answer_query(history, format_query(last=10))
+    assert body.startswith("1;10;lpg_ppm,tank_pressure_kpa,pump_on;")
+    summary = summarize(*decode_history(body))
+    assert summary["count"] == 10 and summary["ppm_max"] == 119.0
+    assert summary["ppm_slope"] == pytest.approx(1.0)  # one ppm per second
+    assert decode_history(answer_query(history, format_query(seconds=3), now_ms=19_000))[0].tolist() == [
+        16000, 17000, 18000, 19000,
+    ]
+    for bad in ("", "last=many", "everything", None):
+        with pytest.raises(HistoryQueryError):
+            answer_query(history, bad)
+    with pytest.raises(HistoryQueryError):
+        decode_history("1;3;lpg_ppm;AAAA")
+
+
+def query(body, to="sensor@localhost", thread="t1", **metadata):
+    m = Message(to=to, sender="investigator@localhost", thread=thread)
+    m.set_metadata("performative", "query-ref")
+    for key, value in metadata.items():
+        m.set_metadata(key, value)
+    m.body = body
+    return m
+
+
+class DummyQueries(HistoryQueryBehaviour):
+    def __init__(self, lookup, incoming):
+        super().__init__(lookup)
+        self.sent = []
+        self.incoming = list(incoming)
+
+    async def send(self, msg):
+        self.sent.append(msg)
+
+    async def receive(self, timeout=None):
+        return self.incoming.pop(0) if self.incoming else None
+
+
+@pytest.mark.asyncio
+async def test_sensor_answers_query_ref():
+    agent = SensorAgent("sensor@localhost", "password", "coord@localhost", history_capacity=16)
+    for i in range(20):
+        agent.history.append(reading(300.0 + 10 * i), ts_ms=i * 2000)
+    beh = DummyQueries(lambda msg: agent.history, [query("last=3"), query("all of it", thread="t2")])
+    beh.agent = agent
+    await beh.run()
+    await beh.run()
+
+    answer, refusal = beh.sent
+    assert answer.get_metadata("performative") == "inform"
+    assert str(answer.to) == "investigator@localhost" and answer.thread == "t1"
+    assert list(decode_history(answer.body)[1]["lpg_ppm"]) == [470.0, 480.0, 490.0]
+    assert refusal.get_metadata("performative") == "not-understood" and refusal.thread == "t2"
+
+
+@pytest.mark.asyncio
+async def test_gateway_answers_per_logical_sensor():
+    agent = SensorGatewayAgent(
+        "gw_hist@localhost", "password", "coord@localhost",
+        sensors=[LogicalSensor("S0", SimulatedLPGStation()), LogicalSensor("S1", SimulatedLPGStation())],
+    )
+    agent.sensors["S1"].history.append(reading(250.0), ts_ms=1)
+    beh = DummyQueries(agent._history_for, [query("last=5", sensor_id="S1"), query("last=5", sensor_id="S9")])
+    beh.agent = agent
+    await beh.run()
+    await beh.run()
+    assert agent.sensors["S0"].history.capacity == SensorGatewayAgent.HISTORY_CAPACITY
+    assert list(decode_history(beh.sent[0].body)[1]["lpg_ppm"]) == [250.0]
+    assert beh.sent[1].get_metadata("performative") == "failure"
+
+
+class DummyAssessment(AssessmentState):
+    def __init__(self, history, others=()):
+        super().__init__()
+        self.history = history
+        self.others = list(others)
+        self.sent = []
+        self.replies = []
+        self.next_state = None
+        # FSM states borrow send/receive from their FSMBehaviour; stand in for it
+        self.send, self.receive = self.fake_send, self.fake_receive
+
+    async def fake_send(self, msg):
+        # the sensor answers after other traffic has arrived
+        self.sent.append(msg)
+        reply = msg.make_reply()
+        reply.set_metadata("performative", "inform")
+        reply.body = answer_query(self.history, msg.body)
+        self.replies.append(reply)
+
+    async def fake_receive(self, timeout=None):
+        if self.others:
+            return self.others.pop(0)
+        return self.replies.pop(0) if self.replies else None
+
+    def set_next_state(self, state):
+        self.next_state = state
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("step, expected", [(40.0, STATE_RESPONSE), (0.0, STATE_COMPLETION)])
+async def test_fsm_assessment_uses_sensor_history(step, expected):
+    agent = DisasterFSMAgent("fsm@localhost", "password", sensor_jid="sensor@localhost")
+    agent.current_event = "POSSIBLE_GAS_LEAK"
+    history = ReadingHistory(32)
+    for i in range(12):
+        history.append(reading(150.0 + step * i), ts_ms=i * 2000)
+    other = Message(to="fsm@localhost", body="GAS_LEAK_CONFIRMED")
+    state = DummyAssessment(history, [other])
+    state.agent = agent
+
+    await state.run()
+    assert state.sent[0].get_metadata("performative") == "query-ref"
+    assert state.sent[0].body == "last=10"
+    assert state.next_state == expected
+    # the percept that arrived meanwhile is handled by IdleState next
+    assert agent.deferred == [other]
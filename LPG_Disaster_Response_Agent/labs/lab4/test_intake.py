@@ -0,0 +1,53 @@
+"""Tests for the bounded, priority-aware coordinator intake."""
+
+import sys, os
+
+root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if root not in sys.path:
+    sys.path.insert(0, root)
+
+from labs.common.core import EventCode
+from labs.lab4.intake import BoundedIntake
+
+
+def offer(intake, source, event):
+    return intake.offer((source, event), EventCode[event], f"{source}:{event}", label=event)
+
+
+def test_duplicates_are_coalesced():
+    intake = BoundedIntake(capacity=10)
+    for _ in range(5):
+        offer(intake, "s1", "POSSIBLE_GAS_LEAK")
+    assert len(intake) == 1
+    assert intake.coalesced == 4
+    assert intake.pop().count == 5
+
+
+def test_normal_conditions_shed_first():
+    intake = BoundedIntake(capacity=2)
+    offer(intake, "s1", "NORMAL_CONDITION")
+    offer(intake, "s2", "GAS_LEAK_CONFIRMED")
+    assert offer(intake, "s3", "POSSIBLE_GAS_LEAK")  # evicts s1's NORMAL_CONDITION
+    assert not offer(intake, "s4", "NORMAL_CONDITION")  # nothing less important to evict
+    assert intake.shed == {"NORMAL_CONDITION": 2}
+    assert [intake.pop().label for _ in range(2)] == ["GAS_LEAK_CONFIRMED", "POSSIBLE_GAS_LEAK"]
+
+
+def test_critical_is_never_dropped():
+    intake = BoundedIntake(capacity=3)
+    for i in range(10):
+        assert offer(intake, f"s{i}", "CRITICAL_GAS_LEVEL")
+    assert len(intake) == 10
+    assert intake.stats()["shed_total"] == 0
+
+
+def test_stats_report_rate():
+    now = [0.0]
+    intake = BoundedIntake(capacity=5, rate_window=1.0, clock=lambda: now[0])
+    for i in range(20):
+        offer(intake, f"s{i}", "NORMAL_CONDITION")
+        now[0] += 0.1
+    stats = intake.stats()
+    assert stats["depth"] == 5
+    assert stats["shed"]["NORMAL_CONDITION"] == 15
+    assert 9.0 <= stats["intake_rate"] <= 11.0
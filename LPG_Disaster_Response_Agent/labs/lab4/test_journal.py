@@ -0,0 +1,139 @@
+"""Tests for the group-committed incident journal."""
+
+import sys, os
+import asyncio
+import pytest
+from spade.message import Message
+
+root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if root not in sys.path:
+    sys.path.insert(0, root)
+
+from labs.lab4.agents.coordinator_agent import CoordinatorAgent
+from labs.lab4.journal import IncidentJournal, replay
+
+
+@pytest.mark.asyncio
+async def test_appends_are_group_committed(tmp_path):
+    journal = IncidentJournal(tmp_path / "j.jsonl", commit_window=0.05)
+    await journal.start()
+    futures = [journal.append("open", incident=f"c{i}", event="X", responders=["r"]) for i in range(200)]
+    await futures[-1]
+    await journal.close()
+
+    stats = journal.stats()
+    assert stats["records_written"] == 200
+    assert stats["commits"] <= 3
+    assert all(f.done() for f in futures)
+
+
+@pytest.mark.asyncio
+async def test_replay_rebuilds_in_flight_incidents(tmp_path):
+    path = tmp_path / "j.jsonl"
+    journal = IncidentJournal(path, commit_window=0.01)
+    await journal.start()
+    journal.append("open", incident="a", event="GAS_LEAK_CONFIRMED", sensor_id=None, responders=["r1", "r2"])
+    journal.append("open", incident="b", event="POSSIBLE_GAS_LEAK", sensor_id="S1", responders=["r1"])
+    journal.append("complete", incident="a", responder="r1")
+    journal.append("complete", incident="b", responder="r1")
+    journal.append("close", incident="b")
+    await journal.close()
+    with open(path, "a") as fh:
+        fh.write('{"seq": 6, "kind": "op')  # torn write from a crash
+
+    recovery = replay(path)
+    assert recovery.records == 5
+    assert recovery.torn == 1
+    assert list(recovery.incidents) == ["a"]
+    assert recovery.incidents["a"]["pending"] == {"r2"}
+
+    resumed = IncidentJournal(path)
+    assert resumed.recover().last_seq == 5
+
+
+@pytest.mark.asyncio
+async def test_checkpoints_compact_the_journal_to_open_incidents(tmp_path):
+    path = tmp_path / "j.jsonl"
+    incidents = {}
+    journal = IncidentJournal(path, commit_window=0.01, compact_after=50)
+    await journal.start(snapshot=lambda: incidents)
+    for i in range(300):
+        incident = f"c{i}"
+        incidents[incident] = {"event": "X", "sensor_id": None, "opened": 1.0, "pending": {"r2"}}
+        journal.append("open", incident=incident, event="X", sensor_id=None, responders=["r1", "r2"])
+        journal.append("complete", incident=incident, responder="r1")
+        if i % 10:
+            del incidents[incident]
+            journal.append("close", incident=incident)
+        if i % 20 == 0:
+            await asyncio.sleep(0.02)  # let the committer run
+    await journal.close()
+
+    recovery = replay(path)
+    assert journal.checkpoints >= 5 and recovery.checkpoint_seq
+    assert recovery.records < 100  # the checkpoint plus what followed it, not all ~900 records
+    assert {k: v["pending"] for k, v in recovery.incidents.items()} == {k: {"r2"} for k in incidents}
+    assert IncidentJournal(path).recover().last_seq == journal.stats()["records_written"] + journal.checkpoints
+
+
+@pytest.mark.asyncio
+async def test_coordinator_journals_dispatch_and_completion(tmp_path):
+    journal = IncidentJournal(tmp_path / "j.jsonl", commit_window=0.01)
+    await journal.start()
+    agent = CoordinatorAgent(
+        jid="coord@localhost",
+        password="password",
+        sensor_jid="sensor@localhost",
+        response_jids=["r1@localhost"],
+        journal=journal,
+    )
+
+    class Handler(CoordinatorAgent.MessageHandler):
+        async def send(self, msg):
+            self.sent.append(msg)
+
+    beh = Handler()
+    beh.sent = []
+    beh.agent = agent
+
+    inform = Message(to="coord@localhost", body="CRITICAL_GAS_LEVEL")
+    inform.sender = "sensor@localhost"
+    await beh._handle(inform)
+    incident_id = beh.sent[0].get_metadata("incident_id")
+    assert incident_id in agent.incidents
+
+    reply = Message(to="coord@localhost", body="completed_handle_CRITICAL_GAS_LEVEL")
+    reply.set_metadata("performative", "inform")
+    reply.set_metadata("incident_id", incident_id)
+    reply.sender = "r1@localhost/resource"
+    await beh._handle(reply)
+    await journal.close()
+
+    assert not agent.incidents
+    assert [r for r in replay(journal.path).incidents] == []
+    assert replay(journal.path).records == 3
+
+
+@pytest.mark.asyncio
+async def test_stopping_the_coordinator_flushes_the_journal(tmp_path):
+    from spade.container import Container
+
+    from labs.lab4.launcher import start_local
+
+    journal = IncidentJournal(tmp_path / "j.jsonl", commit_window=60)  # nothing commits on its own
+    agent = CoordinatorAgent(
+        jid="journalled@localhost",
+        password="password",
+        sensor_jid="sensor@localhost",
+        response_jids=["r1@localhost"],
+        journal=journal,
+    )
+    await start_local(agent)
+    try:
+        agent.open_incident("CRITICAL_GAS_LEVEL", "st_a", ["r1@localhost"])
+        await agent.stop()
+    finally:
+        Container().unregister(str(agent.jid))
+    recovery = replay(journal.path)
+    assert recovery.records == 1 and len(recovery.incidents) == 1
+    await journal.close()  # closing again is harmless
@@ -0,0 +1,121 @@
+"""Tests for the concurrent agent launcher using fake agents."""
+
+import sys, os
+import asyncio
+import json
+import time
+import pytest
+
+root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if root not in sys.path:
+    sys.path.insert(0, root)
+
+from labs.lab4.launcher import RegistrationCache, launch
+
+
+class FakeAgent:
+    def __init__(self, jid, delay=0.2, known_on_server=True):
+        self.jid = jid
+        self.delay = delay
+        self.known_on_server = known_on_server
+        self.register_calls = []
+
+    async def start(self, auto_register=True):
+        self.register_calls.append(auto_register)
+        await asyncio.sleep(self.delay)
+        if not auto_register and not self.known_on_server:
+            raise RuntimeError("authentication failed")
+        self.known_on_server = True
+
+
+@pytest.mark.asyncio
+async def test_phase_agents_start_concurrently(tmp_path):
+    cache = RegistrationCache(tmp_path / "jids.json")
+    agents = [FakeAgent(f"r{i}@localhost") for i in range(20)]
+
+    t0 = time.perf_counter()
+    report = await launch([agents], cache=cache)
+    elapsed = time.perf_counter() - t0
+
+    assert elapsed < 1.0  # 20 * 0.2s if started sequentially
+    assert len(report.agents) == 20
+    assert not report.failures
+    assert all(a.register_calls == [True] for a in agents)
+
+
+@pytest.mark.asyncio
+async def test_cached_accounts_skip_registration(tmp_path):
+    path = tmp_path / "jids.json"
+    await launch([[FakeAgent("coord@localhost", delay=0)]], cache=RegistrationCache(path))
+
+    agent = FakeAgent("coord@localhost", delay=0)
+    report = await launch([[agent]], cache=RegistrationCache(path))
+    assert agent.register_calls == [False]
+    assert report.agents[0].registered is False
+
+
+@pytest.mark.asyncio
+async def test_stale_cache_falls_back_to_registration(tmp_path):
+    cache = RegistrationCache(tmp_path / "jids.json")
+    cache.mark("gone@localhost")
+    agent = FakeAgent("gone@localhost", delay=0, known_on_server=False)
+
+    await launch([[agent]], cache=cache)
+    assert agent.register_calls == [False, True]
+
+
+@pytest.mark.asyncio
+async def test_failure_stops_later_phases(tmp_path):
+    class Broken(FakeAgent):
+        async def start(self, auto_register=True):
+            raise ConnectionError("no server")
+
+    sensor = FakeAgent("sensor@localhost", delay=0)
+    with pytest.raises(ConnectionError) as info:
+        await launch([[Broken("coord@localhost")], [sensor]], cache=RegistrationCache(None))
+    assert sensor.register_calls == []
+    assert len(info.value.report.failures) == 1
+
+
+def test_concurrent_cache_saves_do_not_collide(tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+
+    path = tmp_path / "jids.json"
+
+    def worker(n):
+        for i in range(20):
+            cache = RegistrationCache(path)
+            cache.mark(f"w{n}_{i}@localhost")
+            cache.save()
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        list(pool.map(worker, range(4)))  # re-raises any FileNotFoundError from a shared temp file
+
+    assert not list(tmp_path.glob("*.tmp"))
+    saved = json.loads(path.read_text())  # never a torn file
+    assert any(jid.endswith("_19@localhost") for jid in saved)
+
+
+@pytest.mark.asyncio
+async def test_main_stops_agents_started_before_a_later_failure(monkeypatch):
+    from spade.container import Container
+
+    from labs.lab4 import main as lab4_main
+    from labs.lab4.launcher import start_local
+
+    phases = []
+
+    async def failing_launch(agent_phases, **kwargs):
+        phases.extend(agent_phases)
+        for agent in agent_phases[0]:
+            await start_local(agent)  # the coordinator and responders come up ...
+        raise ConnectionError("sensor could not connect")  # ... then the sensor fails
+
+    monkeypatch.setattr(lab4_main, "launch", failing_launch)
+    try:
+        await lab4_main.main(num_responders=2, metrics_port=None)
+        started = phases[0]
+        assert len(started) == 3 and not any(agent.is_alive() for agent in started)
+    finally:
+        for agent in (a for phase in phases for a in phase):
+            Container().unregister(str(agent.jid))
@@ -0,0 +1,58 @@
+"""Tests for the in-process load harness."""
+
+import sys, os
+import pytest
+
+root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if root not in sys.path:
+    sys.path.insert(0, root)
+
+from spade.message import Message
+
+from labs.lab4.loadtest import LevelResult, MeasuredCoordinator, Topology, run_level, saturation_point
+
+
+@pytest.mark.asyncio
+async def test_level_runs_without_xmpp_and_drains():
+    topology = Topology(sensors=2, coordinators=2, responders=2, stations=5)
+    result = await run_level(topology, rate=40, duration=0.5, work_seconds=0.0,
+                             drain_timeout=3.0, prefix="t_load_")
+
+    assert result.sent == 20
+    assert result.handled == result.sent  # coalesced reports are counted too
+    assert result.completed == result.opened > 0
+    assert result.backlog == 0 and result.shed == 0
+    assert result.e2e.count == result.completed
+    assert 0 < result.e2e.quantile(0.99) < 2.0
+
+
+class DummyHandler(MeasuredCoordinator.MessageHandler):
+    async def send(self, msg):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_each_incident_keeps_the_origin_of_its_own_percept():
+    agent = MeasuredCoordinator("t_origin@localhost", "password", "sensor", ["r1@localhost", "r2@localhost"])
+    beh = DummyHandler()
+    beh.agent = agent
+    for station, sent_at in (("hall", 10.0), ("pump-3", 20.0)):
+        msg = Message(to=str(agent.jid), sender="sensor0@localhost")
+        msg.set_metadata("performative", "inform")
+        msg.set_metadata("sensor_id", station)
+        msg.set_metadata("sent_at", repr(sent_at))
+        msg.body = "GAS_LEAK_CONFIRMED"
+        await beh._handle(msg)
+    origins = {i["sensor_id"]: i["origin"] for i in agent.incidents.values()}
+    assert origins == {"hall": 10.0, "pump-3": 20.0}
+    assert agent.opened == 2 and agent.handled == 2
+
+
+def test_saturation_point_is_first_failing_level():
+    ok = LevelResult(rate=10, duration=1)
+    ok.e2e.add(0.1)
+    slow = LevelResult(rate=100, duration=1)
+    slow.e2e.add(5.0)
+    backlog = LevelResult(rate=1000, duration=1, backlog=3)
+    assert saturation_point([ok, slow, backlog], latency_slo=2.0) == 100
+    assert saturation_point([ok], latency_slo=2.0) is None
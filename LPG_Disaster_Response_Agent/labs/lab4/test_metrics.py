@@ -0,0 +1,106 @@
+"""Tests for the shared metrics registry and its HTTP exposition."""
+
+import sys, os
+import asyncio
+import pytest
+
+root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if root not in sys.path:
+    sys.path.insert(0, root)
+
+from labs.common.metrics import MetricsRegistry, MetricsServer
+
+
+def test_render_counter_gauge_histogram():
+    reg = MetricsRegistry()
+    sent = reg.counter("msgs_total", "messages", ("agent", "performative"))
+    sent.labels("coord", "request").inc()
+    sent.labels("coord", "request").inc(2)
+    depth = reg.gauge("depth", "queue depth")
+    depth.labels().set_function(lambda: 7)
+    hist = reg.histogram("run_seconds", "run time", buckets=(0.1, 1.0))
+    hist.observe(0.05)
+    hist.observe(0.5)
+    hist.observe(5)
+
+    text = reg.render()
+    assert '# TYPE msgs_total counter' in text
+    assert 'msgs_total{agent="coord",performative="request"} 3' in text
+    assert "depth 7" in text
+    assert 'run_seconds_bucket{le="0.1"} 1' in text
+    assert 'run_seconds_bucket{le="1"} 2' in text
+    assert 'run_seconds_bucket{le="+Inf"} 3' in text
+    assert "run_seconds_count 3" in text
+
+
+def test_registry_is_get_or_create():
+    reg = MetricsRegistry()
+    assert reg.counter("a_total", "a") is reg.counter("a_total", "a")
+    with pytest.raises(ValueError):
+        reg.gauge("a_total", "a")
+
+
+@pytest.mark.asyncio
+async def test_http_endpoint_serves_metrics():
+    reg = MetricsRegistry()
+    reg.counter("hits_total", "hits").inc()
+    server = MetricsServer(reg, port=0)
+    await server.start()
+    try:
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+        writer.write(b"GET /metrics HTTP/1.1\r\nHost: localhost\r\n\r\n")
+        await writer.drain()
+        response = (await reader.read()).decode()
+        writer.close()
+    finally:
+        await server.stop()
+    assert response.startswith("HTTP/1.1 200 OK")
+    assert "hits_total 1" in response
+
+
+
+def test_function_gauges_hold_bound_methods_weakly():
+    import gc
+    import weakref
+
+    class Queue:
+        def depth(self):
+            return 4
+
+    reg = MetricsRegistry()
+    depth = reg.gauge("depth", "queue depth", ("agent",))
+    queue = Queue()
+    depth.labels("a").set_function(queue.depth)
+    assert depth.labels("a").get() == 4
+    ref = weakref.ref(queue)
+    del queue
+    gc.collect()
+    assert ref() is None
+    assert "NaN" in reg.render()
+    depth.remove("a")
+    assert 'agent="a"' not in reg.render()
+
+
+@pytest.mark.asyncio
+async def test_coordinator_depth_counts_the_spade_mailbox_and_is_removed_on_stop():
+    from spade.container import Container
+    from spade.message import Message
+
+    from labs.common.metrics import MAILBOX_DEPTH
+    from labs.lab4.agents.coordinator_agent import CoordinatorAgent
+    from labs.lab4.launcher import start_local
+
+    agent = CoordinatorAgent(
+        jid="gauge_coord@localhost", password="p", sensor_jid="s@localhost", response_jids=[]
+    )
+    handler = agent.MessageHandler()
+    agent.add_behaviour(handler)  # not started, so nothing consumes SPADE's queue
+    for _ in range(3):
+        await handler.enqueue(Message(to=str(agent.jid), body="NORMAL_CONDITION"))
+    await asyncio.sleep(0)  # enqueue() puts from a task
+    assert MAILBOX_DEPTH.labels("gauge_coord").get() == 3
+
+    await start_local(agent)
+    await agent.stop()
+    Container().unregister("gauge_coord@localhost")
+    assert ("gauge_coord",) not in MAILBOX_DEPTH._children
@@ -0,0 +1,60 @@
+"""Tests for the compact lpg_station_ontology payload schema."""
+
+import sys, os
+import pytest
+
+root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if root not in sys.path:
+    sys.path.insert(0, root)
+
+from labs.common.core import EventCode
+from labs.common.payload import Kind, Payload, PayloadError, decode, encode, shutdown
+
+
+def test_round_trip_with_readings():
+    body = encode(Kind.PERCEPT, EventCode.GAS_LEAK_CONFIRMED, "st7", 1700000000123, None, 612.4, 955.1, True)
+    assert body == "1;0;2;st7;1700000000123;;612.4;955.1;1"
+    p = decode(body)
+    assert p == Payload(Kind.PERCEPT, EventCode.GAS_LEAK_CONFIRMED, "st7", 1700000000123, None, 612.4, 955.1, True)
+    assert p.kind is Kind.PERCEPT and p.event is EventCode.GAS_LEAK_CONFIRMED
+    assert decode(p.encode()) == p
+
+
+def test_optional_fields_and_shutdown():
+    request = decode(encode(Kind.REQUEST, EventCode.CRITICAL_GAS_LEVEL, correlation="abc"))
+    assert request.station is None and request.lpg_ppm is None and request.pump_on is None
+    assert request.correlation == "abc"
+    stop = decode(shutdown())
+    assert stop.kind is Kind.SHUTDOWN and stop.event is EventCode.SHUTDOWN
+
+
+@pytest.mark.parametrize(
+    "body, kind, event",
+    [
+        ("SHUTDOWN", Kind.SHUTDOWN, EventCode.SHUTDOWN),
+        ("POSSIBLE_GAS_LEAK", Kind.PERCEPT, EventCode.POSSIBLE_GAS_LEAK),
+        ("handle_GAS_LEAK_CONFIRMED", Kind.REQUEST, EventCode.GAS_LEAK_CONFIRMED),
+        ("completed_handle_CRITICAL_GAS_LEVEL", Kind.COMPLETED, EventCode.CRITICAL_GAS_LEVEL),
+        ("completed_GAS_LEAK_CONFIRMED", Kind.COMPLETED, EventCode.GAS_LEAK_CONFIRMED),
+    ],
+)
+def test_legacy_bodies_still_decode(body, kind, event):
+    p = decode(body)
+    assert (p.kind, p.event) == (kind, event)
+
+
+def test_ids_with_the_separator_are_rejected_on_encode():
+    with pytest.raises(PayloadError):
+        encode(Kind.PERCEPT, EventCode.POSSIBLE_GAS_LEAK, "hall;2")
+    with pytest.raises(PayloadError):
+        encode(Kind.REQUEST, EventCode.POSSIBLE_GAS_LEAK, "hall", correlation="a;b")
+
+
+def test_fields_appended_by_later_versions_are_ignored():
+    assert decode("1;0;1;st;5;;250.0;;;extra").lpg_ppm == 250.0
+
+
+@pytest.mark.parametrize("body", [None, "hello", "1;0;2;st", "1;9;2;;;;;;", "1;0;x;;;;;;", "2;0;0;;;;;;"])
+def test_malformed_bodies_raise(body):
+    with pytest.raises(PayloadError):
+        decode(body)
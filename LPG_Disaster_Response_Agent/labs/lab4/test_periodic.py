@@ -0,0 +1,72 @@
+"""Tests for tick tracking and catch-up policies of TrackedPeriodicBehaviour."""
+
+import sys, os
+import asyncio
+import pytest
+
+root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if root not in sys.path:
+    sys.path.insert(0, root)
+
+from labs.lab4.agents.periodic import TrackedPeriodicBehaviour
+
+
+class Ticker(TrackedPeriodicBehaviour):
+    def __init__(self, *args, work=0.0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.work = work
+        self.runs = 0
+
+    async def run(self):
+        self.runs += 1
+        await asyncio.sleep(self.work)
+
+
+class StubAgent:
+    name = "stub"
+
+
+def ticker(policy, **kwargs):
+    beh = Ticker(period=1.0, catch_up=policy, **kwargs)
+    beh._scheduled = 100.0
+    return beh
+
+
+def test_on_time_run_keeps_grid():
+    beh = ticker("skip")
+    assert beh._advance(now=100.4) == 0
+    assert beh._scheduled == 101.0
+
+
+def test_skip_jumps_to_next_future_slot():
+    beh = ticker("skip")
+    assert beh._advance(now=103.5) == 3  # slots 101, 102, 103 missed
+    assert beh._scheduled == 104.0
+
+
+def test_burst_replays_missed_slots_up_to_limit():
+    beh = ticker("burst", max_burst=2)
+    assert beh._advance(now=103.5) == 1  # 101 dropped, 102 and 103 replayed
+    assert beh._scheduled == 102.0
+
+
+def test_reanchor_starts_new_grid():
+    beh = ticker("reanchor")
+    assert beh._advance(now=103.5) == 3
+    assert beh._scheduled == 104.5
+
+
+def test_unknown_policy_rejected():
+    with pytest.raises(ValueError):
+        Ticker(period=1.0, catch_up="wait")
+
+
+@pytest.mark.asyncio
+async def test_slow_run_records_lateness_and_skips():
+    beh = Ticker(period=0.02, catch_up="skip", work=0.07)
+    beh.agent = StubAgent()
+    for _ in range(3):
+        await beh._run()
+    assert beh.runs >= 2
+    assert beh.skipped >= 2
+    assert beh.last_lateness >= 0.0
@@ -0,0 +1,202 @@
+"""Tests for the autoscaling responder pool."""
+
+import sys, os
+import time
+import pytest
+
+root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if root not in sys.path:
+    sys.path.insert(0, root)
+
+from spade.container import Container
+
+from labs.lab4.agents.coordinator_agent import CoordinatorAgent
+from labs.lab4.agents.response_agent import ResponseAgent
+from labs.lab4.launcher import start_local
+from labs.lab4.pool import PoolSnapshot, ResponderPool, ScalingPolicy
+
+
+def snap(responders=2, backlog=0, oldest=0.0, idle=None):
+    return PoolSnapshot(responders, backlog, oldest, idle or {})
+
+
+def test_policy_scales_up_on_backlog_or_latency():
+    policy = ScalingPolicy(max_responders=4, backlog_per_responder=3, pending_seconds=5)
+    assert policy.decide(snap(backlog=6), 60).action == "up"
+    assert policy.decide(snap(oldest=7.5), 60).action == "up"
+    assert policy.decide(snap(backlog=2, oldest=1.0), 60).action == "hold"
+    # capped and cooled down
+    assert policy.decide(snap(responders=4, backlog=40), 60).action == "hold"
+    assert policy.decide(snap(backlog=6), 1).action == "hold"
+
+
+def test_policy_scales_down_most_idle_responder_only_without_backlog():
+    policy = ScalingPolicy(min_responders=1, idle_seconds=30)
+    decision = policy.decide(snap(idle={"r1": 40.0, "r2": 90.0}), 60)
+    assert decision.action == "down" and decision.responder == "r2"
+    assert policy.decide(snap(backlog=1, idle={"r1": 40.0, "r2": 90.0}), 60).action == "hold"
+    assert policy.decide(snap(responders=1, idle={"r1": 90.0}), 60).action == "hold"
+    assert policy.decide(snap(responders=0), 60).action == "up"  # below min_responders
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.mark.asyncio
+async def test_pool_keeps_coordinator_response_jids_in_sync():
+    coord = CoordinatorAgent(
+        jid="pool_coord@localhost", password="p", sensor_jid="s@localhost", response_jids=[]
+    )
+    first = ResponseAgent(jid="pool_r1@localhost", password="p", coordinator_jid="pool_coord@localhost")
+    clock = Clock()
+    pool = ResponderPool(
+        coord,
+        [first],
+        ScalingPolicy(min_responders=1, max_responders=2, backlog_per_responder=2, idle_seconds=10, cooldown=5),
+        jid_template="pool_r{n}@localhost",
+        local=True,
+        clock=clock,
+    )
+    assert coord.response_jids == ["pool_r1@localhost"]
+    try:
+        await start_local(first)
+        coord.incidents["a"] = {"event": "X", "sensor_id": None, "opened": time.time(), "pending": {"pool_r1@localhost"}}
+        coord.incidents["b"] = {"event": "X", "sensor_id": None, "opened": time.time(), "pending": {"pool_r1@localhost"}}
+        decision = await pool.tick()
+        assert decision.action == "up"
+        assert decision.snapshot.backlog == 2
+        assert coord.response_jids == ["pool_r1@localhost", "pool_r2@localhost"]
+        assert pool.agents["pool_r2@localhost"].is_alive()
+
+        # work finishes; r2 never had anything to do
+        coord.incidents.clear()
+        clock.now += 11
+        pool.last_busy["pool_r1@localhost"] = clock.now
+        decision = await pool.tick()
+        assert decision.action == "down" and decision.responder == "pool_r2@localhost"
+        assert coord.response_jids == ["pool_r1@localhost"]
+
+        await pool.tick()  # reaps the drained responder
+        assert "pool_r2@localhost" not in pool.agents
+        assert [d.action for d in pool.decisions] == ["up", "down"]
+
+        # the next scale-up reuses the retired JID instead of minting pool_r3
+        assert await pool.scale_up(1) == ["pool_r2@localhost"]
+        assert coord.response_jids == ["pool_r1@localhost", "pool_r2@localhost"]
+    finally:
+        await pool.stop()
+        for jid in ("pool_coord@localhost", "pool_r1@localhost", "pool_r2@localhost"):
+            Container().unregister(jid)
+
+
+def incident(*pending, age=0.0):
+    return {"event": "X", "sensor_id": None, "opened": time.time() - age, "pending": set(pending)}
+
+
+@pytest.mark.asyncio
+async def test_responder_that_dies_holding_work_is_removed_and_its_work_released():
+    coord = CoordinatorAgent(
+        jid="dead_coord@localhost", password="p", sensor_jid="s@localhost", response_jids=[]
+    )
+    agents = [
+        ResponseAgent(jid=f"dead_r{n}@localhost", password="p", coordinator_jid="dead_coord@localhost")
+        for n in (1, 2)
+    ]
+    pool = ResponderPool(
+        coord,
+        agents,
+        ScalingPolicy(min_responders=1, max_responders=4, pending_seconds=5, cooldown=0),
+        jid_template="dead_r{n}@localhost",
+        local=True,
+        clock=Clock(),
+    )
+    try:
+        for agent in agents:
+            await start_local(agent)
+        coord.incidents["a"] = incident("dead_r1@localhost", age=60)
+        coord.incidents["b"] = incident("dead_r1@localhost", "dead_r2@localhost", age=60)
+        await agents[0].stop()  # dies with both REQUESTs outstanding
+
+        decision = await pool.tick()
+        assert list(coord.incidents) == ["b"] and coord.incidents["b"]["pending"] == {"dead_r2@localhost"}
+        assert decision.action == "up"  # r2's own request is still 60s old
+        # the dead responder's JID is free again and the replacement takes it
+        assert coord.response_jids == ["dead_r2@localhost", "dead_r1@localhost"]
+        assert pool.agents["dead_r1@localhost"] is not agents[0]
+
+        coord.incidents.clear()
+        decision = await pool.tick()
+        assert decision.action == "hold" and decision.snapshot.oldest_pending == 0.0
+    finally:
+        await pool.stop()
+        for jid in ("dead_coord@localhost", "dead_r1@localhost", "dead_r2@localhost"):
+            Container().unregister(jid)
+
+
+class BrokenResponder(ResponseAgent):
+    async def setup(self) -> None:
+        raise ConnectionError("no route to host")
+
+
+@pytest.mark.asyncio
+async def test_failed_scale_up_keeps_the_responders_that_started():
+    coord = CoordinatorAgent(
+        jid="fail_coord@localhost", password="p", sensor_jid="s@localhost", response_jids=[]
+    )
+    broken = {"fail_r2@localhost"}  # fails on its first start only
+    pool = ResponderPool(
+        coord,
+        [],
+        factory=lambda jid: (BrokenResponder if jid in broken else ResponseAgent)(
+            jid=jid, password="p", coordinator_jid="fail_coord@localhost"
+        ),
+        jid_template="fail_r{n}@localhost",
+        local=True,
+    )
+    try:
+        started = await pool.scale_up(2)
+        assert started == ["fail_r1@localhost"]
+        assert coord.response_jids == ["fail_r1@localhost"] and pool.agents["fail_r1@localhost"].is_alive()
+        broken.clear()
+        assert await pool.scale_up(1) == ["fail_r2@localhost"]  # the pool keeps working, with the free JID
+    finally:
+        await pool.stop()
+        for jid in ("fail_coord@localhost", "fail_r1@localhost", "fail_r2@localhost"):
+            Container().unregister(jid)
+
+
+@pytest.mark.asyncio
+async def test_scaled_up_responders_are_dispatched_to_by_distance():
+    coord = CoordinatorAgent(
+        jid="geo_coord@localhost",
+        password="p",
+        sensor_jid="s@localhost",
+        response_jids=[],
+        station_locations={"st": (10.0, 10.0)},
+        dispatch_k=1,
+    )
+    pool = ResponderPool(
+        coord,
+        [],
+        factory=lambda jid: ResponseAgent(jid=jid, password="p", coordinator_jid="geo_coord@localhost",
+                                          location=(10.0, 11.0)),
+        jid_template="geo_r{n}@localhost",
+        local=True,
+    )
+    try:
+        await pool.scale_up(1)
+        assert coord.select_responders("st") == ["geo_r1@localhost"]
+
+        pool.drain("geo_r1@localhost")
+        coord.update_responder("geo_r1@localhost", (10.0, 10.0))  # a late POSITION from the drained responder
+        coord.update_responder("stranger@localhost", (10.0, 10.0))
+        assert len(coord.responder_index) == 0
+    finally:
+        await pool.stop()
+        for jid in ("geo_coord@localhost", "geo_r1@localhost"):
+            Container().unregister(jid)
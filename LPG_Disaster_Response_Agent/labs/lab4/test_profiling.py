@@ -0,0 +1,120 @@
+"""Tests for the opt-in behaviour profiling hooks."""
+
+import sys, os
+import asyncio
+import time
+import pytest
+
+root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if root not in sys.path:
+    sys.path.insert(0, root)
+
+from labs.common.profiling import BehaviourProfiler
+
+
+class Busy:
+    async def run(self):
+        end = time.perf_counter() + 0.03
+        while time.perf_counter() < end:
+            pass
+
+
+class FakeFSM:
+    def __init__(self):
+        self.idle = Busy()
+
+    def get_states(self):
+        return {"IdleState": self.idle}
+
+
+class Sleeper:
+    async def run(self):
+        await asyncio.sleep(0.05)
+
+
+class FakeAgent:
+    name = "fake"
+
+    def __init__(self):
+        self.behaviours = [Busy(), FakeFSM()]
+
+    def add_behaviour(self, behaviour, template=None):
+        self.behaviours.append(behaviour)
+
+
+@pytest.mark.asyncio
+async def test_disabled_profiler_leaves_run_untouched():
+    agent = FakeAgent()
+    profiler = BehaviourProfiler.for_agent(agent)
+    assert BehaviourProfiler.for_agent(agent) is profiler
+    profiler.enable("wall")
+    assert "run" in vars(agent.behaviours[0])
+    profiler.disable()
+    assert "run" not in vars(agent.behaviours[0])
+    assert "run" not in vars(agent.behaviours[1].idle)
+
+
+@pytest.mark.asyncio
+async def test_wall_and_cpu_collectors(tmp_path):
+    agent = FakeAgent()
+    profiler = BehaviourProfiler(agent, interval=0.001)
+    profiler.enable("wall", "cpu")
+    for _ in range(3):
+        await agent.behaviours[0].run()
+        await agent.behaviours[1].idle.run()
+    profiler.disable()
+
+    assert profiler.spans["Busy"].count == 3
+    assert profiler.spans["IdleState"].count == 3
+    assert profiler.spans["Busy"].total >= 0.09
+    assert profiler.samples
+    assert all(stack.split(";")[0] in ("Busy", "IdleState") for stack in profiler.samples)
+
+    names = sorted(p.name for p in profiler.dump(tmp_path))
+    assert names == ["fake_cpu.folded", "fake_wall.txt"]
+
+
+@pytest.mark.asyncio
+async def test_memory_collector(tmp_path):
+    agent = FakeAgent()
+    profiler = BehaviourProfiler(agent)
+    profiler.enable("memory")
+    await agent.behaviours[0].run()
+    paths = profiler.dump(tmp_path)
+    profiler.disable()
+    assert any(p.name == "fake_memory.txt" for p in paths)
+
+
+@pytest.mark.asyncio
+async def test_cpu_samples_only_go_to_the_running_step():
+    agent = FakeAgent()
+    agent.behaviours.append(Sleeper())
+    profiler = BehaviourProfiler(agent, interval=0.001)
+    profiler.enable("wall", "cpu")
+    waiting = asyncio.create_task(agent.behaviours[2].run())
+    await asyncio.sleep(0)  # the sleeper is now suspended inside its run()
+    end = time.perf_counter() + 0.03
+    while time.perf_counter() < end:  # unprofiled work on the loop thread
+        pass
+    await waiting
+    profiler.disable()
+    assert profiler.spans["Sleeper"].count == 1
+    assert not any(stack.startswith("Sleeper") for stack in profiler.samples)
+
+
+@pytest.mark.asyncio
+async def test_behaviours_added_while_enabled_are_wrapped():
+    agent = FakeAgent()
+    profiler = BehaviourProfiler(agent)
+    profiler.enable("wall")
+    late = Sleeper()
+    agent.add_behaviour(late)
+    await late.run()
+    assert profiler.spans["Sleeper"].count == 1
+    profiler.disable()
+    assert "run" not in vars(late) and "add_behaviour" not in vars(agent)
+
+
+def test_unknown_collector_rejected():
+    with pytest.raises(ValueError):
+        BehaviourProfiler(FakeAgent()).enable("gpu")
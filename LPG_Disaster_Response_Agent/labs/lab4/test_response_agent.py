@@ -9,6 +9,8 @@ root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
 if root not in sys.path:
     sys.path.insert(0, root)
 
+from labs.common.core import EventCode
+from labs.common.payload import Kind, decode
 from labs.lab4.agents.response_agent import ResponseAgent
 
 
@@ -46,7 +48,9 @@ async def test_process_request():
     assert len(beh.sent) == 1
     out = beh.sent[0]
     assert out.get_metadata("performative") == "inform"
-    assert "completed_" in out.body
+    payload = decode(out.body)
+    assert payload.kind is Kind.COMPLETED
+    assert payload.event is EventCode.GAS_LEAK_CONFIRMED
 
 
 @pytest.mark.asyncio
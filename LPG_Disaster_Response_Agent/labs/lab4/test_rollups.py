@@ -0,0 +1,47 @@
+"""Tests for incremental telemetry rollups."""
+
+import sys, os
+import pytest
+
+root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if root not in sys.path:
+    sys.path.insert(0, root)
+
+from labs.lab4.rollups import RollupEngine
+
+
+def reading(ppm, pressure=1000.0):
+    return {"lpg_ppm": ppm, "tank_pressure_kpa": pressure, "pump_state": "ON"}
+
+
+def test_buckets_per_resolution():
+    engine = RollupEngine(resolutions={1: 10, 60: 10})
+    for ts, ppm in [(0.1, 50), (0.6, 70), (1.2, 300), (61.0, 10)]:
+        engine.add("st1", reading(ppm), ts=ts)
+
+    secs = engine.query("st1", "lpg_ppm", 1)
+    assert [b["start"] for b in secs] == [0, 1, 61]
+    assert secs[0] == {"start": 0, "count": 2, "min": 50, "max": 70, "mean": 60, "last": 70}
+
+    mins = engine.query("st1", "lpg_ppm", 60)
+    assert [(b["start"], b["count"], b["max"]) for b in mins] == [(0, 3, 300), (60, 1, 10)]
+    assert engine.latest("st1", "tank_pressure_kpa", 60)["last"] == 1000.0
+
+
+def test_ring_buffer_bounds_memory():
+    engine = RollupEngine(resolutions={1: 5})
+    for ts in range(100):
+        engine.add("st1", reading(ts), ts=float(ts))
+    closed = engine.query("st1", "lpg_ppm", 1, include_open=False)
+    assert [b["start"] for b in closed] == [94, 95, 96, 97, 98]
+    assert [b["start"] for b in engine.query("st1", "lpg_ppm", 1, since=97.5)] == [97, 98, 99]
+
+
+def test_stations_are_independent_and_unknown_resolution_rejected():
+    engine = RollupEngine(resolutions={1: 5})
+    engine.add("a", reading(1), ts=0)
+    engine.add("b", reading(2), ts=0)
+    assert engine.stations() == ["a", "b"]
+    assert engine.query("c", "lpg_ppm", 1) == []
+    with pytest.raises(ValueError):
+        engine.query("a", "lpg_ppm", 5)
@@ -0,0 +1,69 @@
+"""Tests for hazard-driven adaptive sampling."""
+
+import sys, os
+import pytest
+
+root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if root not in sys.path:
+    sys.path.insert(0, root)
+
+from labs.lab2_perception.environment.scenarios import build_corpus
+from labs.lab4.agents.sensor_agent import PerceptionBehaviour, SensorAgent
+from labs.lab4.sampling import AdaptiveSampler, SamplingPolicy, evaluate
+
+
+def test_period_follows_hazard_and_trend():
+    sampler = AdaptiveSampler(SamplingPolicy(), period=2.0)
+    assert sampler.update(50.0, 0.0) == 3.0  # calm: relaxes 1.5x per reading
+    assert sampler.update(60.0, 3.0) == 4.0  # up to the NORMAL period
+    assert sampler.update(300.0, 7.0) == 1.0  # WARNING: at once
+    assert sampler.update(650.0, 8.0) == 1.0  # DANGER
+    assert sampler.update(950.0, 8.5) == 1.0  # CRITICAL is sampled as fast as DANGER
+    assert sampler.update(120.0, 9.5) == 1.5  # back to NORMAL, gradually
+    # 180 ppm rising 30 ppm/s reaches WARNING in ~0.7 s: sample at the WARNING rate
+    sampler = AdaptiveSampler(SamplingPolicy(), period=4.0)
+    sampler.update(60.0, 0.0)
+    assert sampler.update(180.0, 4.0) == 1.0
+    fixed = AdaptiveSampler(SamplingPolicy.fixed(2.0))
+    assert {fixed.update(ppm, t) for t, ppm in enumerate([10, 400, 1200, 10])} == {2.0}
+    with pytest.raises(ValueError):
+        SamplingPolicy(min_period=3.0, max_period=1.0)
+
+
+def test_adaptive_beats_fixed_rate_on_recorded_scenarios():
+    leaks = build_corpus(["station_cycle", "slow_leak", "multi_phase"], per_scenario=20)
+    fixed, adaptive = evaluate(leaks, SamplingPolicy.fixed(2.0)), evaluate(leaks, SamplingPolicy())
+    assert adaptive.mean_latency("DANGER") < 0.6 * fixed.mean_latency("DANGER")
+    assert adaptive.mean_latency("WARNING") < fixed.mean_latency("WARNING")
+
+    calm = build_corpus(["pump_failure", "pressure_fault"], per_scenario=20)
+    assert evaluate(calm, SamplingPolicy()).samples < 0.7 * evaluate(calm, SamplingPolicy.fixed(2.0)).samples
+
+
+class SequenceStation:
+    def __init__(self, values):
+        self.values = list(values)
+
+    def get_current_readings(self):
+        return {"lpg_ppm": self.values.pop(0), "tank_pressure_kpa": 1000.0, "pump_state": "ON"}
+
+
+class DummyPerception(PerceptionBehaviour):
+    async def send(self, msg):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_perception_behaviour_sets_its_period():
+    agent = SensorAgent("adaptive@localhost", "password", "coord@localhost")
+    beh = DummyPerception(
+        period=2.0,
+        station=SequenceStation([50.0, 450.0]),
+        target_jid="coord@localhost",
+        sampler=AdaptiveSampler(agent.sampling, period=2.0),
+    )
+    beh.agent = agent
+    await beh.run()
+    assert beh.period.total_seconds() == 3.0
+    await beh.run()
+    assert beh.period.total_seconds() == 1.0
@@ -1,6 +1,7 @@
 """Unit tests for sensor classification utilities."""
 
 import sys, os
+import subprocess
 
 # make sure project root is on sys.path so that `labs` package can be imported
 root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
@@ -9,7 +10,7 @@ if root not in sys.path:
 
 import pytest
 
-from labs.lab4.agents.sensor_agent import classify_hazard, determine_event
+from labs.common.core import EventCode, classify_hazard, determine_event, event_code
 
 
 @pytest.mark.parametrize(
@@ -40,3 +41,17 @@ def test_classify_hazard(ppm, expected):
 )
 def test_determine_event(level, expected_event):
     assert determine_event(level) == expected_event
+
+
+def test_event_codes_follow_severity():
+    assert event_code("NORMAL_CONDITION") < event_code("POSSIBLE_GAS_LEAK")
+    assert event_code("GAS_LEAK_CONFIRMED") < event_code("CRITICAL_GAS_LEVEL")
+    assert event_code("nonsense") is EventCode.NORMAL_CONDITION
+
+
+def test_core_import_does_not_load_spade():
+    code = (
+        "import sys; import labs.common.core, labs.lab4.agents; "
+        "assert 'spade' not in sys.modules, 'spade imported'"
+    )
+    subprocess.run([sys.executable, "-c", code], cwd=root, check=True)
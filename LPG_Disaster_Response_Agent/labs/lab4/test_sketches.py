@@ -0,0 +1,97 @@
+"""Tests for the mergeable quantile sketches and their metrics integration."""
+
+import sys, os
+import json
+import random
+
+root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if root not in sys.path:
+    sys.path.insert(0, root)
+
+from labs.common.metrics import MetricsRegistry
+from labs.common.sketches import DDSketch
+
+
+def exact(values, q):
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+
+def test_quantiles_within_relative_error():
+    rng = random.Random(1)
+    values = [rng.lognormvariate(3, 1.5) for _ in range(50_000)]
+    sketch = DDSketch(relative_accuracy=0.01)
+    for v in values:
+        sketch.add(v)
+    for q in (0.5, 0.9, 0.99, 0.999):
+        truth = exact(values, q)
+        assert abs(sketch.quantile(q) - truth) <= 0.01 * truth
+    assert sketch.quantile(0) == min(values) and sketch.quantile(1) == max(values)
+    assert sketch.bins < 2048
+
+
+def test_zero_and_negative_values():
+    sketch = DDSketch()
+    for v in [-10.0, -1.0, 0.0, 0.0, 1.0, 10.0]:
+        sketch.add(v)
+    assert abs(sketch.quantile(0.0) + 10) < 0.1
+    assert sketch.quantile(0.5) == 0.0
+    assert DDSketch().quantile(0.5) is None
+
+
+def test_merge_equals_single_sketch():
+    rng = random.Random(2)
+    shards = [DDSketch() for _ in range(4)]
+    whole = DDSketch()
+    for i in range(10_000):
+        v = rng.uniform(0, 1500)
+        shards[i % 4].add(v)
+        whole.add(v)
+    merged = DDSketch.merged(shards)
+    assert merged.count == whole.count
+    for q in (0.5, 0.99, 0.999):
+        assert merged.quantile(q) == whole.quantile(q)
+
+    # survives a trip through JSON, as when shipped between processes
+    restored = DDSketch.from_dict(json.loads(json.dumps(merged.to_dict())))
+    assert restored.quantile(0.99) == merged.quantile(0.99)
+
+
+def test_bins_are_bounded():
+    values = sorted(m * 10.0 ** exp for exp in range(-6, 12) for m in range(1, 100))
+    sketch = DDSketch(relative_accuracy=0.01, max_bins=64)
+    for v in values:
+        sketch.add(v)
+    assert sketch.bins <= 64
+    # high interior quantiles keep the bound even after collapsing the low end
+    true_p99 = values[int(0.99 * (len(values) - 1))]
+    assert abs(sketch.quantile(0.99) - true_p99) <= 0.01 * true_p99
+
+    merged = DDSketch.merged([sketch, DDSketch.from_dict(sketch.to_dict())])
+    assert merged.max_bins == 64 and merged.bins <= 64
+    assert DDSketch.merged([sketch], max_bins=16).bins <= 16
+
+    # negative values collapse at the most negative end, so high quantiles still hold
+    negatives = DDSketch(relative_accuracy=0.01, max_bins=64)
+    for v in values:
+        negatives.add(-v)
+    true_p99 = exact([-v for v in values], 0.99)
+    assert negatives.bins <= 64 and abs(negatives.quantile(0.99) - true_p99) <= 0.01 * abs(true_p99)
+
+
+def test_sketch_metric_renders_summary_and_merges_labels():
+    registry = MetricsRegistry()
+    ppm = registry.sketch("lpg_station_ppm", "ppm", ("station",))
+    for v in range(1, 101):
+        ppm.labels("st1").add(float(v))
+        ppm.labels("st2").add(float(v + 100))
+
+    text = registry.render()
+    assert "# TYPE lpg_station_ppm summary" in text
+    assert 'lpg_station_ppm{station="st1",quantile="0.5"}' in text
+    assert 'lpg_station_ppm_count{station="st2"} 100' in text
+
+    fleet = ppm.merged()
+    assert fleet.count == 200
+    assert abs(fleet.quantile(0.5) - 100) <= 1.0
+    assert ppm.merged(station="st2").count == 100
@@ -0,0 +1,99 @@
+"""Tests for the grid spatial index and nearest-responder dispatch."""
+
+import sys, os
+import random
+import pytest
+
+root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if root not in sys.path:
+    sys.path.insert(0, root)
+
+from spade.message import Message
+
+from labs.common.payload import Kind, decode, encode
+from labs.lab4.agents.coordinator_agent import CoordinatorAgent
+from labs.lab4.spatial import GridIndex, format_location, parse_location
+
+
+@pytest.mark.parametrize("cell_size", [0.5, 4.0, 40.0])
+def test_grid_matches_linear_scan(cell_size):
+    rng = random.Random(cell_size)
+    index = GridIndex(cell_size)
+    for i in range(500):
+        index.add(i, rng.uniform(-50, 50), rng.uniform(-50, 50), available=rng.random() > 0.3)
+    for _ in range(200):
+        x, y, k = rng.uniform(-80, 80), rng.uniform(-80, 80), rng.randint(1, 6)
+        assert [d for d, _ in index.nearest(x, y, k)] == pytest.approx([d for d, _ in index.nearest_linear(x, y, k)])
+
+
+def test_busy_and_moved_points():
+    index = GridIndex(1.0)
+    index.add("a", 0, 0)
+    index.add("b", 5, 5)
+    assert [key for _, key in index.nearest(0.1, 0.1, 1)] == ["a"]
+    index.set_available("a", False)
+    assert [key for _, key in index.nearest(0.1, 0.1, 2)] == ["b"]
+    index.move("b", 100, 100)
+    index.set_available("a", True)
+    assert [key for _, key in index.nearest(99, 99, 2)] == ["b", "a"]
+    index.remove("b")
+    assert len(index) == 1 and index.available == 1
+    assert parse_location(format_location(1.5, -2)) == (1.5, -2.0)
+    assert parse_location("nowhere") is None
+
+
+class DummyHandler(CoordinatorAgent.MessageHandler):
+    def __init__(self):
+        super().__init__()
+        self.sent = []
+
+    async def send(self, msg):
+        self.sent.append(msg)
+
+
+def inform(body, sender, **metadata):
+    m = Message(to="coord@localhost")
+    m.set_metadata("performative", "inform")
+    for key, value in metadata.items():
+        m.set_metadata(key, value)
+    m.body = body
+    m.sender = sender
+    return m
+
+
+@pytest.mark.asyncio
+async def test_coordinator_dispatches_to_nearest_available():
+    agent = CoordinatorAgent(
+        jid="coord@localhost",
+        password="password",
+        sensor_jid="sensor@localhost",
+        response_jids=["near@localhost", "mid@localhost", "far@localhost"],
+        station_locations={"st_a": (0.0, 0.0), "st_b": (1.0, 0.0)},
+        responder_locations={"near@localhost": (1, 1), "mid@localhost": (4, 4), "far@localhost": (50, 50)},
+        dispatch_k=1,
+    )
+    beh = DummyHandler()
+    beh.agent = agent
+
+    await beh._handle(inform(encode(Kind.PERCEPT, 2, "st_a"), "gw@localhost"))
+    assert [str(m.to) for m in beh.sent] == ["near@localhost"]
+    incident_id = beh.sent[0].get_metadata("incident_id")
+
+    # near is busy now, so the next station gets the next nearest
+    await beh._handle(inform(encode(Kind.PERCEPT, 2, "st_b"), "gw@localhost"))
+    assert str(beh.sent[1].to) == "mid@localhost"
+
+    # far drives over to st_a's neighbourhood, near completes and reports its position
+    await beh._handle(inform(encode(Kind.POSITION), "far@localhost/res", location="0.5,0"))
+    await beh._handle(
+        inform(encode(Kind.COMPLETED, 2, "st_a", correlation=incident_id), "near@localhost/res", location="9,9")
+    )
+    assert agent.responder_index.position("near@localhost") == (9.0, 9.0)
+    assert agent.responder_index.is_available("near@localhost")
+    assert [jid for _, jid in agent.responder_index.nearest(0, 0, 1)] == ["far@localhost"]
+    assert decode(beh.sent[1].body).kind is Kind.REQUEST
+
+    # one request per dispatch, not one per responder in the fleet
+    await beh._handle(inform(encode(Kind.PERCEPT, 2, "st_b"), "gw@localhost"))  # suppressed
+    stats = agent.incident_stats()
+    assert stats["requests_sent"] == 2 and stats["requests_avoided"] == 1
@@ -0,0 +1,58 @@
+"""Tests for placement, restart and shutdown in the multi-process supervisor."""
+
+import sys, os
+import pytest
+
+root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if root not in sys.path:
+    sys.path.insert(0, root)
+
+from labs.lab4.supervisor import AgentSpec, HostOptions, Supervisor, cells, check_local, place
+
+
+def flaky_responder(spec, opts):
+    """Kills its worker the first time it is built (see ``test_crashed_worker_is_restarted``)."""
+    marker = spec.options["marker"]
+    if not os.path.exists(marker):
+        open(marker, "w").close()
+        os._exit(3)
+    from labs.lab4.agents.response_agent import ResponseAgent
+
+    return ResponseAgent(jid=opts.jid(spec.name), password=opts.password, coordinator_jid=opts.jid("nobody"))
+
+
+def test_place_keeps_groups_together_and_balances():
+    placement = place(cells(4, responders=2), workers=2)
+    assert [len(w) for w in placement] == [8, 8]
+    for worker in placement:
+        groups = {spec.group for spec in worker}
+        assert all(sum(s.group == g for s in worker) == 4 for g in groups)
+    # more workers than groups leaves some empty
+    assert sum(1 for w in place(cells(1), workers=3) if w) == 1
+
+
+def test_check_local_rejects_split_groups():
+    specs = cells(1, responders=1)
+    check_local(place(specs, 2))
+    split = [[specs[0]], specs[1:]]
+    with pytest.raises(ValueError):
+        check_local(split)
+
+
+def test_drivers_finishing_shut_the_tree_down():
+    specs = cells(1, responders=1, sensors=5, period=0.02, max_cycles=3)
+    supervisor = Supervisor(specs, workers=1, options=HostOptions(local=True, drain_timeout=0.2))
+    assert supervisor.run() == 0
+    assert supervisor.workers[0].percepts == 15
+    assert all(w.process.exitcode == 0 for w in supervisor.workers)
+
+
+def test_crashed_worker_is_restarted(tmp_path):
+    specs = cells(1, responders=1, sensors=5, period=0.05, max_cycles=10) + [
+        AgentSpec("labs.lab4.test_supervisor:flaky_responder", "flaky", options={"marker": str(tmp_path / "m")})
+    ]
+    supervisor = Supervisor(specs, workers=2, options=HostOptions(local=True, drain_timeout=0.2))
+    assert supervisor.run() == 0
+    flaky = next(w for w in supervisor.workers if w.specs[0].name == "flaky")
+    assert flaky.restarts == 1
+    assert flaky.process.exitcode == 0
@@ -0,0 +1,98 @@
+"""Tests for the binary trace ring, its file format and the agent trace points."""
+
+import sys, os
+import asyncio
+import pytest
+
+root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if root not in sys.path:
+    sys.path.insert(0, root)
+
+from spade.message import Message
+
+from labs.common.core import EventCode
+from labs.common.tracing import TRACER, Tracer, hex_id, read_trace, timeline
+from labs.lab4.agents.coordinator_agent import TRACE_DISPATCH, TRACE_PERCEPT, CoordinatorAgent
+
+
+def test_ring_keeps_the_newest_records_and_counts_drops():
+    tracer = Tracer(capacity=4)
+    code = tracer.define("test.tick", n="int")
+    assert tracer.define("test.tick", n="int") == code
+    for n in range(6):
+        tracer.emit(code, 0, n)
+    assert [r[3] for r in tracer.records()] == [2, 3, 4, 5]
+
+    blocks, records = tracer.collect()
+    assert tracer.dropped == 2 and len(records) == 4 * 32
+    tracer.emit(code, 0, 6)
+    assert len(tracer.collect()[1]) == 32
+
+    with pytest.raises(ValueError):
+        Tracer(capacity=6)
+    with pytest.raises(ValueError):
+        tracer.define("test.bad", incident="hex", n="int")  # hex ids need the 64-bit slot
+    assert hex_id("3fa2c81b09de") == 0x3FA2C81B09DE and hex_id("inc-1") == 0 and hex_id(None) == 0
+
+
+@pytest.mark.asyncio
+async def test_flushed_file_decodes_to_a_timeline(tmp_path):
+    tracer = Tracer(capacity=8)
+    path = tmp_path / "trace.bin"
+    dispatch = tracer.define("coordinator.dispatch", responder="str", event="event", station="str", incident="hex")
+    coordinator = tracer.intern("coordinator")
+    await tracer.start(path, interval=0.01)
+    tracer.emit(dispatch, coordinator, tracer.intern("r1@localhost"), EventCode.GAS_LEAK_CONFIRMED, 0,
+                hex_id("00000000abcd"))
+    await asyncio.sleep(0.05)  # a flush in between: later names go into a second metadata block
+    state = tracer.define("fsm.state", state="str")
+    tracer.emit(state, tracer.intern("fsm_agent"), tracer.intern("AlertState"))
+    await tracer.close()
+
+    trace = read_trace(path)
+    assert len(trace.records) == 2 and not trace.torn and trace.dropped == 0
+    lines = [line for _, line in timeline([trace])]
+    assert lines == [
+        "coordinator coordinator.dispatch responder=r1@localhost event=GAS_LEAK_CONFIRMED station=- "
+        "incident=00000000abcd",
+        "fsm_agent fsm.state state=AlertState",
+    ]
+    assert [line for _, line in timeline([trace], events=["fsm."])] == lines[1:]
+
+    path.write_bytes(path.read_bytes()[:-5])  # crash in the middle of a block
+    assert read_trace(path).torn
+
+
+class DummyHandler(CoordinatorAgent.MessageHandler):
+    async def send(self, msg):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_coordinator_traces_percepts_and_dispatches():
+    agent = CoordinatorAgent(
+        jid="traced@localhost",
+        password="password",
+        sensor_jid="sensor@localhost",
+        response_jids=["r1@localhost", "r2@localhost"],
+    )
+    beh = DummyHandler()
+    beh.agent = agent
+    msg = Message(to=str(agent.jid))
+    msg.set_metadata("performative", "inform")
+    msg.body = "GAS_LEAK_CONFIRMED"
+    msg.sender = agent.sensor_jid
+
+    async def fake_receive(timeout=None):
+        return msg
+
+    beh.receive = fake_receive
+    start = TRACER.emitted
+    await beh.run()
+
+    ours = [r for r in TRACER.records()[-(TRACER.emitted - start):] if r[1] == agent.trace_id]
+    assert [r[2] for r in ours] == [TRACE_PERCEPT, TRACE_DISPATCH, TRACE_DISPATCH]
+    assert TRACER.names.render(ours[0]).startswith("traced coordinator.percept station=sensor@localhost")
+    responders = {TRACER.names.string(r[3]) for r in ours[1:]}
+    assert responders == {"r1@localhost", "r2@localhost"}
+    assert {r[6] for r in ours[1:]} == {hex_id(i) for i in agent.incidents}
@@ -0,0 +1,81 @@
+"""Tests for the compressed sensor history encoding."""
+
+import sys, os
+import math
+import pytest
+
+root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if root not in sys.path:
+    sys.path.insert(0, root)
+
+from labs.lab4.tsenc import BitWriter, StationSeriesEncoder, _write_dod, decode_block
+
+
+def test_round_trip_with_irregular_timestamps_and_special_values():
+    samples = [
+        (1_700_000_000_000, 50.0, 1000.0),
+        (1_700_000_002_000, 50.0, 1000.0),
+        (1_700_000_004_003, 123.4, 998.7),
+        (1_700_000_006_001, -0.0, 998.7),
+        (1_700_000_016_500, 1500.0, math.inf),
+        (1_700_000_016_501, 0.1, 400.0),
+        (1_700_009_000_000, 1e-300, 1.7976931348623157e308),
+        (1_700_000_000_000, 42.0, 1100.0),  # clock went backwards
+    ]
+    enc = StationSeriesEncoder(block_size=1024)
+    for ts, ppm, pres in samples:
+        enc.append(ts, {"lpg_ppm": ppm, "tank_pressure_kpa": pres})
+
+    (timestamps, (ppm, pres)), = list(enc.iter_blocks())
+    assert timestamps == [s[0] for s in samples]
+    assert ppm == [s[1] for s in samples]
+    assert pres == [s[2] for s in samples]
+    assert math.copysign(1, ppm[3]) == -1
+
+
+def test_blocks_are_sealed_and_decode_independently():
+    enc = StationSeriesEncoder(fields=("v",), block_size=4)
+    for i in range(10):
+        enc.append(i * 2000, [float(i % 3)])
+    assert len(enc.blocks) == 2  # 4 + 4 sealed, 2 still open
+
+    ts, (values,) = decode_block(enc.blocks[1], channels=1)
+    assert ts == [8000, 10000, 12000, 14000]
+    assert values == [1.0, 2.0, 0.0, 1.0]
+
+    decoded = [t for block_ts, _ in enc.iter_blocks() for t in block_ts]
+    assert decoded == [i * 2000 for i in range(10)]
+
+
+def test_gap_beyond_32_bit_delta_starts_a_new_block():
+    day = 86_400_000
+    samples = [0, 2000, 4000, 4000 + 30 * day, 4000 + 30 * day + 2000, 4000 - 40 * day]
+    enc = StationSeriesEncoder(fields=("v",))
+    for i, ts in enumerate(samples):
+        enc.append(ts, [float(i)])
+    decoded = [list(block) for block, _ in enc.iter_blocks()]
+    assert decoded == [samples[:3], samples[3:5], samples[5:]]
+    with pytest.raises(OverflowError):
+        _write_dod(BitWriter(), 30 * day)
+
+
+def test_steady_series_compresses_well():
+    enc = StationSeriesEncoder()
+    for i in range(1000):
+        enc.append(i * 2000, (150.0, 1000.0))
+    enc.flush()
+    # one bit for the timestamp and one per unchanged value
+    assert enc.nbytes < 1000 * 3 / 8 + 64
+
+
+def test_decimal_scaling_is_lossless_and_smaller():
+    values = [round(50 + i * 7.3, 1) for i in range(200)]
+    raw = StationSeriesEncoder(fields=("v",))
+    scaled = StationSeriesEncoder(fields=("v",), decimals=1)
+    for i, v in enumerate(values):
+        raw.append(i * 2000, [v])
+        scaled.append(i * 2000, [v])
+
+    (_, (decoded,)), = list(scaled.iter_blocks())
+    assert decoded == values
+    assert scaled.nbytes < raw.nbytes